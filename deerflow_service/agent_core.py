@@ -11,6 +11,9 @@ from collections import deque
 from enum import Enum
 import json
 
+from task_manager import task_manager, TaskPriority
+from deadline import Deadline, DeadlineExceeded, deadline_scope, run_stage
+
 logger = logging.getLogger("agent_core")
 
 class TaskStatus(Enum):
@@ -591,6 +594,7 @@ class AgentTaskState:
     errors: List[str] = field(default_factory=list)
     progress: float = 0.0
     completed_at: Optional[float] = None
+    deadline: Optional[Dict[str, Any]] = None  # Report of the task's deadline once it finishes
 
 # Core agent system
 class AgentCore:
@@ -617,8 +621,21 @@ class AgentCore:
         await self.registry.stop_all_agents()
         logger.info("Agent core shutdown complete")
 
-    async def create_research_task(self, query: str, preferences: Dict[str, Any] = None) -> str:
-        """Create a new research task with planning"""
+    async def create_research_task(
+        self,
+        query: str,
+        preferences: Dict[str, Any] = None,
+        user_id: str = "anonymous",
+        priority: TaskPriority = TaskPriority.BATCH,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Create a new research task with planning
+
+        The task waits for a run slot in the shared scheduler; raises
+        task_manager.Overloaded when the queue is over its SLO. With a
+        deadline, time spent queueing counts against it and the steps still
+        running when it expires are cancelled.
+        """
         task_id = f"task_{int(time.time() * 1000)}"
 
         try:
@@ -633,8 +650,13 @@ class AgentCore:
 
             self.active_agents[task_id] = task_state
 
-            # Start background task for research - don't await, just create
-            asyncio.create_task(self._execute_research_task(task_state))
+            # Queue the research in the shared scheduler - don't await it
+            await task_manager.create_managed_task(
+                self._execute_research_task(task_state, deadline),
+                task_id,
+                user_id=user_id,
+                priority=priority
+            )
 
             logger.info(f"Created research task: {task_id}")
 
@@ -647,8 +669,12 @@ class AgentCore:
                 del self.active_agents[task_id]
             raise
 
-    async def _execute_research_task(self, task_state: AgentTaskState):
+    async def _execute_research_task(self, task_state: AgentTaskState, deadline: Optional[Deadline] = None):
         """Execute the research task with planning and execution"""
+        with deadline_scope(deadline):
+            return await self._run_research_task(task_state, deadline)
+
+    async def _run_research_task(self, task_state: AgentTaskState, deadline: Optional[Deadline]):
         try:
             # Save initial state
             self._persist_task_state(task_state)
@@ -656,7 +682,9 @@ class AgentCore:
             task_state.status = TaskStatus.PLANNING
             # Assuming _create_execution_plan is defined elsewhere
             # and returns a plan object
-            task_state.plan = await self._create_execution_plan(task_state.query, task_state.preferences)
+            task_state.plan = await run_stage(
+                "planning", self._create_execution_plan(task_state.query, task_state.preferences)
+            )
             self._persist_task_state(task_state)
 
             task_state.status = TaskStatus.EXECUTING
@@ -669,10 +697,13 @@ class AgentCore:
                 try:
                     # Assuming _execute_step is defined elsewhere
                     # and executes a step and returns a result
-                    step_result = await self._execute_step(step)
+                    step_result = await run_stage(f"step_{i + 1}", self._execute_step(step))
                     task_state.results.append(step_result)
                     task_state.progress = (i + 1) / len(task_state.plan.steps) * 0.8
                     self._persist_task_state(task_state)
+                except DeadlineExceeded:
+                    # Later steps have no budget left either
+                    raise
                 except Exception as e:
                     logger.error(f"Step execution failed: {e}")
                     task_state.errors.append(str(e))
@@ -681,6 +712,8 @@ class AgentCore:
             task_state.status = TaskStatus.COMPLETED
             task_state.progress = 1.0
             task_state.completed_at = time.time()
+            if deadline is not None:
+                task_state.deadline = deadline.report()
             self._persist_task_state(task_state)
 
             # return the ID when complete
@@ -690,6 +723,8 @@ class AgentCore:
             task_state.status = TaskStatus.FAILED
             task_state.errors.append(str(e))
             task_state.completed_at = time.time()
+            if deadline is not None:
+                task_state.deadline = deadline.report()
             self._persist_task_state(task_state)
             logger.error(f"Task execution failed: {e}")
 
@@ -753,6 +788,7 @@ class AgentCore:
             "completed_at": task_state.completed_at,
             "result": task_state.results,
             "error": task_state.errors[-1] if task_state.errors else None,
+            "deadline": task_state.deadline,
             "metadata": {"query": task_state.query, "preferences": task_state.preferences}
         }
 
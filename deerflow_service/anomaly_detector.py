@@ -6,13 +6,15 @@ This module provides anomaly detection capabilities to identify
 unusual patterns in system behavior and performance metrics.
 """
 
-import statistics
+import math
 import time
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence
 from dataclasses import dataclass
 from collections import deque
 
+import numpy as np
+
 logger = logging.getLogger("anomaly_detector")
 
 @dataclass
@@ -26,68 +28,339 @@ class AnomalyAlert:
     z_score: float
     description: str
 
+class RollingStats:
+    """Sliding-window mean/variance (Welford) with monotonic deques for min/max
+    
+    Every update is O(1) amortized, independent of the window size.
+    """
+    
+    # Recompute from the raw window periodically to cancel floating-point drift
+    RESYNC_INTERVAL = 10000
+    
+    def __init__(self, window_size: int):
+        self.window_size = window_size
+        self.values: deque = deque(maxlen=window_size)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._seq = 0
+        self._min_candidates: deque = deque()  # (seq, value), values increasing
+        self._max_candidates: deque = deque()  # (seq, value), values decreasing
+    
+    @property
+    def count(self) -> int:
+        return len(self.values)
+    
+    @property
+    def stdev(self) -> float:
+        n = len(self.values)
+        return math.sqrt(self.m2 / (n - 1)) if n > 1 else 0.0
+    
+    @property
+    def min(self) -> float:
+        return self._min_candidates[0][1] if self._min_candidates else 0.0
+    
+    @property
+    def max(self) -> float:
+        return self._max_candidates[0][1] if self._max_candidates else 0.0
+    
+    def add(self, value: float):
+        # Remove the value about to fall out of the window
+        if len(self.values) == self.window_size:
+            old = self.values[0]
+            n = len(self.values) - 1
+            if n == 0:
+                self.mean, self.m2 = 0.0, 0.0
+            else:
+                delta = old - self.mean
+                self.mean -= delta / n
+                self.m2 = max(0.0, self.m2 - delta * (old - self.mean))
+        
+        self.values.append(value)
+        n = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (value - self.mean)
+        
+        # Monotonic deques: drop dominated candidates, then expired ones
+        seq = self._seq
+        self._seq += 1
+        while self._min_candidates and self._min_candidates[-1][1] >= value:
+            self._min_candidates.pop()
+        self._min_candidates.append((seq, value))
+        while self._max_candidates and self._max_candidates[-1][1] <= value:
+            self._max_candidates.pop()
+        self._max_candidates.append((seq, value))
+        
+        oldest_live = seq - self.window_size + 1
+        while self._min_candidates[0][0] < oldest_live:
+            self._min_candidates.popleft()
+        while self._max_candidates[0][0] < oldest_live:
+            self._max_candidates.popleft()
+        
+        if self._seq % self.RESYNC_INTERVAL == 0:
+            self._resync()
+    
+    def _resync(self):
+        window = np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+        self.mean = float(window.mean()) if window.size else 0.0
+        self.m2 = float(((window - self.mean) ** 2).sum()) if window.size else 0.0
+    
+    def extend(self, values: np.ndarray):
+        """Append a batch, recomputing window statistics with NumPy"""
+        history = np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+        window = np.concatenate([history, values])[-self.window_size:]
+        
+        self.values = deque(window.tolist(), maxlen=self.window_size)
+        self.mean = float(window.mean())
+        self.m2 = float(((window - self.mean) ** 2).sum())
+        
+        # Sequence numbers continue so later adds expire candidates correctly
+        first_seq = self._seq + len(values) - window.size
+        self._seq += len(values)
+        self._min_candidates.clear()
+        self._max_candidates.clear()
+        for offset, value in enumerate(window.tolist()):
+            seq = first_seq + offset
+            while self._min_candidates and self._min_candidates[-1][1] >= value:
+                self._min_candidates.pop()
+            self._min_candidates.append((seq, value))
+            while self._max_candidates and self._max_candidates[-1][1] <= value:
+                self._max_candidates.pop()
+            self._max_candidates.append((seq, value))
+
+class SeasonalBaseline:
+    """Per hour-of-day (UTC) EWMA mean and variance for one metric"""
+    
+    HOURS = 24
+    
+    def __init__(self, alpha: float = 0.05):
+        self.alpha = alpha
+        self.counts = np.zeros(self.HOURS, dtype=np.int64)
+        self.means = np.zeros(self.HOURS, dtype=np.float64)
+        self.variances = np.zeros(self.HOURS, dtype=np.float64)
+    
+    @staticmethod
+    def hour_of(timestamp: float) -> int:
+        return int(timestamp // 3600) % 24
+    
+    def update(self, timestamp: float, value: float):
+        hour = self.hour_of(timestamp)
+        self.counts[hour] += 1
+        # Plain running average until 1/alpha samples, then exponential decay
+        alpha = max(self.alpha, 1.0 / self.counts[hour])
+        delta = value - self.means[hour]
+        increment = alpha * delta
+        self.means[hour] += increment
+        self.variances[hour] = (1 - alpha) * (self.variances[hour] + delta * increment)
+    
+    def update_many(self, timestamps: np.ndarray, values: np.ndarray):
+        """Merge a batch into all hour buckets at once
+        
+        Batch mean/variance per hour come from bincount and are combined with
+        the existing state, whose weight is capped at the EWMA horizon 1/alpha.
+        """
+        hours = (timestamps // 3600).astype(np.int64) % 24
+        n_new = np.bincount(hours, minlength=self.HOURS).astype(np.float64)
+        present = n_new > 0
+        if not present.any():
+            return
+        
+        sums = np.bincount(hours, weights=values, minlength=self.HOURS)
+        squares = np.bincount(hours, weights=values * values, minlength=self.HOURS)
+        mean_new = np.divide(sums, n_new, out=np.zeros(self.HOURS), where=present)
+        var_new = np.divide(squares, n_new, out=np.zeros(self.HOURS), where=present) - mean_new ** 2
+        var_new = np.maximum(var_new, 0.0)
+        
+        w_old = np.minimum(self.counts.astype(np.float64), 1.0 / self.alpha)
+        total = w_old + n_new
+        delta = mean_new - self.means
+        combined_mean = self.means + delta * np.divide(n_new, total, out=np.zeros(self.HOURS), where=present)
+        combined_var = np.divide(
+            w_old * self.variances + n_new * var_new + delta ** 2 * w_old * n_new / np.where(present, total, 1.0),
+            total, out=np.zeros(self.HOURS), where=present
+        )
+        
+        self.means = np.where(present, combined_mean, self.means)
+        self.variances = np.where(present, combined_var, self.variances)
+        self.counts += n_new.astype(np.int64)
+    
+    def baseline(self, timestamp: float) -> Dict[str, float]:
+        hour = self.hour_of(timestamp)
+        return {
+            "mean": float(self.means[hour]),
+            "stdev": math.sqrt(self.variances[hour]),
+            "count": int(self.counts[hour]),
+            "hour": hour
+        }
+
 class AnomalyDetector:
     """Detect anomalies in system behavior"""
     
-    def __init__(self, window_size: int = 100, z_threshold: float = 3.0):
+    def __init__(
+        self,
+        window_size: int = 100,
+        z_threshold: float = 3.0,
+        seasonal_alpha: float = 0.05,
+        min_seasonal_samples: int = 30
+    ):
         self.window_size = window_size
         self.z_threshold = z_threshold
+        self.seasonal_alpha = seasonal_alpha
+        self.min_seasonal_samples = min_seasonal_samples
         self.baselines: Dict[str, Dict[str, float]] = {}
-        self.metric_history: Dict[str, deque] = {}
+        self.rolling: Dict[str, RollingStats] = {}
+        self.seasonal: Dict[str, SeasonalBaseline] = {}
         self.alerts: List[AnomalyAlert] = []
+    
+    @property
+    def metric_history(self) -> Dict[str, deque]:
+        """Raw rolling windows per metric"""
+        return {name: stats.values for name, stats in self.rolling.items()}
+    
+    def _ensure_metric(self, metric_name: str):
+        if metric_name not in self.rolling:
+            self.rolling[metric_name] = RollingStats(self.window_size)
+            self.seasonal[metric_name] = SeasonalBaseline(self.seasonal_alpha)
         
-    def add_metric_value(self, metric_name: str, value: float):
+    def add_metric_value(self, metric_name: str, value: float, timestamp: Optional[float] = None):
         """Add a new metric value and check for anomalies"""
-        # Initialize history if needed
-        if metric_name not in self.metric_history:
-            self.metric_history[metric_name] = deque(maxlen=self.window_size)
+        timestamp = timestamp if timestamp is not None else time.time()
+        self._ensure_metric(metric_name)
+        
+        # Check against the seasonal baseline before this value joins it
+        seasonal_baseline = self._seasonal_baseline(metric_name, timestamp)
         
-        # Add value to history
-        self.metric_history[metric_name].append(value)
+        self.rolling[metric_name].add(value)
+        self.seasonal[metric_name].update(timestamp, value)
         
         # Update baseline if we have enough data
-        if len(self.metric_history[metric_name]) >= 10:
+        if self.rolling[metric_name].count >= 10:
             self._update_baseline(metric_name)
             
             # Check for anomaly
-            if self.is_anomaly(metric_name, value):
-                alert = self._create_alert(metric_name, value)
+            baseline = seasonal_baseline or self.baselines[metric_name]
+            if self._z_score(baseline, value) > self.z_threshold:
+                alert = self._create_alert(metric_name, value, baseline, timestamp)
                 self.alerts.append(alert)
                 logger.warning(f"Anomaly detected: {alert.description}")
                 return alert
         
         return None
+    
+    def backfill(
+        self,
+        metric_name: str,
+        values: Sequence[float],
+        timestamps: Optional[Sequence[float]] = None,
+        detect: bool = False
+    ) -> List[AnomalyAlert]:
+        """Bulk-ingest historical values
+        
+        Seasonal baselines are folded in per hour and the rolling window is
+        rebuilt from the tail. With ``detect=True``, rolling z-scores for the
+        whole batch are computed with cumulative sums rather than per point.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return []
+        if timestamps is None:
+            timestamps = np.full(values.size, time.time())
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        self._ensure_metric(metric_name)
+        stats = self.rolling[metric_name]
+        
+        alerts: List[AnomalyAlert] = []
+        if detect:
+            alerts = self._detect_batch(metric_name, stats, values, timestamps)
+        
+        self.seasonal[metric_name].update_many(timestamps, values)
+        stats.extend(values)
+        if stats.count >= 2:
+            self._update_baseline(metric_name)
+        
+        self.alerts.extend(alerts)
+        return alerts
+    
+    def _detect_batch(
+        self,
+        metric_name: str,
+        stats: RollingStats,
+        values: np.ndarray,
+        timestamps: np.ndarray
+    ) -> List[AnomalyAlert]:
+        """Vectorized rolling z-scores over existing window + new values"""
+        history = np.fromiter(stats.values, dtype=np.float64, count=stats.count)
+        series = np.concatenate([history, values])
+        w = self.window_size
+        
+        cumsum = np.concatenate([[0.0], np.cumsum(series)])
+        cumsq = np.concatenate([[0.0], np.cumsum(series * series)])
+        end = np.arange(1, series.size + 1)
+        start = np.maximum(0, end - w)
+        counts = end - start
+        sums = cumsum[end] - cumsum[start]
+        squares = cumsq[end] - cumsq[start]
+        means = sums / counts
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variances = np.maximum(0.0, (squares - counts * means * means) / (counts - 1))
+            stdevs = np.sqrt(variances)
+            z_scores = np.abs(series - means) / stdevs
+        
+        new = slice(history.size, series.size)
+        flagged = (counts[new] >= 10) & (stdevs[new] > 0) & (z_scores[new] > self.z_threshold)
+        alerts = []
+        for i in np.flatnonzero(flagged):
+            j = history.size + i
+            baseline = {"mean": float(means[j]), "stdev": float(stdevs[j])}
+            alerts.append(self._create_alert(metric_name, float(values[i]), baseline, float(timestamps[i])))
+        return alerts
         
     def _update_baseline(self, metric_name: str):
-        """Update baseline statistics for a metric"""
-        values = list(self.metric_history[metric_name])
+        """Publish the current rolling statistics for a metric (O(1))"""
+        stats = self.rolling[metric_name]
         
-        if len(values) < 2:
+        if stats.count < 2:
             return
-            
-        mean = statistics.mean(values)
-        stdev = statistics.stdev(values)
         
         self.baselines[metric_name] = {
-            "mean": mean,
-            "stdev": stdev,
-            "min": min(values),
-            "max": max(values),
-            "count": len(values)
+            "mean": stats.mean,
+            "stdev": stats.stdev,
+            "min": stats.min,
+            "max": stats.max,
+            "count": stats.count
         }
+    
+    def _seasonal_baseline(self, metric_name: str, timestamp: float) -> Optional[Dict[str, float]]:
+        """Hour-of-day baseline once it has enough samples"""
+        seasonal = self.seasonal.get(metric_name)
+        if seasonal is None:
+            return None
+        baseline = seasonal.baseline(timestamp)
+        if baseline["count"] < self.min_seasonal_samples or baseline["stdev"] == 0:
+            return None
+        return baseline
+    
+    @staticmethod
+    def _z_score(baseline: Optional[Dict[str, float]], value: float) -> float:
+        if not baseline or baseline["stdev"] == 0:
+            return 0.0
+        return abs((value - baseline["mean"]) / baseline["stdev"])
         
-    def is_anomaly(self, metric_name: str, value: float) -> bool:
+    def is_anomaly(self, metric_name: str, value: float, timestamp: Optional[float] = None) -> bool:
         """Check if a value is anomalous"""
-        baseline = self.baselines.get(metric_name)
-        if not baseline or baseline["stdev"] == 0:
-            return False
-            
-        z_score = abs((value - baseline["mean"]) / baseline["stdev"])
-        return z_score > self.z_threshold
+        timestamp = timestamp if timestamp is not None else time.time()
+        baseline = self._seasonal_baseline(metric_name, timestamp) or self.baselines.get(metric_name)
+        return self._z_score(baseline, value) > self.z_threshold
     
-    def _create_alert(self, metric_name: str, value: float) -> AnomalyAlert:
+    def _create_alert(
+        self,
+        metric_name: str,
+        value: float,
+        baseline: Optional[Dict[str, float]] = None,
+        timestamp: Optional[float] = None
+    ) -> AnomalyAlert:
         """Create an anomaly alert"""
-        baseline = self.baselines[metric_name]
+        baseline = baseline or self.baselines[metric_name]
         z_score = abs((value - baseline["mean"]) / baseline["stdev"])
         
         # Determine severity
@@ -115,7 +388,7 @@ class AnomalyDetector:
             value=value,
             expected_range=expected_range,
             severity=severity,
-            timestamp=time.time(),
+            timestamp=timestamp if timestamp is not None else time.time(),
             z_score=z_score,
             description=description
         )
@@ -0,0 +1,164 @@
+"""
+Async Single-Flight TTL Cache for DeerFlow
+
+This module provides a cache for coroutine results. Concurrent requests for
+the same key share one in-flight computation, finished values expire after a
+TTL and are evicted least-recently-used beyond ``maxsize``, and hit, miss and
+coalesce counters are kept for monitoring.
+"""
+
+import time
+import asyncio
+import logging
+import weakref
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Awaitable, Hashable, Optional, Tuple
+
+logger = logging.getLogger("async_cache")
+
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+CACHE_COALESCED = "coalesced"
+
+# Every cache alive in this process, so metrics can find them by name
+_live_caches: "weakref.WeakSet[AsyncTTLCache]" = weakref.WeakSet()
+
+
+def combined_stats(name: str) -> Dict[str, int]:
+    """Hits, misses and size summed over the live caches called ``name``
+
+    Coalesced lookups were answered without computing, so they count as hits.
+    """
+    totals = {"hits": 0, "misses": 0, "size": 0}
+    for cache in list(_live_caches):
+        if cache.name == name:
+            totals["hits"] += cache.stats["hits"] + cache.stats["coalesced"]
+            totals["misses"] += cache.stats["misses"]
+            totals["size"] += len(cache._entries)
+    return totals
+
+
+class AsyncTTLCache:
+    """LRU + TTL cache whose misses are computed once per key at a time"""
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 300.0,
+        name: str = "async_cache",
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        # Values this rejects still answer their waiters but are never stored
+        self.cacheable = cacheable
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        # Invalidation detaches a key's task from here, which is how the task
+        # knows its result is stale
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "rejected": 0,
+            "errors": 0
+        }
+        _live_caches.add(self)
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.stats["expirations"] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def _compute_and_store(self, key: Hashable, compute: Callable[[], Awaitable[Any]]):
+        task = asyncio.current_task()
+        try:
+            value = await compute()
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            current = self._inflight.get(key) is task
+            if current:
+                del self._inflight[key]
+        # Skip storing results computed against invalidated state
+        if current:
+            if self.cacheable is None or self.cacheable(value):
+                self._store(key, value)
+            else:
+                self.stats["rejected"] += 1
+        return value
+
+    async def fetch(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """Return ``(value, status)`` where status is hit, miss or coalesced"""
+        found, value = self._lookup(key)
+        if found:
+            self.stats["hits"] += 1
+            return value, CACHE_HIT
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            status = CACHE_COALESCED
+        else:
+            self.stats["misses"] += 1
+            status = CACHE_MISS
+            # The computation runs as its own task so a cancelled caller does
+            # not cancel it for the other waiters
+            task = asyncio.ensure_future(self._compute_and_store(key, compute))
+            self._inflight[key] = task
+
+        return await asyncio.shield(task), status
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value, _ = await self.fetch(key, compute)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or everything when key is None
+
+        In-flight computations of the dropped keys still answer their waiters
+        but are not stored, and later lookups start a fresh computation.
+        Computations of other keys are unaffected.
+        """
+        self.stats["invalidations"] += 1
+        if key is None:
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        self.invalidate()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "inflight": len(self._inflight),
+            "hit_ratio": (self.stats["hits"] + self.stats["coalesced"]) / lookups if lookups else 0.0
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,163 @@
+"""
+Request Deadlines for DeerFlow
+
+This module carries a request's time budget down the call stack in a context
+variable. Each stage (orchestration, agent analysis, evidence processing, tool
+calls) runs under a child deadline capped by both its own timeout and what the
+request has left, so a slow stage is cancelled instead of holding up the whole
+request. Stage timings are recorded on the root deadline so a response can say
+which stage used up the budget.
+"""
+
+import time
+import asyncio
+import logging
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Any, Optional, Awaitable
+
+logger = logging.getLogger("deadline")
+
+STAGE_OK = "ok"
+STAGE_TIMEOUT = "timeout"
+STAGE_ERROR = "error"
+STAGE_CANCELLED = "cancelled"
+
+# aiohttp and requests treat a zero timeout as "no timeout", so never hand one out
+MIN_IO_TIMEOUT = 0.001
+
+_current_deadline: contextvars.ContextVar[Optional["Deadline"]] = contextvars.ContextVar(
+    "deerflow_deadline", default=None
+)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """A stage ran out of its share of the request budget"""
+
+    def __init__(self, stage: str, budget: float):
+        super().__init__(f"Stage {stage} exceeded its {budget:.2f}s budget")
+        self.stage = stage
+        self.budget = budget
+
+
+@dataclass
+class StageRecord:
+    """Timing of one stage run under a deadline"""
+    name: str
+    budget: float
+    elapsed: float
+    status: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class Deadline:
+    """Absolute expiry on the monotonic clock, optionally nested in a parent"""
+
+    def __init__(self, timeout: float, name: str = "request", parent: Optional["Deadline"] = None):
+        self.name = name
+        self.parent = parent
+        self.started_at = time.monotonic()
+        expires_at = self.started_at + max(0.0, timeout)
+        if parent is not None:
+            expires_at = min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+        self.budget = expires_at - self.started_at
+        self.root: "Deadline" = parent.root if parent is not None else self
+        self.stages: List[StageRecord] = []  # Only filled on the root
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def child(self, name: str, timeout: Optional[float] = None) -> "Deadline":
+        """Sub-deadline that never outlives this one"""
+        return Deadline(self.remaining() if timeout is None else timeout, name, parent=self)
+
+    def record_stage(self, name: str, budget: float, elapsed: float, status: str):
+        self.root.stages.append(StageRecord(name, budget, elapsed, status))
+
+    def exhausted_by(self) -> Optional[str]:
+        """First stage that timed out, else the slowest stage once the budget is gone"""
+        stages = self.root.stages
+        for stage in stages:
+            if stage.status == STAGE_TIMEOUT:
+                return stage.name
+        if self.root.expired and stages:
+            return max(stages, key=lambda s: s.elapsed).name
+        return None
+
+    def report(self) -> Dict[str, Any]:
+        root = self.root
+        return {
+            "name": root.name,
+            "budget": root.budget,
+            "elapsed": time.monotonic() - root.started_at,
+            "remaining": root.remaining(),
+            "expired": root.expired,
+            "exhausted_by": self.exhausted_by(),
+            "stages": [stage.to_dict() for stage in root.stages],
+        }
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """Make deadline the current one for this context (and tasks created in it)"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def remaining_timeout(default: float) -> float:
+    """Timeout for an I/O call: the default, capped by the current deadline"""
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+    return max(MIN_IO_TIMEOUT, min(default, deadline.remaining()))
+
+
+async def run_stage(name: str, awaitable: Awaitable, timeout: Optional[float] = None):
+    """Await under a child deadline, recording the stage on the root deadline
+
+    Without a current deadline or timeout the awaitable runs unbounded. On
+    expiry the awaitable is cancelled and DeadlineExceeded is raised.
+    """
+    parent = current_deadline()
+    if parent is None and timeout is None:
+        return await awaitable
+
+    stage = parent.child(name, timeout) if parent is not None else Deadline(timeout, name)
+    status = STAGE_OK
+    start = time.monotonic()
+    token = _current_deadline.set(stage)
+    try:
+        # wait_for runs the awaitable in a task that copies this context
+        return await asyncio.wait_for(awaitable, stage.remaining())
+    except DeadlineExceeded:
+        # A nested stage ran out first; keep its name on the error
+        status = STAGE_TIMEOUT
+        raise
+    except asyncio.TimeoutError:
+        status = STAGE_TIMEOUT
+        logger.warning(f"Stage {name} cancelled after {stage.budget:.2f}s budget")
+        raise DeadlineExceeded(name, stage.budget) from None
+    except asyncio.CancelledError:
+        status = STAGE_CANCELLED
+        raise
+    except Exception:
+        status = STAGE_ERROR
+        raise
+    finally:
+        _current_deadline.reset(token)
+        stage.record_stage(name, stage.budget, time.monotonic() - start, status)
@@ -6,24 +6,132 @@ specialized knowledge and analysis capabilities for different fields.
 """
 
 import asyncio
+import copy
 import json
 import logging
 import time
 import hashlib
+import re
 import yaml
+import numpy as np
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Union, Protocol
+from typing import Dict, List, Any, Optional, Tuple, Union, Protocol
 from dataclasses import dataclass, asdict
 from enum import Enum
 from collections import defaultdict
-from functools import lru_cache
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from itertools import chain
 
 # Import our reasoning engine
 from reasoning_engine import reasoning_engine, Evidence, EvidenceType
+from async_cache import AsyncTTLCache, CACHE_MISS
+from deadline import Deadline, DeadlineExceeded, current_deadline, deadline_scope, run_stage
 
 logger = logging.getLogger("domain_agents")
 
+# Used when domain_config.yaml does not provide global timeouts
+DEFAULT_STAGE_TIMEOUTS = {
+    "analysis_timeout": 30.0,
+    "evidence_processing_timeout": 60.0,
+    "orchestration_timeout": 120.0
+}
+
+@lru_cache(maxsize=256)
+def _term_pattern(words: Tuple[str, ...]) -> "re.Pattern":
+    """One alternation per keyword set, longest first"""
+    return re.compile("|".join(map(re.escape, sorted(words, key=len, reverse=True))))
+
+
+class EvidenceBatch:
+    """Evidence tokenized once into a term index shared by every agent in a request
+
+    The orchestrator builds one batch per request and hands it to all agents.
+    Content is lowercased and split into terms once; the batch keeps its
+    distinct terms (the vocabulary) and an item-by-term incidence list. An
+    agent's keywords are matched against the vocabulary only, and the matching
+    terms are mapped back to items with array operations.
+    """
+
+    def __init__(self, evidence: List):
+        self.items = list(evidence)
+        self.texts = [(getattr(ev, 'content', '') or '').lower() for ev in self.items]
+        self._vocabulary: Optional[str] = None
+
+    @classmethod
+    def ensure(cls, evidence) -> "EvidenceBatch":
+        return evidence if isinstance(evidence, cls) else cls(evidence or [])
+
+    def _build_index(self):
+        # Terms are maximal runs of non-whitespace. A keyword without whitespace
+        # can only occur inside one, so matching terms is the same as matching text
+        term_sets = [set(text.split()) for text in self.texts]
+        flat = list(chain.from_iterable(term_sets))
+        vocabulary = list(dict.fromkeys(flat))
+        term_ids = {term: i for i, term in enumerate(vocabulary)}
+
+        # Incidence pairs: item row_of[j] contains vocabulary term term_of[j]
+        self._term_of = np.fromiter(map(term_ids.__getitem__, flat), dtype=np.int64, count=len(flat))
+        self._row_of = np.repeat(
+            np.arange(len(term_sets)), np.fromiter(map(len, term_sets), dtype=np.int64, count=len(term_sets))
+        )
+        # Terms joined by whitespace so a keyword match never spans two terms
+        self._vocabulary = "\n".join(vocabulary)
+        lengths = np.fromiter(map(len, vocabulary), dtype=np.int64, count=len(vocabulary))
+        self._term_starts = np.concatenate(([0], np.cumsum(lengths[:-1] + 1))) if len(vocabulary) else lengths
+        self._vocabulary_size = len(vocabulary)
+
+    def _items_with_terms_matching(self, words: Tuple[str, ...]) -> np.ndarray:
+        """Mask of items with a term containing any of ``words``"""
+        if self._vocabulary is None:
+            self._build_index()
+        mask = np.zeros(len(self.items), dtype=bool)
+        starts = np.fromiter((m.start() for m in _term_pattern(words).finditer(self._vocabulary)), dtype=np.int64)
+        if starts.size:
+            term_hits = np.zeros(self._vocabulary_size, dtype=bool)
+            term_hits[np.searchsorted(self._term_starts, starts, side="right") - 1] = True
+            mask[self._row_of[term_hits[self._term_of]]] = True
+        return mask
+
+    def relevance_mask(self, keywords: Tuple[str, ...]) -> np.ndarray:
+        """Boolean mask of items whose content contains any of the keywords
+
+        Same result as a substring check per item. Single-word keywords are
+        answered from the term index. A multi-word keyword ("interest rate")
+        is only checked against the text of items that contain all of its
+        words and are not already matched.
+        """
+        mask = np.zeros(len(self.items), dtype=bool)
+        if not keywords or not self.items:
+            return mask
+        if "" in keywords:
+            mask[:] = True
+            return mask
+
+        words = tuple(k for k in keywords if k.split() == [k])
+        if words:
+            mask |= self._items_with_terms_matching(words)
+
+        for phrase in keywords:
+            if phrase in words:
+                continue
+            candidates = ~mask
+            for part in phrase.split():
+                candidates &= self._items_with_terms_matching((part,))
+            for index in np.flatnonzero(candidates):
+                if phrase in self.texts[index]:
+                    mask[index] = True
+        return mask
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
 @dataclass
 class DomainInsight:
     """Represents a domain-specific insight"""
@@ -51,6 +159,12 @@ class BaseDomainAgent:
         # Error tracking
         self._error_history = []
 
+        # Evidence pipeline: keyword cache and insight fan-out bounds
+        self._relevance_keywords: Optional[Tuple[str, ...]] = None
+        self._relevance_keywords_source = None
+        self.insight_chunk_size = 256
+        self.max_insight_concurrency = 8
+
         # Initialize keyword categories
         self._keyword_categories = {
             "primary": [],
@@ -122,64 +236,70 @@ class BaseDomainAgent:
             logger.error(f"Evidence processing failed for {self.domain_name}: {e}")
             return await self._process_evidence_safely(evidence)
 
-    async def _process_evidence_concurrently(self, evidence: List) -> List:
-        """Process evidence concurrently for better performance"""
-        # Group evidence by type for better processing
-        grouped_evidence = self._group_evidence(evidence)
+    async def _process_evidence_concurrently(self, evidence) -> List:
+        """Score the whole batch at once, then fan out insight generation in bounded chunks"""
+        batch = EvidenceBatch.ensure(evidence)
+        relevant = np.flatnonzero(self.score_evidence_relevance(batch))
+        if relevant.size == 0:
+            return []
 
-        # Process each group concurrently
-        tasks = []
-        for evidence_type, evidence_group in grouped_evidence.items():
-            tasks.append(self._process_evidence_group(evidence_type, evidence_group))
+        semaphore = asyncio.Semaphore(self.max_insight_concurrency)
 
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        async def generate_chunk(indices: np.ndarray) -> List:
+            async with semaphore:
+                chunk_insights = []
+                for index in indices:
+                    insight = await self._generate_insight_async(batch.items[index])
+                    if insight:
+                        chunk_insights.append(insight)
+                # Let other coroutines run between chunks of synchronous work
+                await asyncio.sleep(0)
+                return chunk_insights
+
+        chunks = [
+            relevant[start:start + self.insight_chunk_size]
+            for start in range(0, relevant.size, self.insight_chunk_size)
+        ]
+        results = await asyncio.gather(*(generate_chunk(chunk) for chunk in chunks), return_exceptions=True)
 
-        # Flatten results and filter out exceptions
+        # Flatten results (gather keeps evidence order) and filter out exceptions
         insights = []
         for result in results:
             if isinstance(result, list):
                 insights.extend(result)
-            elif not isinstance(result, Exception):
-                insights.append(result)
+            else:
+                logger.error(f"Insight generation chunk failed for {self.domain_name}: {result}")
 
         return insights
 
-    def _group_evidence(self, evidence: List) -> Dict[str, List]:
-        """Group evidence by type or relevance for better processing"""
-        groups = defaultdict(list)
-
-        for ev in evidence:
-            # Simple grouping by content length - can be enhanced
-            content_length = len(getattr(ev, 'content', ''))
-            if content_length > 1000:
-                groups['detailed'].append(ev)
-            elif content_length > 200:
-                groups['medium'].append(ev)
-            else:
-                groups['brief'].append(ev)
-
-        return dict(groups)
+    def _get_relevance_keywords(self) -> Tuple[str, ...]:
+        """Deduplicated keyword tuple, rebuilt only when the keyword lists change"""
+        all_keywords = []
+        for category_keywords in self._keyword_categories.values():
+            all_keywords.extend(category_keywords)
 
-    async def _process_evidence_group(self, group_type: str, evidence_group: List) -> List:
-        """Process a group of evidence"""
-        insights = []
+        if not all_keywords:
+            all_keywords = self.specialized_keywords
 
-        for ev in evidence_group:
-            if self._is_domain_relevant(ev):
-                insight = await self._generate_insight_async(ev)
-                if insight:
-                    insights.append(insight)
+        source = tuple(all_keywords)
+        if source != self._relevance_keywords_source:
+            self._relevance_keywords = tuple(dict.fromkeys(source))
+            self._relevance_keywords_source = source
+        return self._relevance_keywords
 
-        return insights
+    def score_evidence_relevance(self, evidence) -> np.ndarray:
+        """Relevance mask for every evidence item in the batch"""
+        return EvidenceBatch.ensure(evidence).relevance_mask(self._get_relevance_keywords())
 
-    async def _process_evidence_safely(self, evidence: List) -> List:
+    async def _process_evidence_safely(self, evidence) -> List:
         """Safe evidence processing with individual error handling"""
         insights = []
         errors = []
+        keywords = self._get_relevance_keywords()
 
-        for ev in evidence:
+        for ev in EvidenceBatch.ensure(evidence).items:
             try:
-                if self._is_domain_relevant(ev):
+                if self._is_domain_relevant(ev, keywords):
                     insight = await self._generate_insight_async(ev)
                     if insight:
                         insights.append(insight)
@@ -198,19 +318,12 @@ class BaseDomainAgent:
 
         return insights
 
-    def _is_domain_relevant(self, evidence) -> bool:
-        """Enhanced domain relevance check"""
-        content = getattr(evidence, 'content', '')
-
-        # Check against all keyword categories
-        all_keywords = []
-        for category_keywords in self._keyword_categories.values():
-            all_keywords.extend(category_keywords)
-
-        if not all_keywords:
-            all_keywords = self.specialized_keywords
-
-        return any(keyword in content.lower() for keyword in all_keywords)
+    def _is_domain_relevant(self, evidence, keywords: Optional[Tuple[str, ...]] = None) -> bool:
+        """Enhanced domain relevance check; pass keywords when checking a whole batch"""
+        if keywords is None:
+            keywords = self._get_relevance_keywords()
+        content = (getattr(evidence, 'content', '') or '').lower()
+        return any(keyword in content for keyword in keywords)
 
     async def _generate_insight_async(self, evidence) -> Optional[Dict]:
         """Enhanced async insight generation"""
@@ -654,6 +767,21 @@ class DomainAgentOrchestrator:
         self.cache_manager = CachedAnalysisManager(cache_size=256)
         self._initialized = False
 
+        # Cached analyses depend on keywords and thresholds
+        if OPTIMIZED_CONFIG_AVAILABLE:
+            optimized_domain_config.subscribe_to_changes(self._on_config_change)
+
+    def _on_config_change(self, changes: Dict[str, Any]):
+        """Drop cached analyses when domain configuration changes"""
+        self.invalidate_caches()
+        logger.info(f"Domain analysis caches invalidated after config change: {list(changes.keys())}")
+
+    def invalidate_caches(self):
+        """Invalidate orchestrator and per-agent analysis caches"""
+        self.cache_manager.clear_cache()
+        for agent in self.agents.values():
+            agent.cache_manager.clear_cache()
+
     async def __aenter__(self):
         """Async context manager entry"""
         await self._initialize_agents()
@@ -691,25 +819,56 @@ class DomainAgentOrchestrator:
 
         logger.info("Domain agents cleaned up")
 
+    def _stage_timeout(self, name: str) -> float:
+        """Stage timeout from the global config, falling back to defaults"""
+        if OPTIMIZED_CONFIG_AVAILABLE:
+            timeouts = optimized_domain_config.get_global_setting("timeouts") or {}
+            try:
+                return float(timeouts[name])
+            except (KeyError, TypeError, ValueError):
+                pass
+        return DEFAULT_STAGE_TIMEOUTS[name]
+
     async def process_with_domain_expertise(
         self, 
         query: str, 
-        evidence: Optional[List] = None
+        evidence: Optional[List] = None,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
-        """Enhanced processing with caching and error handling"""
-
-        try:
-            async with self.performance_monitor.measure("domain_orchestration"):
-                # Check cache first
-                cache_key = self._generate_cache_key(query, evidence)
+        """Enhanced processing with caching, deadlines and error handling
+
+        Runs under ``deadline`` or the caller's current deadline, else a new one
+        of ``orchestration_timeout`` seconds. Agents that miss their stage
+        timeout are cancelled and the result is marked incomplete.
+        """
+        deadline = deadline or current_deadline() or Deadline(
+            self._stage_timeout("orchestration_timeout"), "domain_orchestration"
+        )
 
-                return await self.cache_manager.get_or_compute(
-                    cache_key,
-                    lambda: self._perform_domain_analysis(query, evidence)
-                )
-        except Exception as e:
-            logger.error(f"Domain orchestration failed: {e}")
-            return await self._fallback_analysis(query)
+        cache_key = self._generate_cache_key(query, evidence)
+        with deadline_scope(deadline):
+            try:
+                async with self.performance_monitor.measure("domain_orchestration"):
+                    return await run_stage(
+                        "domain_orchestration",
+                        self.cache_manager.get_or_compute(
+                            cache_key,
+                            lambda: self._perform_domain_analysis(query, evidence)
+                        ),
+                        self._stage_timeout("orchestration_timeout")
+                    )
+            except DeadlineExceeded as e:
+                logger.warning(f"Domain orchestration ran out of time: {e}")
+                # The shielded computation outlives this call; detach it so its
+                # result is not stored and the next request computes afresh
+                self.cache_manager.invalidate(cache_key)
+                fallback = await self._fallback_analysis(query)
+                fallback["complete"] = False
+                fallback["deadline"] = deadline.report()
+                return fallback
+            except Exception as e:
+                logger.error(f"Domain orchestration failed: {e}")
+                return await self._fallback_analysis(query)
 
     def _generate_cache_key(self, query: str, evidence: Optional[List] = None) -> str:
         """Generate cache key for the analysis"""
@@ -742,6 +901,17 @@ class DomainAgentOrchestrator:
             query, analysis_results, relevant_agents
         )
 
+        timed_out = [
+            f"{result['agent_name']}.{result['method']}"
+            for result in analysis_results
+            if isinstance(result, dict) and result.get("status") == "timeout"
+        ]
+        consolidated["complete"] = not timed_out
+        consolidated["timed_out"] = timed_out
+        deadline = current_deadline()
+        if deadline is not None:
+            consolidated["deadline"] = deadline.report()
+
         # Store in history
         self._store_analysis_history(query, relevant_agents, consolidated)
 
@@ -753,21 +923,26 @@ class DomainAgentOrchestrator:
         evidence: Optional[List],
         relevant_agents: Dict[str, Any]
     ) -> List[Any]:
-        """Execute analysis tasks in parallel with error handling"""
+        """Execute analysis tasks in parallel, each bounded by its stage timeout"""
 
         analysis_tasks = []
+        analysis_timeout = self._stage_timeout("analysis_timeout")
+        evidence_timeout = self._stage_timeout("evidence_processing_timeout")
 
         # Query analysis tasks
         for agent_name, agent in relevant_agents.items():
             analysis_tasks.append(
-                self._safe_agent_analysis(agent, "analyze_query", query, agent_name)
+                self._bounded_agent_analysis(agent, "analyze_query", query, agent_name, analysis_timeout)
             )
 
-        # Evidence processing tasks
+        # Evidence processing tasks share one pre-lowered evidence batch
         if evidence:
+            shared_evidence = EvidenceBatch.ensure(evidence)
             for agent_name, agent in relevant_agents.items():
                 analysis_tasks.append(
-                    self._safe_agent_analysis(agent, "process_evidence", evidence, agent_name)
+                    self._bounded_agent_analysis(
+                        agent, "process_evidence", shared_evidence, agent_name, evidence_timeout
+                    )
                 )
 
         # Execute all tasks
@@ -781,6 +956,30 @@ class DomainAgentOrchestrator:
 
         return valid_results
 
+    async def _bounded_agent_analysis(
+        self,
+        agent,
+        method_name: str,
+        data: Any,
+        agent_name: str,
+        timeout: float
+    ) -> Optional[Any]:
+        """Run one agent method as a deadline stage, cancelling it on timeout"""
+        stage_name = f"{agent_name}.{method_name}"
+        try:
+            return await run_stage(
+                stage_name,
+                self._safe_agent_analysis(agent, method_name, data, agent_name),
+                timeout
+            )
+        except DeadlineExceeded as e:
+            return {
+                "agent_name": agent_name,
+                "method": method_name,
+                "error": str(e),
+                "status": "timeout"
+            }
+
     async def _safe_agent_analysis(
         self, 
         agent, 
@@ -874,7 +1073,8 @@ class DomainAgentOrchestrator:
             "performance_metrics": performance_stats,
             "cache_stats": {
                 "cache_size": len(self.cache_manager._cache),
-                "cache_capacity": self.cache_manager.cache_size
+                "cache_capacity": self.cache_manager.cache_size,
+                **self.cache_manager.get_stats()
             },
             "agent_performance": {
                 name: agent.get_performance_stats() 
@@ -973,9 +1173,16 @@ class PerformanceMonitor:
 class CachedAnalysisManager:
     """Manage caching of analysis results"""
 
-    def __init__(self, cache_size: int = 1024):
+    def __init__(self, cache_size: int = 1024, ttl: float = 300.0):
         self.cache_size = cache_size
-        self._cache = lru_cache(maxsize=cache_size)(self._cache_get)
+        self._cache = AsyncTTLCache(
+            maxsize=cache_size, ttl=ttl, name="domain_analysis", cacheable=self._is_cacheable
+        )
+
+    @staticmethod
+    def _is_cacheable(result: Any) -> bool:
+        """Partial results (complete=False) must not be served to later requests"""
+        return not (isinstance(result, dict) and result.get("complete") is False)
 
     def get_cache_key(self, query: str, evidence_ids: List[str]) -> str:
         """Generate cache key"""
@@ -983,25 +1190,29 @@ class CachedAnalysisManager:
         return hashlib.md5(key_data.encode()).hexdigest()
 
     async def get_or_compute(self, cache_key: str, computer_func):
-        """Get from cache or compute if not in cache"""
-        try:
-            return await self._cache(cache_key, computer_func)
-        except Exception as e:
-            logger.error(f"Cache operation failed: {e}")
-            return await computer_func()
+        """Get from cache or compute once per key if not in cache"""
+        result, status = await self._cache.fetch(cache_key, computer_func)
+        if status == CACHE_MISS:
+            logger.info(f"Cache miss for key: {cache_key[:20]}...")
 
-    async def _cache_get(self, cache_key: str, computer_func):
-        """Internal cache get method"""
-        logger.info(f"Cache miss for key: {cache_key[:20]}...")
-        result = await computer_func()
         if isinstance(result, dict):
+            # Callers annotate results in place, so never hand out the cached object
+            result = copy.deepcopy(result)
             result["metadata"] = result.get("metadata", {})
-            result["metadata"]["cache_used"] = False
+            result["metadata"]["cache_used"] = status != CACHE_MISS
         return result
 
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit, miss and coalesce counters"""
+        return self._cache.get_stats()
+
+    def invalidate(self, cache_key: str):
+        """Drop a single cached result"""
+        self._cache.invalidate(cache_key)
+
     def clear_cache(self):
         """Clear the cache"""
-        self._cache.cache_clear()
+        self._cache.clear()
         logger.info("Analysis cache cleared")
 
 class RelevanceScorer:
@@ -1071,6 +1282,13 @@ except ImportError:
     CONFIG_AVAILABLE = False
     domain_config = None
 
+try:
+    from domain_config import optimized_domain_config
+    OPTIMIZED_CONFIG_AVAILABLE = True
+except ImportError:
+    OPTIMIZED_CONFIG_AVAILABLE = False
+    optimized_domain_config = None
+
 try:
     from reasoning_engine import reasoning_engine, Evidence, EvidenceType
     ADVANCED_REASONING_AVAILABLE = True
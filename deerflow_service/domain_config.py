@@ -15,12 +15,13 @@ import re
 import time
 import hashlib
 import copy
-from typing import Dict, Any, Optional, List, Set, Callable, Union, Tuple, FrozenSet
+from typing import Dict, Any, Optional, List, Set, Callable, Union, Tuple, FrozenSet, Mapping
 from pathlib import Path
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from enum import Enum
-from functools import lru_cache
+from types import MappingProxyType
+from collections import OrderedDict
 from abc import ABC, abstractmethod
 
 # Pydantic for validation
@@ -451,89 +452,159 @@ class ConfigChangeNotifier:
         if tasks:
             await asyncio.gather(*tasks, return_exceptions=True)
 
+class ConfigSnapshot:
+    """Immutable, fully built view of one configuration version
+
+    A snapshot is validated and indexed before it is published, so readers
+    holding one never see half-built state. Treat ``configs`` and the schema
+    objects as read-only.
+    """
+
+    __slots__ = (
+        "version", "configs", "validated_configs", "keyword_sets",
+        "compiled_patterns", "_keyword_lists", "created_at"
+    )
+
+    def __init__(self, version: int, configs: Dict[str, Any]):
+        self.version = version
+        self.configs = configs
+        self.created_at = datetime.now()
+
+        validated: Dict[str, Union[DomainConfigSchema, GlobalConfigSchema]] = {}
+        if "global" in configs:
+            try:
+                validated["global"] = GlobalConfigSchema(**configs["global"])
+            except Exception as e:
+                logger.error(f"Invalid global configuration: {e}")
+                validated["global"] = GlobalConfigSchema()
+
+        for domain, config in configs.items():
+            if domain != "global":
+                try:
+                    validated[domain] = DomainConfigSchema(**config)
+                except Exception as e:
+                    logger.error(f"Invalid configuration for domain {domain}: {e}")
+                    validated[domain] = DomainConfigSchema()
+        self.validated_configs = MappingProxyType(validated)
+
+        # Precomputed keyword indices
+        keyword_sets: Dict[str, Mapping[str, FrozenSet[str]]] = {}
+        compiled_patterns: Dict[str, re.Pattern] = {}
+        keyword_lists: Dict[Tuple[str, Optional[str]], Tuple[str, ...]] = {}
+        for domain, config in validated.items():
+            if not isinstance(config, DomainConfigSchema):
+                continue
+            categories = {}
+            all_keywords: List[str] = []
+            for category, keyword_list in config.keywords.dict().items():
+                # Use frozenset for O(1) lookups
+                categories[category] = frozenset(kw.lower() for kw in keyword_list)
+                keyword_lists[(domain, category)] = tuple(keyword_list)
+                all_keywords.extend(keyword_list)
+
+                # Pre-compile regex patterns for complex matching
+                pattern = '|'.join(re.escape(kw) for kw in keyword_list)
+                if pattern:
+                    compiled_patterns[f"{domain}_{category}"] = re.compile(pattern, re.IGNORECASE)
+            keyword_sets[domain] = MappingProxyType(categories)
+            keyword_lists[(domain, None)] = tuple(
+                kw for cat in ["primary", "secondary", "contextual"] for kw in keyword_lists.get((domain, cat), ())
+            )
+        self.keyword_sets = MappingProxyType(keyword_sets)
+        self.compiled_patterns = MappingProxyType(compiled_patterns)
+        self._keyword_lists = MappingProxyType(keyword_lists)
+
+    def get_domain_config(self, domain: str) -> Optional[DomainConfigSchema]:
+        config = self.validated_configs.get(domain)
+        return config if isinstance(config, DomainConfigSchema) else None
+
+    def get_keywords(self, domain: str, category: Optional[str] = None) -> Tuple[str, ...]:
+        return self._keyword_lists.get((domain, category), ())
+
+    def match_keywords(
+        self,
+        text: str,
+        domain: str,
+        category: Optional[str] = None
+    ) -> Tuple[bool, List[str]]:
+        """Match keywords in text against this snapshot's indices (uncached)"""
+        domain_sets = self.keyword_sets.get(domain)
+        if domain_sets is None:
+            return False, []
+
+        text_words = set(text.lower().split())
+        categories = [category] if category else domain_sets.keys()
+        matches = []
+        for cat in categories:
+            if cat in domain_sets:
+                # Fast set intersection
+                matches.extend(text_words & domain_sets[cat])
+        return len(matches) > 0, matches
+
+
 class CachedKeywordMatcher:
-    """Optimized keyword matching with caching"""
+    """LRU cache of keyword matches keyed by snapshot version
+
+    Entries from older snapshots can never be returned for a newer one, so a
+    reload needs no locking; stale entries are pruned after the swap.
+    """
     
-    def __init__(self):
-        self.keyword_sets: Dict[str, Dict[str, FrozenSet[str]]] = {}
-        self.compiled_patterns: Dict[str, re.Pattern] = {}
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[Tuple[int, str, str, Optional[str]], Tuple[bool, Tuple[str, ...]]]" = OrderedDict()
         self.cache_stats = {
             "hits": 0,
             "misses": 0,
             "evictions": 0
         }
     
-    def build_keyword_index(self, domain: str, keywords: Dict[str, List[str]]):
-        """Build optimized keyword index for a domain"""
-        if domain not in self.keyword_sets:
-            self.keyword_sets[domain] = {}
-        
-        for category, keyword_list in keywords.items():
-            # Use frozenset for O(1) lookups
-            self.keyword_sets[domain][category] = frozenset(
-                kw.lower() for kw in keyword_list
-            )
-            
-            # Pre-compile regex patterns for complex matching
-            pattern = '|'.join(re.escape(kw) for kw in keyword_list)
-            if pattern:
-                self.compiled_patterns[f"{domain}_{category}"] = re.compile(
-                    pattern, re.IGNORECASE
-                )
-    
-    @lru_cache(maxsize=1024)
     def match_keywords(
         self, 
+        snapshot: ConfigSnapshot,
         text: str, 
         domain: str, 
         category: Optional[str] = None
     ) -> Tuple[bool, List[str]]:
         """Match keywords in text with caching"""
-        text_lower = text.lower()
-        matches = []
-        
-        if domain not in self.keyword_sets:
-            self.cache_stats["misses"] += 1
-            return False, []
-        
-        categories = [category] if category else self.keyword_sets[domain].keys()
-        
-        for cat in categories:
-            if cat in self.keyword_sets[domain]:
-                # Fast set intersection
-                text_words = set(text_lower.split())
-                keyword_matches = text_words & self.keyword_sets[domain][cat]
-                matches.extend(keyword_matches)
-        
-        self.cache_stats["hits"] += 1
-        return len(matches) > 0, list(matches)
-    
+        key = (snapshot.version, text, domain, category)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.cache_stats["hits"] += 1
+            self._cache.move_to_end(key)
+            has_match, matches = cached
+            return has_match, list(matches)
+
+        self.cache_stats["misses"] += 1
+        has_match, matches = snapshot.match_keywords(text, domain, category)
+        self._cache[key] = (has_match, tuple(matches))
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+            self.cache_stats["evictions"] += 1
+        return has_match, matches
+    
+    def retire_versions_before(self, version: int):
+        """Drop entries computed against snapshots older than version"""
+        for key in [key for key in list(self._cache) if key[0] < version]:
+            self._cache.pop(key, None)
+
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
         total = self.cache_stats["hits"] + self.cache_stats["misses"]
         hit_rate = self.cache_stats["hits"] / total if total > 0 else 0
         
-        cache_info = {}
-        if hasattr(self.match_keywords, 'cache_info'):
-            info = self.match_keywords.cache_info()
-            cache_info = {
-                "hits": info.hits,
-                "misses": info.misses,
-                "maxsize": info.maxsize,
-                "currsize": info.currsize
-            }
-        
         return {
             **self.cache_stats,
             "hit_rate": hit_rate,
-            "cache_info": cache_info
+            "cache_info": {
+                "maxsize": self.maxsize,
+                "currsize": len(self._cache)
+            }
         }
     
     def clear_cache(self):
         """Clear the cache"""
-        if hasattr(self.match_keywords, 'cache_clear'):
-            self.match_keywords.cache_clear()
-        self.cache_stats["evictions"] += self.cache_stats["hits"]
+        self.cache_stats["evictions"] += len(self._cache)
+        self._cache.clear()
         self.cache_stats["hits"] = 0
         self.cache_stats["misses"] = 0
 
@@ -556,9 +627,10 @@ class OptimizedDomainConfig:
         self.keyword_matcher = CachedKeywordMatcher()
         self.notifier = ConfigChangeNotifier()
         
-        # Configuration state
-        self.configs: Dict[str, Any] = {}
-        self.validated_configs: Dict[str, Union[DomainConfigSchema, GlobalConfigSchema]] = {}
+        # Configuration state: readers take the current snapshot reference,
+        # reloads build a new one and swap it in
+        self._snapshot = ConfigSnapshot(0, {})
+        self._reload_lock = asyncio.Lock()
         self.last_reload: Optional[datetime] = None
         
         # File watching
@@ -613,70 +685,54 @@ class OptimizedDomainConfig:
         except Exception as e:
             logger.error(f"Failed to start file watching: {e}")
     
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """Current configuration snapshot; hold on to it for consistent reads"""
+        return self._snapshot
+
+    @property
+    def configs(self) -> Dict[str, Any]:
+        return self._snapshot.configs
+
+    @property
+    def validated_configs(self) -> Mapping[str, Union[DomainConfigSchema, GlobalConfigSchema]]:
+        return self._snapshot.validated_configs
+
+    def _publish(self, snapshot: ConfigSnapshot):
+        """Swap in a fully built snapshot (a single reference assignment)"""
+        self._snapshot = snapshot
+        if self.enable_caching:
+            self.keyword_matcher.retire_versions_before(snapshot.version)
+
     async def reload_configuration(self):
-        """Reload configuration from all sources"""
-        try:
-            old_configs = self.configs.copy()
-            
-            # Load and merge configurations
-            self.configs = await self.config_manager.load_all()
-            
-            # Validate configurations
-            self._validate_all_configs()
-            
-            # Rebuild keyword indices
-            self._rebuild_keyword_indices()
-            
-            # Clear caches
-            if self.enable_caching:
-                self.keyword_matcher.clear_cache()
-            
-            self.last_reload = datetime.now()
-            
-            # Notify subscribers of changes
-            changes = self._detect_changes(old_configs, self.configs)
-            if changes:
-                await self.notifier.notify(changes)
-            
-            logger.info("Configuration reloaded successfully")
-            
-        except Exception as e:
-            logger.error(f"Failed to reload configuration: {e}")
-            # Keep old configuration on error
-            if not self.configs:
-                self.configs = self._get_default_config()
-    
-    def _validate_all_configs(self):
-        """Validate all domain configurations"""
-        self.validated_configs = {}
-        
-        # Validate global config
-        if "global" in self.configs:
+        """Reload configuration from all sources
+
+        The new snapshot is validated and indexed in a worker thread and then
+        published atomically; readers keep using the old one until the swap.
+        """
+        async with self._reload_lock:
+            old_snapshot = self._snapshot
             try:
-                self.validated_configs["global"] = GlobalConfigSchema(
-                    **self.configs["global"]
-                )
+                # Load and merge configurations
+                configs = await self.config_manager.load_all()
+
+                # Validate and index off the event loop
+                snapshot = await asyncio.to_thread(ConfigSnapshot, old_snapshot.version + 1, configs)
+                self._publish(snapshot)
+                self.last_reload = datetime.now()
+
+                # Notify subscribers of changes
+                changes = self._detect_changes(old_snapshot.configs, snapshot.configs)
+                if changes:
+                    await self.notifier.notify(changes)
+
+                logger.info(f"Configuration reloaded successfully (version {snapshot.version})")
+
             except Exception as e:
-                logger.error(f"Invalid global configuration: {e}")
-                self.validated_configs["global"] = GlobalConfigSchema()
-        
-        # Validate domain configs
-        for domain, config in self.configs.items():
-            if domain != "global":
-                try:
-                    self.validated_configs[domain] = DomainConfigSchema(**config)
-                except Exception as e:
-                    logger.error(f"Invalid configuration for domain {domain}: {e}")
-                    self.validated_configs[domain] = DomainConfigSchema()
-    
-    def _rebuild_keyword_indices(self):
-        """Rebuild keyword indices for all domains"""
-        for domain, config in self.validated_configs.items():
-            if isinstance(config, DomainConfigSchema):
-                self.keyword_matcher.build_keyword_index(
-                    domain,
-                    config.keywords.dict()
-                )
+                logger.error(f"Failed to reload configuration: {e}")
+                # Keep old configuration on error
+                if not old_snapshot.configs:
+                    self._publish(ConfigSnapshot(old_snapshot.version + 1, self._get_default_config()))
     
     def _detect_changes(
         self, 
@@ -725,30 +781,18 @@ class OptimizedDomainConfig:
         if not self._initialized:
             asyncio.create_task(self.initialize())
             
-        config = self.validated_configs.get(domain)
-        if isinstance(config, DomainConfigSchema):
-            return config
-        return None
+        return self._snapshot.get_domain_config(domain)
     
     def get_keywords(
         self, 
         domain: str, 
         category: Optional[str] = None
     ) -> List[str]:
-        """Get keywords with caching"""
-        config = self.get_domain_config(domain)
-        if not config:
-            return []
-        
-        if category:
-            return getattr(config.keywords, category, [])
-        
-        # Return all keywords
-        all_keywords = []
-        for cat in ["primary", "secondary", "contextual"]:
-            all_keywords.extend(getattr(config.keywords, cat, []))
-        
-        return all_keywords
+        """Get keywords from the precomputed snapshot index"""
+        if not self._initialized:
+            asyncio.create_task(self.initialize())
+
+        return list(self._snapshot.get_keywords(domain, category))
     
     def match_keywords_in_text(
         self,
@@ -757,11 +801,12 @@ class OptimizedDomainConfig:
         category: Optional[str] = None
     ) -> Tuple[bool, List[str]]:
         """Match keywords in text with caching"""
+        snapshot = self._snapshot
         if self.enable_caching:
-            return self.keyword_matcher.match_keywords(text, domain, category)
+            return self.keyword_matcher.match_keywords(snapshot, text, domain, category)
         
         # Non-cached version
-        keywords = self.get_keywords(domain, category)
+        keywords = snapshot.get_keywords(domain, category)
         text_lower = text.lower()
         matches = [kw for kw in keywords if kw.lower() in text_lower]
         return len(matches) > 0, matches
@@ -775,7 +820,7 @@ class OptimizedDomainConfig:
     
     def get_global_setting(self, setting_name: str) -> Any:
         """Get global configuration setting"""
-        global_config = self.validated_configs.get("global")
+        global_config = self._snapshot.validated_configs.get("global")
         if isinstance(global_config, GlobalConfigSchema):
             return getattr(global_config, setting_name, None)
         return None
@@ -786,10 +831,12 @@ class OptimizedDomainConfig:
     
     def get_configuration_health(self) -> Dict[str, Any]:
         """Get configuration system health status"""
+        snapshot = self._snapshot
         return {
-            "status": "healthy" if self.configs else "unhealthy",
+            "status": "healthy" if snapshot.configs else "unhealthy",
+            "config_version": snapshot.version,
             "last_reload": self.last_reload.isoformat() if self.last_reload else None,
-            "domains_loaded": len([d for d in self.validated_configs if d != "global"]),
+            "domains_loaded": len([d for d in snapshot.validated_configs if d != "global"]),
             "hot_reload_enabled": self.enable_hot_reload,
             "caching_enabled": self.enable_caching,
             "cache_stats": self.keyword_matcher.get_cache_stats() if self.enable_caching else {},
@@ -11,6 +11,9 @@ import time
 import logging
 from functools import lru_cache
 
+from tool_cache import ToolCache, CacheBackend, MemoryLRUBackend, DiskBackend, SERIALIZERS
+from sandbox_pool import SandboxPool, SandboxError
+
 logger = logging.getLogger("enhanced_tools")
 
 class ToolCategory(Enum):
@@ -375,6 +378,12 @@ class CodeExecutionTool(BaseTool):
         self.sandbox_config = sandbox_config
         self.allowed_modules = sandbox_config.get("allowed_modules", ["math", "statistics", "json"])
         self.timeout = sandbox_config.get("timeout", 30)
+        self.pool = SandboxPool(
+            size=sandbox_config.get("workers", 2),
+            memory_limit_mb=sandbox_config.get("memory_limit_mb", 256),
+            cpu_limit=sandbox_config.get("cpu_limit", self.timeout),
+            max_result_bytes=sandbox_config.get("max_result_bytes", 1024 * 1024)
+        )
         
         # Define parameters
         self.add_parameter(ToolParameter(
@@ -406,11 +415,8 @@ class CodeExecutionTool(BaseTool):
                     error="Code contains unsafe operations"
                 )
             
-            # Execute in sandbox with timeout
-            result = await asyncio.wait_for(
-                self._execute_in_sandbox(code, context),
-                timeout=self.timeout
-            )
+            # Execute in a sandbox worker; the pool enforces the timeout
+            result = await self._execute_in_sandbox(code, context)
             
             return ToolResult(
                 success=True,
@@ -457,60 +463,15 @@ class CodeExecutionTool(BaseTool):
             return False
     
     async def _execute_in_sandbox(self, code: str, context: Dict) -> Any:
-        """Execute code in isolated environment"""
-        # Create safe execution environment
-        safe_globals = {
-            "__builtins__": {
-                "len": len,
-                "range": range,
-                "sum": sum,
-                "max": max,
-                "min": min,
-                "abs": abs,
-                "round": round,
-                "sorted": sorted,
-                "list": list,
-                "dict": dict,
-                "set": set,
-                "tuple": tuple,
-                "str": str,
-                "int": int,
-                "float": float,
-                "bool": bool
-            }
-        }
-        
-        # Add allowed modules
-        for module_name in self.allowed_modules:
-            if module_name == "math":
-                import math
-                safe_globals["math"] = math
-            elif module_name == "statistics":
-                import statistics
-                safe_globals["statistics"] = statistics
-            elif module_name == "json":
-                import json
-                safe_globals["json"] = json
-        
-        # Add context variables
-        safe_globals.update(context)
-        
-        # Execute code
-        exec_globals = {}
-        exec(code, safe_globals, exec_globals)
-        
-        # Return the result
-        if "result" in exec_globals:
-            return exec_globals["result"]
-        else:
-            # Try to evaluate the last expression
-            import ast
-            tree = ast.parse(code)
-            if tree.body and isinstance(tree.body[-1], ast.Expr):
-                return eval(compile(ast.Expression(tree.body[-1].value), 
-                                  '<string>', 'eval'), safe_globals)
-        
-        return None
+        """Execute code in a pooled worker process"""
+        try:
+            return await self.pool.execute(code, context, self.allowed_modules, timeout=self.timeout)
+        except SandboxError as e:
+            raise RuntimeError(str(e)) from None
+    
+    async def close(self):
+        """Stop the sandbox workers"""
+        await self.pool.close()
 
 class DependencyContainer:
     """Simple dependency injection container"""
@@ -623,34 +584,64 @@ class EnhancedToolRegistry:
         return metrics
 
 class CacheManager:
-    """Simple cache manager for tools"""
+    """Bounded tool result cache
+
+    Config keys: ``ttl`` (default TTL seconds), ``max_bytes`` and
+    ``max_entries`` (memory LRU bounds), ``serializer`` ("pickle" or "json"),
+    ``spill_dir``/``spill_max_bytes`` (optional disk tier for evicted entries)
+    and ``sweep_interval`` (background expiry tick). Stats are kept per tool,
+    taken from the key prefix ("financial:AAPL:..." counts under "financial").
+    """
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.cache = {}
-        self.ttl_cache = {}
+        self.default_ttl = config.get("ttl", 300)
+        
+        tiers: List[CacheBackend] = [MemoryLRUBackend(
+            max_bytes=config.get("max_bytes", 64 * 1024 * 1024),
+            max_entries=config.get("max_entries", config.get("max_size", 10000))
+        )]
+        if config.get("spill_dir"):
+            tiers.append(DiskBackend(
+                config["spill_dir"],
+                max_bytes=config.get("spill_max_bytes", 512 * 1024 * 1024)
+            ))
+        
+        serializer = config.get("serializer", "pickle")
+        if isinstance(serializer, str):
+            serializer = SERIALIZERS[serializer]()
+        
+        self.store = ToolCache(
+            tiers,
+            serializer=serializer,
+            default_ttl=self.default_ttl,
+            sweep_interval=config.get("sweep_interval", 1.0)
+        )
     
-    async def get(self, key: str) -> Optional[Any]:
+    async def get(self, key: str, tool: Optional[str] = None) -> Optional[Any]:
         """Get value from cache"""
-        if key in self.ttl_cache:
-            if time.time() > self.ttl_cache[key]:
-                # TTL expired
-                del self.cache[key]
-                del self.ttl_cache[key]
-                return None
-        
-        return self.cache.get(key)
+        return await self.store.get(key, tool=tool)
     
-    async def set(self, key: str, value: Any, ttl: int = 300):
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None, tool: Optional[str] = None):
         """Set value in cache with TTL"""
-        self.cache[key] = value
-        self.ttl_cache[key] = time.time() + ttl
+        await self.store.set(key, value, ttl=self.default_ttl if ttl is None else ttl, tool=tool)
     
     async def delete(self, key: str):
         """Delete key from cache"""
-        self.cache.pop(key, None)
-        self.ttl_cache.pop(key, None)
+        await self.store.delete(key)
+    
+    async def clear(self):
+        """Drop every cached entry"""
+        await self.store.clear()
+    
+    async def close(self):
+        """Stop background expiry"""
+        await self.store.close()
     
     def size(self) -> int:
         """Get cache size"""
-        return len(self.cache)
+        return len(self.store)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit ratio, evictions and bytes, overall and per tool"""
+        return self.store.get_stats()
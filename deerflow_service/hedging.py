@@ -0,0 +1,182 @@
+"""
+Hedged Requests for DeerFlow
+
+This module races equivalent providers to cut tail latency. The first provider
+is called right away. If it has not answered by its recently observed p95
+latency, a backup request goes to the next provider, and the first successful
+answer wins while the others are cancelled (their elapsed time still enters
+the latency window as a lower bound). A failure moves on to the next
+provider immediately. Each backup provider has a hedge budget (a token bucket
+refilled by a fraction of the requests that could hedge to it), so hedging
+cannot multiply load during an outage.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+
+logger = logging.getLogger("hedging")
+
+Attempt = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+class HedgeBudget:
+    """Token bucket: each request that could hedge to a provider earns it ``ratio`` tokens"""
+
+    def __init__(self, ratio: float = 0.1, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def earn(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+@dataclass
+class HedgeOutcome:
+    """Which provider answered and how the race went"""
+    provider: str
+    latency: float
+    hedged: bool
+    attempted: List[str]
+
+
+class HedgePolicy:
+    """Per-provider latency windows, hedge delays and hedge budgets"""
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        default_delay: float = 1.0,
+        min_delay: float = 0.02,
+        max_delay: float = 10.0,
+        min_samples: int = 20,
+        window: int = 256,
+        budget_ratio: float = 0.1,
+        budget_burst: float = 5.0
+    ):
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+
+        self.latencies: Dict[str, deque] = {}
+        self.budgets: Dict[str, HedgeBudget] = {}
+        self.stats = {"requests": 0, "hedges": 0, "hedge_wins": 0, "budget_denied": 0, "failovers": 0,
+                      "censored": 0}
+
+    def _budget(self, provider: str) -> HedgeBudget:
+        budget = self.budgets.get(provider)
+        if budget is None:
+            budget = self.budgets[provider] = HedgeBudget(self.budget_ratio, self.budget_burst)
+        return budget
+
+    def record_latency(self, provider: str, latency: float):
+        window = self.latencies.get(provider)
+        if window is None:
+            window = self.latencies[provider] = deque(maxlen=self.window)
+        window.append(latency)
+
+    def hedge_delay(self, provider: str) -> float:
+        """How long to wait for provider before sending a backup request"""
+        window = self.latencies.get(provider)
+        if not window or len(window) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(window)
+        delay = ordered[int(self.quantile * (len(ordered) - 1))]
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    async def run(self, attempts: List[Attempt]) -> Tuple[Any, HedgeOutcome]:
+        """Race attempts in order, hedging on slowness and failing over on errors"""
+        if not attempts:
+            raise ValueError("No providers to call")
+
+        self.stats["requests"] += 1
+        for provider, _ in attempts[1:]:
+            self._budget(provider).earn()
+
+        start = time.monotonic()
+        pending: Dict[asyncio.Task, Tuple[str, float]] = {}
+        attempted: List[str] = []
+        next_index = 0
+        last_error: Optional[BaseException] = None
+
+        def launch():
+            nonlocal next_index
+            provider, factory = attempts[next_index]
+            next_index += 1
+            attempted.append(provider)
+            pending[asyncio.ensure_future(factory())] = (provider, time.monotonic())
+
+        launch()
+        try:
+            while pending:
+                # Hedge once the most recently launched provider passes its usual p95
+                can_hedge = next_index < len(attempts)
+                timeout = None
+                if can_hedge:
+                    newest_provider, launched_at = max(pending.values(), key=lambda p: p[1])
+                    timeout = max(0.0, launched_at + self.hedge_delay(newest_provider) - time.monotonic())
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    backup = attempts[next_index][0]
+                    if self._budget(backup).try_spend():
+                        self.stats["hedges"] += 1
+                        logger.info(f"Hedging to {backup} after {time.monotonic() - start:.2f}s")
+                        launch()
+                    else:
+                        self.stats["budget_denied"] += 1
+                        # Out of budget: wait for what is already in flight
+                        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    provider, launched_at = pending.pop(task)
+                    if task.cancelled():
+                        continue
+                    error = task.exception()
+                    if error is None:
+                        latency = time.monotonic() - launched_at
+                        self.record_latency(provider, latency)
+                        hedged = len(attempted) > 1
+                        if hedged and provider != attempts[0][0]:
+                            self.stats["hedge_wins"] += 1
+                        return task.result(), HedgeOutcome(provider, time.monotonic() - start, hedged, attempted)
+                    last_error = error
+                    logger.warning(f"Provider {provider} failed: {error}")
+
+                # Fail over right away when nothing is left in flight
+                if not pending and next_index < len(attempts):
+                    self.stats["failovers"] += 1
+                    launch()
+        finally:
+            # Losers took at least this long; leaving them out would bias the
+            # p95 low, so their elapsed time is recorded as a censored sample
+            now = time.monotonic()
+            for task, (provider, launched_at) in pending.items():
+                task.cancel()
+                self.record_latency(provider, now - launched_at)
+                self.stats["censored"] += 1
+
+        raise last_error if last_error else RuntimeError("All providers failed")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "hedge_delays": {provider: self.hedge_delay(provider) for provider in self.latencies},
+            "budgets": {provider: budget.tokens for provider, budget in self.budgets.items()}
+        }
@@ -0,0 +1,217 @@
+"""
+Event Loop Monitor for DeerFlow
+
+This module measures event-loop scheduling delay and catches callbacks that
+block the loop. A heartbeat coroutine records how late each wake-up is. A
+watchdog thread posts a probe callback to the loop every sample interval and
+samples the loop thread's stack once the loop has gone longer than the slow
+callback threshold without running one, so the code that blocked the loop is
+captured while it runs. Blocking time is measured from the last probe the loop
+answered, so it is exact to within one sample interval and never understated.
+"""
+
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter, deque
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger("loop_monitor")
+
+StackKey = Tuple[str, ...]
+
+
+@dataclass
+class LoopStall:
+    """A period during which the event loop did not run the heartbeat"""
+    started_at: float
+    duration: float = 0.0
+    samples: int = 0
+    stack: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class LoopMonitor:
+    """Heartbeat-based lag sampler with a stack-sampling watchdog thread"""
+
+    def __init__(
+        self,
+        metrics=None,
+        interval: float = 0.1,
+        slow_callback_threshold: float = 0.1,
+        sample_interval: Optional[float] = None,
+        max_stack_depth: int = 20,
+        max_recent_stalls: int = 50,
+        max_tracked_stacks: int = 100
+    ):
+        self.metrics = metrics
+        self.interval = interval
+        self.slow_callback_threshold = slow_callback_threshold
+        self.sample_interval = sample_interval or slow_callback_threshold / 4
+        self.max_stack_depth = max_stack_depth
+        self.max_tracked_stacks = max_tracked_stacks
+
+        self.current_lag = 0.0
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self.recent_stalls: deque = deque(maxlen=max_recent_stalls)
+        self.blocking_stacks: Counter = Counter()
+
+        self._lock = threading.Lock()
+        self._pending_stalls: deque = deque()  # Finished by the thread, published by the loop
+        self._last_seen = time.monotonic()  # When the loop last answered a probe
+        self._probe_pending = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the heartbeat on the running loop and the watchdog thread"""
+        if self._task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_seen = time.monotonic()
+        self._probe_pending = False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watchdog, name="loop-monitor", daemon=True)
+        self._thread.start()
+        self._task = asyncio.create_task(self._heartbeat_loop())
+        logger.info(
+            f"Loop monitor started (interval={self.interval}s, "
+            f"slow callback threshold={self.slow_callback_threshold}s)"
+        )
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _heartbeat_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+
+            self.current_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if self.metrics:
+                self.metrics.record_operation_time("event_loop_lag", lag)
+            self._publish_stalls()
+
+    def _publish_stalls(self):
+        """Move stalls recorded by the watchdog into metrics (on the loop thread)"""
+        while self._pending_stalls:
+            stall = self._pending_stalls.popleft()
+            if self.metrics:
+                self.metrics.counters["event_loop_stalls"] += 1
+                self.metrics.histograms["event_loop_stall_duration"].record(stall.duration)
+
+    def _capture_stack(self) -> Optional[StackKey]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        frames = traceback.extract_stack(frame)[-self.max_stack_depth:]
+        return tuple(f"{f.filename}:{f.lineno} in {f.name}" for f in frames)
+
+    def _answer_probe(self):
+        """Runs on the loop thread: the loop was free at this moment"""
+        self._last_seen = time.monotonic()
+        self._probe_pending = False
+
+    def _watchdog(self):
+        """Sample the loop thread's stack while it has not answered a probe for too long"""
+        stall: Optional[LoopStall] = None
+        stall_stacks: Counter = Counter()
+        blocked_since = 0.0
+
+        while not self._stop.wait(self.sample_interval):
+            now = time.monotonic()
+            last_seen = self._last_seen
+            blocked_for = now - last_seen
+
+            if blocked_for > self.slow_callback_threshold:
+                if stall is None:
+                    blocked_since = last_seen
+                    stall = LoopStall(started_at=time.time() - blocked_for)
+                    stall_stacks = Counter()
+                stack = self._capture_stack()
+                if stack:
+                    stall_stacks[stack] += 1
+                stall.samples += 1
+                stall.duration = blocked_for
+            elif stall is not None:
+                # The probe queued during the stall ran as soon as the loop was free
+                stall.duration = last_seen - blocked_since
+                self._finish_stall(stall, stall_stacks)
+                stall = None
+
+            # One probe in flight at a time, so a long stall does not queue hundreds
+            if not self._probe_pending:
+                self._probe_pending = True
+                try:
+                    self._loop.call_soon_threadsafe(self._answer_probe)
+                except RuntimeError:
+                    return  # Loop closed
+
+    def _finish_stall(self, stall: LoopStall, stall_stacks: Counter):
+        if stall_stacks:
+            dominant, _ = stall_stacks.most_common(1)[0]
+            stall.stack = list(dominant)
+        with self._lock:
+            self.stall_count += 1
+            self.recent_stalls.append(stall)
+            if stall.stack:
+                key = tuple(stall.stack)
+                if key in self.blocking_stacks or len(self.blocking_stacks) < self.max_tracked_stacks:
+                    self.blocking_stacks[key] += 1
+        self._pending_stalls.append(stall)
+        logger.warning(
+            f"Event loop blocked for {stall.duration * 1000:.0f}ms"
+            + (f" at {stall.stack[-1]}" if stall.stack else "")
+        )
+
+    def get_gauges(self) -> Dict[str, float]:
+        """Values for the event_loop_lag_seconds gauge family"""
+        return {"current": self.current_lag, "max": self.max_lag}
+
+    def get_report(self, top: int = 10) -> Dict[str, Any]:
+        """Snapshot for the /debug/loop endpoint"""
+        lag_sketch = self.metrics.operation_times.get("event_loop_lag") if self.metrics else None
+        with self._lock:
+            recent = [stall.to_dict() for stall in self.recent_stalls]
+            top_stacks = [
+                {"count": count, "stack": list(stack)}
+                for stack, count in self.blocking_stacks.most_common(top)
+            ]
+            stall_count = self.stall_count
+        return {
+            "running": self._task is not None,
+            "interval": self.interval,
+            "slow_callback_threshold": self.slow_callback_threshold,
+            "lag": {
+                "current": self.current_lag,
+                "max": self.max_lag,
+                **(lag_sketch.quantiles() if lag_sketch else {})
+            },
+            "stall_count": stall_count,
+            "recent_stalls": recent,
+            "top_blocking_stacks": top_stacks,
+        }
@@ -2,8 +2,11 @@
 import time
 import logging
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
-from collections import defaultdict
+from typing import Dict, List, Optional, Any, Callable, Tuple
+from collections import defaultdict, deque
+
+from timeseries import TimeSeriesStore
+from quantile_sketch import LogHistogram
 
 logger = logging.getLogger("metrics")
 
@@ -17,28 +20,50 @@ class MetricPoint:
 class MetricsCollector:
     """Collects and exposes metrics without external dependencies"""
     
-    def __init__(self):
-        # Internal metrics storage
-        self.metrics_history: Dict[str, List[MetricPoint]] = defaultdict(list)
+    def __init__(self, series_capacity: int = 4096):
+        # Internal metrics storage: one fixed-size ring buffer per metric family,
+        # with task type/status carried as labels rather than per-task keys
+        self.metrics_history = TimeSeriesStore(capacity=series_capacity)
         self.counters: Dict[str, int] = defaultdict(int)
         self.gauges: Dict[str, float] = defaultdict(float)
-        self.histograms: Dict[str, List[float]] = defaultdict(list)
+        # Fixed-memory, mergeable quantile sketches instead of raw value lists
+        self.histograms: Dict[str, LogHistogram] = defaultdict(LogHistogram)
         
         # Performance tracking
-        self.operation_times: Dict[str, List[float]] = defaultdict(list)
+        self.operation_times: Dict[str, LogHistogram] = defaultdict(LogHistogram)
+        self.recent_operation_times: Dict[str, deque] = defaultdict(lambda: deque(maxlen=5))
         
         # Rate tracking
         self.rate_trackers: Dict[str, defaultdict] = defaultdict(lambda: defaultdict(list))
         
         # Keep metrics for last 24 hours
         self.retention_period = 86400  # 24 hours
+        
+        # Exposition hooks: values read from other components at scrape time
+        self.gauge_callbacks: Dict[str, Tuple[Callable[[], Dict[str, float]], str, str]] = {}
+        self.cache_stats: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self.metric_help: Dict[str, str] = {}
+    
+    def register_gauge_callback(
+        self,
+        name: str,
+        callback: Callable[[], Dict[str, float]],
+        label: str = "state",
+        description: str = ""
+    ):
+        """Expose a component's live values as a labelled gauge family"""
+        self.gauge_callbacks[name] = (callback, label, description)
+        if description:
+            self.metric_help[name] = description
+    
+    def register_cache(self, name: str, stats_fn: Callable[[], Dict[str, float]]):
+        """Expose a cache's hits/misses/size; hit ratio is derived at render time"""
+        self.cache_stats[name] = stats_fn
     
     def record_task_start(self, task_id: str, task_type: str):
         """Record task start"""
         self.gauges[f"active_tasks_{task_type}"] = self.gauges.get(f"active_tasks_{task_type}", 0) + 1
-        self.metrics_history[f"task_start_{task_id}"].append(
-            MetricPoint(time.time(), 1.0, {"type": task_type})
-        )
+        self.metrics_history.record("task_start", 1.0, {"type": task_type})
         logger.debug(f"Task started: {task_id} ({task_type})")
     
     def record_task_end(
@@ -51,33 +76,28 @@ class MetricsCollector:
         """Record task completion"""
         self.gauges[f"active_tasks_{task_type}"] = max(0, self.gauges.get(f"active_tasks_{task_type}", 0) - 1)
         self.counters[f"tasks_completed_{task_type}_{status}"] += 1
-        self.histograms[f"task_duration_{task_type}"].append(duration)
+        self.histograms[f"task_duration_{task_type}"].record(duration)
         
-        self.metrics_history[f"task_end_{task_id}"].append(
-            MetricPoint(time.time(), duration, {"type": task_type, "status": status})
-        )
+        self.metrics_history.record("task_end", duration, {"type": task_type, "status": status})
         logger.debug(f"Task ended: {task_id} ({task_type}) - {status} in {duration:.2f}s")
     
     def record_tool_call(self, tool_name: str, status: str, duration: float = 0):
         """Record tool usage"""
         self.counters[f"tool_calls_{tool_name}_{status}"] += 1
         if duration > 0:
-            self.histograms[f"tool_duration_{tool_name}"].append(duration)
+            self.histograms[f"tool_duration_{tool_name}"].record(duration)
         
         logger.debug(f"Tool call: {tool_name} - {status}")
     
     def record_confidence(self, domain: str, confidence: float):
         """Record reasoning confidence"""
-        self.histograms[f"confidence_{domain}"].append(confidence)
+        self.histograms[f"confidence_{domain}"].record(confidence)
         logger.debug(f"Confidence recorded: {domain} - {confidence:.2f}")
     
     def record_operation_time(self, operation: str, duration: float):
         """Record operation timing"""
-        self.operation_times[operation].append(duration)
-        
-        # Keep only last 100 measurements per operation
-        if len(self.operation_times[operation]) > 100:
-            self.operation_times[operation] = self.operation_times[operation][-100:]
+        self.operation_times[operation].record(duration)
+        self.recent_operation_times[operation].append(duration)
     
     def get_metrics_summary(self) -> Dict[str, Any]:
         """Get summary of recent metrics"""
@@ -91,22 +111,27 @@ class MetricsCollector:
             "active_tasks": dict(self.gauges),
             "completed_tasks": dict(self.counters),
             "recent_completions": [],
+            "task_durations": {},
             "tool_usage": {},
             "performance": {},
             "confidence_stats": {}
         }
         
         # Process recent completions
-        for key, points in self.metrics_history.items():
-            if "task_end" in key:
-                recent_points = [p for p in points if p.timestamp > cutoff]
-                for point in recent_points:
-                    summary["recent_completions"].append({
-                        "timestamp": point.timestamp,
-                        "duration": point.value,
-                        "type": point.labels.get("type"),
-                        "status": point.labels.get("status")
-                    })
+        if "task_end" in self.metrics_history:
+            task_end = self.metrics_history.family("task_end")
+            for point in task_end.points(now - cutoff, now=now):
+                summary["recent_completions"].append({
+                    "timestamp": point["timestamp"],
+                    "duration": point["value"],
+                    "type": point["labels"].get("type"),
+                    "status": point["labels"].get("status")
+                })
+
+            # Vectorized per-(type, status) duration aggregates over the window
+            for label_key, stats in task_end.aggregate(now - cutoff, now=now).items():
+                labels = dict(label_key)
+                summary["task_durations"][f"{labels.get('type')}_{labels.get('status')}"] = stats
         
         # Tool usage statistics
         for key, count in self.counters.items():
@@ -120,39 +145,32 @@ class MetricsCollector:
                     summary["tool_usage"][tool_name][status] = count
         
         # Performance statistics
-        for operation, times in self.operation_times.items():
-            if times:
+        for operation, sketch in self.operation_times.items():
+            if sketch.count:
                 summary["performance"][operation] = {
-                    "count": len(times),
-                    "avg_time": sum(times) / len(times),
-                    "min_time": min(times),
-                    "max_time": max(times)
+                    "count": sketch.count,
+                    "avg_time": sketch.mean,
+                    "min_time": sketch.min,
+                    "max_time": sketch.max
                 }
         
         # Confidence statistics
-        for key, values in self.histograms.items():
-            if "confidence" in key and values:
+        for key, sketch in self.histograms.items():
+            if "confidence" in key and sketch.count:
                 domain = key.replace("confidence_", "")
                 summary["confidence_stats"][domain] = {
-                    "count": len(values),
-                    "avg_confidence": sum(values) / len(values),
-                    "min_confidence": min(values),
-                    "max_confidence": max(values)
+                    "count": sketch.count,
+                    "avg_confidence": sketch.mean,
+                    "min_confidence": sketch.min,
+                    "max_confidence": sketch.max
                 }
         
         return summary
     
     def _cleanup_old_metrics(self, cutoff_time: float):
         """Remove metrics older than cutoff time"""
-        for key in list(self.metrics_history.keys()):
-            self.metrics_history[key] = [
-                point for point in self.metrics_history[key]
-                if point.timestamp > cutoff_time
-            ]
-            
-            # Remove empty entries
-            if not self.metrics_history[key]:
-                del self.metrics_history[key]
+        # Ring buffers never grow; this only advances their tails
+        self.metrics_history.expire(cutoff_time)
     
     def get_system_health(self) -> Dict[str, Any]:
         """Get overall system health status"""
@@ -198,10 +216,14 @@ class MetricsCollector:
         self.gauges.clear()
         self.histograms.clear()
         self.operation_times.clear()
+        self.recent_operation_times.clear()
         logger.info("All metrics reset")
     
     def calculate_percentiles(self, values: List[float]) -> Dict[str, float]:
-        """Calculate percentiles for a list of values"""
+        """Calculate exact percentiles for an ad-hoc list of values
+        
+        Recorded histograms use their sketches' ``quantiles()`` instead.
+        """
         if not values:
             return {}
             
@@ -266,20 +288,21 @@ class MetricsCollector:
         }
         
         # Calculate percentiles for operation times
-        for operation, times in self.operation_times.items():
-            if times:
-                enhanced["percentiles"][operation] = self.calculate_percentiles(times)
+        for operation, sketch in self.operation_times.items():
+            if sketch.count:
+                enhanced["percentiles"][operation] = sketch.quantiles()
         
         # Calculate percentiles for histogram data
-        for key, values in self.histograms.items():
-            if values and len(values) > 5:
-                enhanced["percentiles"][key] = self.calculate_percentiles(values)
+        for key, sketch in self.histograms.items():
+            if sketch.count > 5:
+                enhanced["percentiles"][key] = sketch.quantiles()
         
         # Generate alerts for anomalies
-        for operation, times in self.operation_times.items():
-            if len(times) > 10:
-                recent_avg = sum(times[-5:]) / 5
-                overall_avg = sum(times) / len(times)
+        for operation, sketch in self.operation_times.items():
+            recent = self.recent_operation_times[operation]
+            if sketch.count > 10 and len(recent) == recent.maxlen:
+                recent_avg = sum(recent) / len(recent)
+                overall_avg = sketch.mean
                 if recent_avg > overall_avg * 2:
                     enhanced["alerts"].append({
                         "type": "performance_degradation",
@@ -288,3 +311,16 @@ class MetricsCollector:
                     })
         
         return enhanced
+    
+    def export_histograms(self) -> Dict[str, Dict[str, Any]]:
+        """Serialize all sketches so another process can merge them"""
+        exported = {f"histogram:{k}": v.to_dict() for k, v in self.histograms.items() if v.count}
+        exported.update({f"operation:{k}": v.to_dict() for k, v in self.operation_times.items() if v.count})
+        return exported
+    
+    def merge_histograms(self, exported: Dict[str, Dict[str, Any]]):
+        """Merge sketches exported by another worker process"""
+        for key, data in exported.items():
+            kind, _, name = key.partition(":")
+            target = self.histograms if kind == "histogram" else self.operation_times
+            target[name].merge(LogHistogram.from_dict(data))
@@ -0,0 +1,338 @@
+"""
+OpenMetrics Exposition for DeerFlow
+
+This module renders a MetricsCollector in the OpenMetrics text format without
+depending on prometheus_client. Counters, gauges and quantile sketches are read
+straight from the collector's live structures. When several uvicorn workers
+share a snapshot directory, counters and sketches are merged across workers and
+gauges are reported per worker with a ``pid`` label.
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import tempfile
+import weakref
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+from quantile_sketch import LogHistogram
+
+logger = logging.getLogger("openmetrics")
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+METRIC_PREFIX = "deerflow"
+
+SUMMARY_QUANTILES = {"0.5": 0.5, "0.9": 0.9, "0.99": 0.99, "0.999": 0.999}
+
+# Gauge callbacks and cache stats are read at most this often
+READINGS_MAX_AGE = 1.0
+
+# collector -> (read at, callback gauges, cache stats)
+_readings: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def sanitize_name(name: str) -> str:
+    """Map an internal key onto the OpenMetrics name charset"""
+    cleaned = "".join(c if c.isalnum() or c == "_" else "_" for c in name)
+    if not cleaned or cleaned[0].isdigit():
+        cleaned = f"_{cleaned}"
+    return cleaned
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{sanitize_name(k)}="{_escape_label_value(v)}"' for k, v in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+def _format_value(value: float) -> str:
+    if value is None or math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def collector_readings(collector, max_age: float = READINGS_MAX_AGE) -> Tuple[Dict[str, List[List[Any]]], Dict[str, Dict[str, float]]]:
+    """Gauge callback and cache stats values, read at most once per ``max_age`` seconds
+
+    Scrapes and snapshot publishing that land within ``max_age`` of each other
+    share one reading instead of each calling into every component.
+    """
+    now = time.monotonic()
+    cached = _readings.get(collector)
+    if cached is not None and now - cached[0] < max_age:
+        return cached[1], cached[2]
+
+    gauges: Dict[str, List[List[Any]]] = {}
+    for name, (callback, label, _) in collector.gauge_callbacks.items():
+        try:
+            values = callback() or {}
+        except Exception as e:
+            logger.warning(f"Gauge callback {name} failed: {e}")
+            continue
+        gauges[name] = [[{label: key}, value] for key, value in values.items()]
+
+    caches = {}
+    for name, stats_fn in collector.cache_stats.items():
+        try:
+            # Only flat numeric stats can be summed across workers
+            caches[name] = {
+                stat: value for stat, value in (stats_fn() or {}).items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool)
+            }
+        except Exception as e:
+            logger.warning(f"Cache stats for {name} failed: {e}")
+
+    _readings[collector] = (now, gauges, caches)
+    return gauges, caches
+
+
+def _live_view(collector) -> Dict[str, Any]:
+    """The collector's own structures in the shape ``render`` expects, without copying sketches"""
+    callback_gauges, caches = collector_readings(collector)
+    gauges: Dict[str, List[List[Any]]] = {name: [[{}, value]] for name, value in collector.gauges.items()}
+    gauges.update(callback_gauges)
+
+    histograms = {f"histogram:{k}": v for k, v in collector.histograms.items() if v.count}
+    histograms.update({f"operation:{k}": v for k, v in collector.operation_times.items() if v.count})
+    return {"counters": collector.counters, "gauges": gauges, "histograms": histograms, "caches": caches}
+
+
+def collector_snapshot(collector) -> Dict[str, Any]:
+    """Capture one process's metrics in a JSON-serializable, mergeable form"""
+    gauges, caches = collector_readings(collector)
+    return {
+        "pid": os.getpid(),
+        "timestamp": time.time(),
+        "counters": dict(collector.counters),
+        "gauges": {**{name: [[{}, value]] for name, value in collector.gauges.items()}, **gauges},
+        "histograms": collector.export_histograms(),
+        "caches": caches,
+    }
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_views(views: List[Dict[str, Any]], accumulators: Optional[Dict[str, LogHistogram]] = None) -> Dict[str, Any]:
+    """Merge per-worker views whose sketches are already LogHistograms
+
+    Counters, cache counters and sketches are summed. Gauges are kept per
+    worker (labelled with ``pid``) and dropped for workers that have exited.
+    Sketches are summed in place into ``accumulators``, which are reset and
+    reused across calls; the input sketches are not modified.
+    """
+    accumulators = {} if accumulators is None else accumulators
+    counters: Dict[str, float] = {}
+    gauges: Dict[str, List[List[Any]]] = {}
+    histograms: Dict[str, LogHistogram] = {}
+    caches: Dict[str, Dict[str, float]] = {}
+
+    for view in views:
+        pid = view["pid"]
+        for name, value in view.get("counters", {}).items():
+            counters[name] = counters.get(name, 0) + value
+
+        if pid == os.getpid() or _pid_alive(pid):
+            for name, samples in view.get("gauges", {}).items():
+                gauges.setdefault(name, []).extend(
+                    [[{**labels, "pid": str(pid)}, value] for labels, value in samples]
+                )
+
+        for key, sketch in view.get("histograms", {}).items():
+            merged = histograms.get(key)
+            if merged is None:
+                merged = accumulators.get(key)
+                if merged is None:
+                    merged = accumulators[key] = LogHistogram(
+                        sketch.relative_accuracy, sketch.min_value, sketch.max_value
+                    )
+                else:
+                    merged.reset()
+                histograms[key] = merged
+            merged.merge(sketch)
+
+        for name, stats in view.get("caches", {}).items():
+            merged_stats = caches.setdefault(name, {})
+            for stat, value in stats.items():
+                merged_stats[stat] = merged_stats.get(stat, 0) + value
+
+    return {"counters": counters, "gauges": gauges, "histograms": histograms, "caches": caches}
+
+
+def _parse_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a snapshot's serialized sketches back into LogHistograms"""
+    return {
+        **snapshot,
+        "histograms": {k: LogHistogram.from_dict(v) for k, v in snapshot.get("histograms", {}).items()},
+    }
+
+
+class _Family:
+    """Metric family accumulated during rendering"""
+
+    def __init__(self, name: str, metric_type: str, help_text: str = ""):
+        self.name = name
+        self.metric_type = metric_type
+        self.help_text = help_text
+        self.samples: List[Sample] = []
+
+    def render(self) -> List[str]:
+        lines = [f"# TYPE {self.name} {self.metric_type}"]
+        if self.help_text:
+            lines.append(f"# HELP {self.name} {_escape_label_value(self.help_text)}")
+        for suffix, labels, value in self.samples:
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+def render(merged: Dict[str, Any], help_texts: Optional[Dict[str, str]] = None) -> str:
+    """Render a merged snapshot as OpenMetrics text"""
+    help_texts = help_texts or {}
+    families: Dict[str, _Family] = {}
+
+    def family(name: str, metric_type: str) -> _Family:
+        full_name = f"{METRIC_PREFIX}_{sanitize_name(name)}"
+        if full_name not in families:
+            families[full_name] = _Family(full_name, metric_type, help_texts.get(name, ""))
+        return families[full_name]
+
+    for name, value in sorted(merged.get("counters", {}).items()):
+        base = name[:-len("_total")] if name.endswith("_total") else name
+        family(base, "counter").samples.append(("_total", {}, value))
+
+    for name, samples in sorted(merged.get("gauges", {}).items()):
+        gauge = family(name, "gauge")
+        for labels, value in samples:
+            gauge.samples.append(("", labels, value))
+
+    for key, sketch in sorted(merged.get("histograms", {}).items()):
+        if not sketch.count:
+            continue
+        kind, _, name = key.partition(":")
+        if kind == "operation":
+            summary, labels = family("operation_duration_seconds", "summary"), {"operation": name}
+        else:
+            summary, labels = family(name, "summary"), {}
+        for quantile, value in sketch.quantiles(SUMMARY_QUANTILES).items():
+            summary.samples.append(("", {**labels, "quantile": quantile}, value))
+        summary.samples.append(("_count", labels, sketch.count))
+        summary.samples.append(("_sum", labels, sketch.sum))
+
+    for name, stats in sorted(merged.get("caches", {}).items()):
+        labels = {"cache": name}
+        hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+        family("cache_hits", "counter").samples.append(("_total", labels, hits))
+        family("cache_misses", "counter").samples.append(("_total", labels, misses))
+        if "size" in stats:
+            family("cache_size", "gauge").samples.append(("", labels, stats["size"]))
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        family("cache_hit_ratio", "gauge").samples.append(("", labels, ratio))
+
+    lines: List[str] = []
+    for rendered in families.values():
+        lines.extend(rendered.render())
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MultiprocessSnapshotStore:
+    """Shared directory of per-worker snapshots used to aggregate across workers
+
+    Parsed snapshots are kept per file and only re-read when the file changes,
+    so a scrape between two publishes only stats the directory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # path -> ((mtime_ns, size), parsed snapshot)
+        self._parsed: Dict[Path, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+        self._accumulators: Dict[str, LogHistogram] = {}
+        self.stats = {"reads": 0, "reused": 0}
+
+    def _path(self, pid: int) -> Path:
+        return self.directory / f"metrics_{pid}.json"
+
+    def write(self, snapshot: Dict[str, Any]):
+        """Atomically replace this worker's snapshot file"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".metrics_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self._path(snapshot["pid"]))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def read_all(self, exclude_pid: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Parsed snapshots of every worker but ``exclude_pid``, sketches as LogHistograms"""
+        exclude = self._path(exclude_pid) if exclude_pid is not None else None
+        views = []
+        seen = set()
+        for path in self.directory.glob("metrics_*.json"):
+            if path == exclude:
+                continue
+            seen.add(path)
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            version = (stat.st_mtime_ns, stat.st_size)
+            cached = self._parsed.get(path)
+            if cached is not None and cached[0] == version:
+                self.stats["reused"] += 1
+                views.append(cached[1])
+                continue
+            try:
+                with open(path) as f:
+                    view = _parse_snapshot(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable metrics snapshot {path}: {e}")
+                continue
+            self.stats["reads"] += 1
+            self._parsed[path] = (version, view)
+            views.append(view)
+
+        for path in list(self._parsed):
+            if path not in seen:
+                del self._parsed[path]
+        return views
+
+    def merge_with(self, local: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge a live local view with the other workers' snapshots"""
+        views = [local] + self.read_all(exclude_pid=local["pid"])
+        return merge_views(views, self._accumulators)
+
+
+def render_collector(collector, store: Optional[MultiprocessSnapshotStore] = None) -> str:
+    """Render the local collector, merged with other workers' snapshots if a store is given
+
+    The local collector's counters and sketches are rendered as they are; only
+    other workers' snapshots are deserialized, and only when their files change.
+    """
+    view = _live_view(collector)
+    if store is not None:
+        view = store.merge_with({**view, "pid": os.getpid()})
+    return render(view, collector.metric_help)
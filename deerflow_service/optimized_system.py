@@ -374,6 +374,14 @@ class OptimizedDeerFlowAgentSystem:
             for agent_id in self.orchestrator.agents.keys():
                 await self.memory_manager.clear_agent_memories(agent_id)
             
+            # Stop tool worker processes
+            for tool in self.tool_registry.tools.values():
+                if hasattr(tool, "close"):
+                    await tool.close()
+            
+            # Stop background cache expiry
+            await self.container.resolve(CacheManager).close()
+            
             logger.info("Shutdown complete")
             
         except Exception as e:
@@ -0,0 +1,192 @@
+"""
+Streaming Quantile Sketches for DeerFlow Latency Histograms
+
+This module provides a mergeable, fixed-memory histogram with logarithmic
+buckets (HDR/DDSketch style). Every quantile estimate is within a bounded
+relative error, queries cost O(buckets), and sketches from different worker
+processes can be merged by adding their bucket counts.
+"""
+
+import math
+from typing import Dict, Any, Iterable, Optional
+
+import numpy as np
+
+DEFAULT_QUANTILES = {
+    "p50": 0.50,
+    "p75": 0.75,
+    "p90": 0.90,
+    "p95": 0.95,
+    "p99": 0.99,
+    "p999": 0.999,
+}
+
+
+class LogHistogram:
+    """Log-bucketed histogram with relative accuracy ``relative_accuracy``"""
+
+    def __init__(
+        self,
+        relative_accuracy: float = 0.01,
+        min_value: float = 1e-6,
+        max_value: float = 1e6
+    ):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        if not 0 < min_value < max_value:
+            raise ValueError("require 0 < min_value < max_value")
+
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.floor(math.log(min_value) / self._log_gamma)
+        n_buckets = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1
+
+        self.counts = np.zeros(n_buckets, dtype=np.int64)
+        self.zero_count = 0  # Values below min_value (including zero and negatives)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _bucket_index(self, value: float) -> int:
+        index = math.ceil(math.log(value) / self._log_gamma) - self._offset
+        return min(max(index, 0), len(self.counts) - 1)
+
+    def _bucket_value(self, index: int) -> float:
+        """Representative value of a bucket (midpoint in relative terms)"""
+        upper = self.gamma ** (index + self._offset)
+        return 2 * upper / (1 + self.gamma)
+
+    def record(self, value: float):
+        """Record one observation in O(1)"""
+        if value < self.min_value:
+            self.zero_count += 1
+        else:
+            self.counts[self._bucket_index(value)] += 1
+
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def record_many(self, values: Iterable[float]):
+        """Vectorized bulk record"""
+        values = np.asarray(list(values) if not isinstance(values, np.ndarray) else values, dtype=np.float64)
+        if values.size == 0:
+            return
+
+        small = values < self.min_value
+        self.zero_count += int(np.count_nonzero(small))
+        large = values[~small]
+        if large.size:
+            indices = np.ceil(np.log(large) / self._log_gamma).astype(np.int64) - self._offset
+            np.clip(indices, 0, len(self.counts) - 1, out=indices)
+            self.counts += np.bincount(indices, minlength=len(self.counts))
+
+        self.count += int(values.size)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a single quantile"""
+        return self.quantiles({"q": q}).get("q")
+
+    def quantiles(self, quantiles: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """Estimate several quantiles with one cumulative pass over the buckets"""
+        if self.count == 0:
+            return {}
+
+        quantiles = quantiles or DEFAULT_QUANTILES
+        cumulative = np.cumsum(self.counts)
+        result = {}
+        for name, q in quantiles.items():
+            rank = q * (self.count - 1)
+            if rank < self.zero_count:
+                value = self.min
+            else:
+                index = int(np.searchsorted(cumulative, rank - self.zero_count, side="right"))
+                value = self._bucket_value(min(index, len(self.counts) - 1))
+            # Bucket representatives can overshoot the observed extremes
+            result[name] = min(max(value, self.min), self.max)
+        return result
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def _check_compatible(self, other: "LogHistogram"):
+        if (
+            other.relative_accuracy != self.relative_accuracy
+            or other.min_value != self.min_value
+            or other.max_value != self.max_value
+        ):
+            raise ValueError("Cannot merge histograms with different bucket layouts")
+
+    def merge(self, other: "LogHistogram") -> "LogHistogram":
+        """Merge another histogram into this one in place"""
+        self._check_compatible(other)
+        self.counts += other.counts
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, mean, extremes and default percentiles"""
+        if self.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.mean,
+            "min": self.min,
+            "max": self.max,
+            **self.quantiles(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Sparse, JSON-serializable form for shipping between processes"""
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+            "buckets": {int(i): int(self.counts[i]) for i in nonzero},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LogHistogram":
+        histogram = cls(data["relative_accuracy"], data["min_value"], data["max_value"])
+        for index, count in data.get("buckets", {}).items():
+            histogram.counts[int(index)] = count
+        histogram.zero_count = data.get("zero_count", 0)
+        histogram.count = data.get("count", 0)
+        histogram.sum = data.get("sum", 0.0)
+        if histogram.count:
+            histogram.min = data["min"]
+            histogram.max = data["max"]
+        return histogram
+
+    def reset(self):
+        self.counts[:] = 0
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,394 @@
+"""
+Provider Resilience for DeerFlow
+
+This module guards calls to external providers (search APIs, LLMs) with one
+circuit breaker and one adaptive concurrency limiter per provider. Breakers
+stop sending traffic to a provider that keeps failing and probe it again
+after a cool-down. Limiters grow the number of in-flight requests additively
+while latency is healthy and shrink it multiplicatively when p99 latency or
+the 429/timeout rate rises, so a brownout sheds load instead of piling up
+timeouts.
+
+All state changes happen synchronously between awaits, which makes them
+atomic with respect to other coroutines on the event loop.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Iterable
+
+from deadline import remaining_timeout
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+logger = logging.getLogger("resilience")
+
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half_open"
+STATE_OPEN = "open"
+
+# Numeric encoding used for the provider_circuit_state gauge
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+class ProviderHTTPError(Exception):
+    """Non-success HTTP status from a provider"""
+
+    def __init__(self, provider: str, status: int, detail: str = ""):
+        super().__init__(f"{provider} returned HTTP {status}" + (f": {detail[:200]}" if detail else ""))
+        self.provider = provider
+        self.status = status
+
+    @property
+    def rate_limited(self) -> bool:
+        return self.status == 429
+
+    @property
+    def provider_fault(self) -> bool:
+        """Rate limiting and server errors count against the provider"""
+        return self.status == 429 or self.status >= 500
+
+
+class CircuitOpenError(Exception):
+    """The provider's breaker is open, so the call was not attempted"""
+
+
+class LimiterTimeout(Exception):
+    """No concurrency slot became free in time"""
+
+
+# Exceptions that count as provider failures for the breaker
+if AIOHTTP_AVAILABLE:
+    TRANSPORT_ERRORS = (asyncio.TimeoutError, OSError, aiohttp.ClientError)
+else:
+    TRANSPORT_ERRORS = (asyncio.TimeoutError, OSError)
+
+
+class ProviderCircuitBreaker:
+    """Consecutive-failure circuit breaker with a bounded half-open probe
+
+    ``acquire`` returns a generation token. Outcomes reported with a token from
+    an earlier generation are ignored, so calls admitted before the breaker
+    opened cannot close or re-open it later.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = STATE_CLOSED
+        self._generation = 0
+        self._opened_at = 0.0
+        self._half_open_inflight = 0
+        self.consecutive_failures = 0
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._transition(STATE_HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str):
+        if state == self._state:
+            return
+        logger.info(f"Circuit breaker {self.name}: {self._state} -> {state}")
+        self._state = state
+        self._generation += 1
+        self._half_open_inflight = 0
+        if state == STATE_OPEN:
+            self._opened_at = time.monotonic()
+            self.stats["opened"] += 1
+        elif state == STATE_CLOSED:
+            self.consecutive_failures = 0
+
+    def is_available(self) -> bool:
+        """Whether a call could be admitted now (does not take a probe slot)"""
+        state = self.state
+        if state == STATE_HALF_OPEN:
+            return self._half_open_inflight < self.half_open_max_calls
+        return state == STATE_CLOSED
+
+    def acquire(self) -> Optional[int]:
+        """Admit a call, returning its generation token, or None if rejected"""
+        state = self.state
+        if state == STATE_CLOSED:
+            return self._generation
+        if state == STATE_HALF_OPEN and self._half_open_inflight < self.half_open_max_calls:
+            self._half_open_inflight += 1
+            return self._generation
+        self.stats["rejected"] += 1
+        return None
+
+    def release(self, token: int):
+        """End an admitted call without judging the provider"""
+        if token == self._generation and self._state == STATE_HALF_OPEN:
+            self._half_open_inflight = max(0, self._half_open_inflight - 1)
+
+    def record_success(self, token: int):
+        self.stats["successes"] += 1
+        if token != self._generation:
+            return
+        if self._state == STATE_HALF_OPEN:
+            self._transition(STATE_CLOSED)
+        else:
+            self.consecutive_failures = 0
+
+    def record_failure(self, token: int):
+        self.stats["failures"] += 1
+        if token != self._generation:
+            return
+        if self._state == STATE_HALF_OPEN:
+            self._transition(STATE_OPEN)
+            return
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            logger.warning(f"Circuit breaker {self.name} opened after {self.consecutive_failures} failures")
+            self._transition(STATE_OPEN)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            **self.stats
+        }
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit driven by p99 latency and overload signals
+
+    Every successful call near the limit adds ``1 / limit`` (about +1 per
+    round of calls). Each ``window`` samples, the window's p99 is compared
+    with a slow-moving healthy baseline; a p99 above ``latency_tolerance``
+    times the baseline, or any 429/timeout, multiplies the limit by
+    ``backoff`` (at most once per ``cooldown`` seconds).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        window: int = 50,
+        latency_tolerance: float = 2.0,
+        backoff: float = 0.7,
+        cooldown: float = 1.0,
+        max_wait: float = 10.0
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window = window
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+
+        self.inflight = 0
+        self.baseline_p99: Optional[float] = None
+        self.last_p99: Optional[float] = None
+        self._samples: List[float] = []
+        self._waiters: deque = deque()
+        self._last_decrease = 0.0
+        self.stats = {"acquired": 0, "timeouts": 0, "increases": 0, "decreases": 0, "overloads": 0}
+
+    async def acquire(self):
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            self.stats["acquired"] += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, remaining_timeout(self.max_wait))
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise LimiterTimeout(f"No {self.name} concurrency slot within {self.max_wait}s") from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over as we were cancelled; pass it on
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.stats["acquired"] += 1
+
+    def release(self):
+        self.inflight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        while self._waiters and self.inflight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot directly to the waiter
+                self.inflight += 1
+                waiter.set_result(None)
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        old = self.limit
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        self.stats["decreases"] += 1
+        logger.info(f"Limiter {self.name}: {old:.1f} -> {self.limit:.1f} ({reason})")
+
+    def on_sample(self, latency: float, overloaded: bool = False):
+        """Feed back one call's outcome"""
+        if overloaded:
+            self.stats["overloads"] += 1
+            self._decrease("overload")
+            return
+
+        self._samples.append(latency)
+        if len(self._samples) >= self.window:
+            ordered = sorted(self._samples)
+            p99 = ordered[int(0.99 * (len(ordered) - 1))]
+            self._samples.clear()
+            self.last_p99 = p99
+            if self.baseline_p99 is None:
+                self.baseline_p99 = p99
+            elif p99 > self.baseline_p99 * self.latency_tolerance:
+                self._decrease(f"p99 {p99:.3f}s vs baseline {self.baseline_p99:.3f}s")
+                return
+            else:
+                # Only learn the baseline from healthy windows
+                self.baseline_p99 = 0.9 * self.baseline_p99 + 0.1 * p99
+
+        # Additive increase, only when the limit is actually being used
+        if self.inflight >= int(self.limit) - 1 and self.limit < self.max_limit:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self.stats["increases"] += 1
+        self._wake_waiters()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "inflight": self.inflight,
+            "waiting": len(self._waiters),
+            "baseline_p99": self.baseline_p99,
+            "last_p99": self.last_p99,
+            **self.stats
+        }
+
+
+class ProviderGuard:
+    """Circuit breaker plus adaptive limiter for one provider"""
+
+    def __init__(self, name: str, breaker: ProviderCircuitBreaker, limiter: AdaptiveLimiter, metrics=None):
+        self.name = name
+        self.breaker = breaker
+        self.limiter = limiter
+        self.metrics = metrics
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        token = self.breaker.acquire()
+        if token is None:
+            raise CircuitOpenError(f"Circuit breaker open for {self.name}")
+
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.release(token)
+            raise
+
+        start = time.monotonic()
+        try:
+            result = await fn(*args, **kwargs)
+        except ProviderHTTPError as e:
+            self._record(start, overloaded=e.rate_limited)
+            if e.provider_fault:
+                self.breaker.record_failure(token)
+            else:
+                self.breaker.release(token)
+            raise
+        except TRANSPORT_ERRORS as e:
+            self._record(start, overloaded=isinstance(e, asyncio.TimeoutError))
+            self.breaker.record_failure(token)
+            raise
+        except BaseException:
+            self.breaker.release(token)
+            raise
+        else:
+            self._record(start)
+            self.breaker.record_success(token)
+            return result
+        finally:
+            self.limiter.release()
+
+    def _record(self, start: float, overloaded: bool = False):
+        latency = time.monotonic() - start
+        self.limiter.on_sample(latency, overloaded)
+        if self.metrics:
+            self.metrics.record_operation_time(f"provider_{self.name}", latency)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"breaker": self.breaker.get_stats(), "limiter": self.limiter.get_stats()}
+
+
+class ResilienceRegistry:
+    """Lazily created guards, one per provider name"""
+
+    def __init__(self, metrics=None, breaker_defaults: Optional[Dict[str, Any]] = None,
+                 limiter_defaults: Optional[Dict[str, Any]] = None):
+        self.metrics = metrics
+        self.breaker_defaults = breaker_defaults or {}
+        self.limiter_defaults = limiter_defaults or {}
+        self.guards: Dict[str, ProviderGuard] = {}
+
+    def configure(self, name: str, breaker: Optional[Dict[str, Any]] = None,
+                  limiter: Optional[Dict[str, Any]] = None) -> ProviderGuard:
+        """Create (or replace) a provider's guard with specific settings"""
+        guard = ProviderGuard(
+            name,
+            ProviderCircuitBreaker(name, **{**self.breaker_defaults, **(breaker or {})}),
+            AdaptiveLimiter(name, **{**self.limiter_defaults, **(limiter or {})}),
+            self.metrics
+        )
+        self.guards[name] = guard
+        return guard
+
+    def guard(self, name: str) -> ProviderGuard:
+        return self.guards.get(name) or self.configure(name)
+
+    def is_available(self, name: str) -> bool:
+        return self.guard(name).breaker.is_available()
+
+    def available(self, names: Iterable[str]) -> List[str]:
+        """Providers whose breakers would admit a call, in the given order"""
+        return [name for name in names if self.is_available(name)]
+
+    async def call(self, name: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        return await self.guard(name).call(fn, *args, **kwargs)
+
+    def circuit_states(self) -> Dict[str, float]:
+        return {name: STATE_VALUES[g.breaker.state] for name, g in self.guards.items()}
+
+    def concurrency_limits(self) -> Dict[str, float]:
+        return {name: g.limiter.limit for name, g in self.guards.items()}
+
+    def inflight(self) -> Dict[str, float]:
+        return {name: g.limiter.inflight for name, g in self.guards.items()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: guard.get_stats() for name, guard in self.guards.items()}
@@ -0,0 +1,365 @@
+"""
+Sandbox Worker Pool for DeerFlow
+
+This module runs CodeExecutionTool snippets in a pool of pre-started Python
+worker processes instead of calling exec in the server process. Each worker
+applies rlimit caps (address space, per-job CPU seconds, no file writes) and
+talks to the server over its stdin/stdout pipes. Messages are
+length-prefixed JSON frames, and result frames have a size limit. A worker
+that overruns its wall-clock timeout, dies, or hits its memory cap is killed
+and replaced. Healthy workers are reused until they reach their job quota.
+
+The worker side runs this same file as a script, so it must only import from
+the standard library.
+"""
+
+import os
+import sys
+import json
+import math
+import struct
+import asyncio
+import logging
+from typing import Dict, List, Any, Optional, Set
+
+logger = logging.getLogger("sandbox_pool")
+
+FRAME_HEADER = struct.Struct(">I")
+
+# Replacement workers that fail to start are retried with exponential backoff
+SPAWN_ATTEMPTS = 5
+SPAWN_BACKOFF_INITIAL = 0.5
+SPAWN_BACKOFF_MAX = 8.0
+
+# How often a caller waiting for a worker checks that the pool still has any
+LIVENESS_CHECK_INTERVAL = 0.5
+
+SAFE_BUILTINS = {
+    "len": len,
+    "range": range,
+    "sum": sum,
+    "max": max,
+    "min": min,
+    "abs": abs,
+    "round": round,
+    "sorted": sorted,
+    "list": list,
+    "dict": dict,
+    "set": set,
+    "tuple": tuple,
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": bool
+}
+
+# Modules a snippet may be given when listed in allowed_modules
+PRELOADED_MODULES = ("math", "statistics", "json")
+
+
+class SandboxError(Exception):
+    """The snippet failed or its worker could not return a result"""
+
+
+def run_snippet(code: str, context: Dict[str, Any], allowed_modules: List[str]) -> Any:
+    """Execute code with restricted builtins; returns ``result`` or the last expression"""
+    import ast
+    import importlib
+
+    safe_globals: Dict[str, Any] = {"__builtins__": dict(SAFE_BUILTINS)}
+    for module_name in allowed_modules:
+        if module_name in PRELOADED_MODULES:
+            safe_globals[module_name] = importlib.import_module(module_name)
+    safe_globals.update(context)
+
+    exec_globals: Dict[str, Any] = {}
+    exec(code, safe_globals, exec_globals)
+
+    if "result" in exec_globals:
+        return exec_globals["result"]
+
+    tree = ast.parse(code)
+    if tree.body and isinstance(tree.body[-1], ast.Expr):
+        return eval(compile(ast.Expression(tree.body[-1].value), "<string>", "eval"), safe_globals)
+    return None
+
+
+class _CpuLimitExceeded(BaseException):
+    """Raised from SIGXCPU; BaseException so snippets cannot swallow it"""
+
+
+def _worker_main(limits: Dict[str, Any]):
+    """Worker loop: read a job frame, run it under rlimits, write a result frame"""
+    import resource
+    import signal
+
+    reader = sys.stdin.buffer
+    writer = sys.stdout.buffer
+    # Keep stray prints off the protocol pipe
+    sys.stdout = sys.stderr
+
+    for module_name in PRELOADED_MODULES:
+        __import__(module_name)
+
+    memory_bytes = int(limits["memory_limit_mb"]) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+
+    def on_cpu_limit(signum, frame):
+        raise _CpuLimitExceeded()
+
+    signal.signal(signal.SIGXCPU, on_cpu_limit)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    cpu_limit = float(limits["cpu_limit"])
+    max_result_bytes = int(limits["max_result_bytes"])
+
+    while True:
+        header = reader.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        job = json.loads(reader.read(FRAME_HEADER.unpack(header)[0]))
+
+        # RLIMIT_CPU counts the whole process, so cap this job relative to usage so far
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_limit)
+        if cpu_hard != resource.RLIM_INFINITY:
+            cpu_soft = min(cpu_soft, cpu_hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_soft, cpu_hard))
+
+        try:
+            response = {"ok": True, "result": run_snippet(job["code"], job["context"], job["allowed_modules"])}
+        except _CpuLimitExceeded:
+            response = {"ok": False, "error": f"CPU limit of {cpu_limit:g}s exceeded"}
+        except MemoryError:
+            response = {"ok": False, "error": f"Memory limit of {limits['memory_limit_mb']}MB exceeded", "recycle": True}
+        except Exception as e:
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_hard, cpu_hard))
+
+        try:
+            payload = json.dumps(response, default=str).encode("utf-8")
+        except (MemoryError, ValueError) as e:
+            payload = json.dumps({"ok": False, "error": f"Result could not be encoded: {e}", "recycle": True}).encode("utf-8")
+        if len(payload) > max_result_bytes:
+            payload = json.dumps({
+                "ok": False,
+                "error": f"Result of {len(payload)} bytes exceeds the {max_result_bytes} byte limit"
+            }).encode("utf-8")
+
+        writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+        writer.flush()
+
+
+class SandboxWorker:
+    """Parent-side handle on one worker process"""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.jobs = 0
+
+    async def call(self, job: Dict[str, Any], max_result_bytes: int) -> Dict[str, Any]:
+        payload = json.dumps(job, default=str).encode("utf-8")
+        self.process.stdin.write(FRAME_HEADER.pack(len(payload)) + payload)
+        await self.process.stdin.drain()
+
+        header = await self.process.stdout.readexactly(FRAME_HEADER.size)
+        size = FRAME_HEADER.unpack(header)[0]
+        if size > max_result_bytes:
+            raise SandboxError(f"Worker sent a {size} byte frame, over the {max_result_bytes} byte limit")
+        self.jobs += 1
+        return json.loads(await self.process.stdout.readexactly(size))
+
+    def kill(self):
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+
+
+class SandboxPool:
+    """Pre-started sandbox workers shared by code execution calls"""
+
+    def __init__(
+        self,
+        size: int = 2,
+        memory_limit_mb: int = 256,
+        cpu_limit: float = 10.0,
+        max_result_bytes: int = 1024 * 1024,
+        max_jobs_per_worker: int = 500
+    ):
+        self.size = size
+        self.max_result_bytes = max_result_bytes
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.limits = {
+            "memory_limit_mb": memory_limit_mb,
+            "cpu_limit": cpu_limit,
+            "max_result_bytes": max_result_bytes
+        }
+
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: Set[SandboxWorker] = set()
+        self._pending_spawns: Set[asyncio.Task] = set()
+        self._start_lock = asyncio.Lock()
+        self._closed = False
+        self.stats = {"executions": 0, "errors": 0, "timeouts": 0, "crashes": 0, "spawned": 0, "recycled": 0,
+                      "spawn_failures": 0}
+
+    async def start(self):
+        """Start the workers; called lazily by the first execute"""
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            self._closed = False
+            self._idle = asyncio.Queue()
+            workers = await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+            for worker in workers:
+                self._idle.put_nowait(worker)
+            logger.info(f"Sandbox pool started with {self.size} workers")
+
+    async def _spawn(self) -> SandboxWorker:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-I", os.path.abspath(__file__), json.dumps(self.limits),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        worker = SandboxWorker(process)
+        self._workers.add(worker)
+        self.stats["spawned"] += 1
+        return worker
+
+    async def _respawn(self):
+        delay = SPAWN_BACKOFF_INITIAL
+        for attempt in range(1, SPAWN_ATTEMPTS + 1):
+            try:
+                worker = await self._spawn()
+                break
+            except Exception as e:
+                self.stats["spawn_failures"] += 1
+                if attempt == SPAWN_ATTEMPTS or self._closed:
+                    logger.error(f"Failed to start sandbox worker after {attempt} attempts: {e}")
+                    return
+                logger.warning(f"Failed to start sandbox worker (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, SPAWN_BACKOFF_MAX)
+        if self._closed:
+            await self._retire(worker)
+        else:
+            self._idle.put_nowait(worker)
+
+    async def _retire(self, worker: SandboxWorker):
+        self._workers.discard(worker)
+        worker.kill()
+        try:
+            await worker.process.wait()
+        except Exception:
+            pass
+
+    def _replace(self, worker: SandboxWorker):
+        """Kill worker and start its replacement in the background"""
+        self._workers.discard(worker)
+        worker.kill()
+        if not self._closed:
+            self._schedule_respawn()
+
+    def _schedule_respawn(self):
+        task = asyncio.ensure_future(self._respawn())
+        self._pending_spawns.add(task)
+        task.add_done_callback(self._pending_spawns.discard)
+
+    async def _acquire(self, deadline: float) -> SandboxWorker:
+        """Wait for an idle worker until deadline (loop time)
+
+        Raises SandboxError as soon as no worker is running or starting, e.g.
+        after replacements gave up, and schedules new ones for later calls.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._idle.empty() and not self._workers and not self._pending_spawns:
+                for _ in range(self.size):
+                    self._schedule_respawn()
+                raise SandboxError("No sandbox workers are running")
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                return await asyncio.wait_for(self._idle.get(), min(remaining, LIVENESS_CHECK_INTERVAL))
+            except asyncio.TimeoutError:
+                continue
+
+    async def execute(
+        self,
+        code: str,
+        context: Optional[Dict[str, Any]] = None,
+        allowed_modules: Optional[List[str]] = None,
+        timeout: float = 30.0
+    ) -> Any:
+        """Run code on an idle worker; raises asyncio.TimeoutError or SandboxError
+
+        timeout covers both waiting for a free worker and running the code.
+        """
+        if self._idle is None:
+            await self.start()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        job = {"code": code, "context": context or {}, "allowed_modules": list(allowed_modules or [])}
+        try:
+            worker = await self._acquire(deadline)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            self._idle.put_nowait(worker)
+            self.stats["timeouts"] += 1
+            raise asyncio.TimeoutError()
+
+        reusable = False
+        self.stats["executions"] += 1
+        try:
+            response = await asyncio.wait_for(worker.call(job, self.max_result_bytes), remaining)
+            reusable = not response.get("recycle")
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        except (asyncio.IncompleteReadError, ConnectionError, SandboxError) as e:
+            self.stats["crashes"] += 1
+            exit_code = worker.process.returncode
+            raise SandboxError(f"Sandbox worker failed (exit code {exit_code}): {e}") from None
+        finally:
+            if reusable and worker.jobs < self.max_jobs_per_worker:
+                self._idle.put_nowait(worker)
+            else:
+                if reusable:
+                    self.stats["recycled"] += 1
+                self._replace(worker)
+
+        if not response["ok"]:
+            self.stats["errors"] += 1
+            raise SandboxError(response["error"])
+        return response.get("result")
+
+    async def close(self):
+        """Stop all workers"""
+        self._closed = True
+        for task in list(self._pending_spawns):
+            # Don't sit out a replacement's backoff; a worker it started is still in _workers
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        for worker in list(self._workers):
+            await self._retire(worker)
+        self._idle = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "workers": len(self._workers),
+            "idle": self._idle.qsize() if self._idle is not None else 0
+        }
+
+
+if __name__ == "__main__":
+    _worker_main(json.loads(sys.argv[1]))
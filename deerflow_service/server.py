@@ -4,7 +4,7 @@ DeerFlow Research Service
 This service provides a FastAPI server to handle deep research requests using DeerFlow.
 Enhanced with intelligent agent capabilities for advanced planning and reasoning.
 """
-from fastapi import FastAPI, BackgroundTasks, HTTPException, WebSocket
+from fastapi import FastAPI, BackgroundTasks, HTTPException, WebSocket, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
@@ -12,18 +12,26 @@ import uvicorn
 from typing import Optional, List, Dict, Any
 import os
 import asyncio
-import requests
 import json
 import logging
 import time
 import datetime
+import functools
 import aiohttp
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 
 # Import optimization components
 from config_manager import load_config, get_config
 from error_handler import error_handler, with_retry, with_circuit_breaker
 from metrics import MetricsCollector
+from loop_monitor import LoopMonitor
+from openmetrics import CONTENT_TYPE as OPENMETRICS_CONTENT_TYPE, MultiprocessSnapshotStore, collector_snapshot, render_collector
+from deadline import Deadline, DeadlineExceeded, deadline_scope, remaining_timeout, run_stage
+from resilience import ResilienceRegistry, ProviderHTTPError
+from hedging import HedgePolicy
+from task_manager import task_manager, TaskPriority, Overloaded
+import async_cache
+import tool_cache
 
 # Import the new agent core and learning system
 from agent_core import agent_core, TaskStatus
@@ -61,6 +69,72 @@ logger = logging.getLogger("deerflow_service")
 # Initialize metrics collector
 metrics = MetricsCollector()
 
+# Multi-worker deployments point every worker at the same snapshot directory
+METRICS_SNAPSHOT_DIR = os.environ.get("DEERFLOW_METRICS_DIR")
+METRICS_SNAPSHOT_INTERVAL = float(os.environ.get("DEERFLOW_METRICS_SNAPSHOT_INTERVAL", "5"))
+metrics_snapshot_store = MultiprocessSnapshotStore(METRICS_SNAPSHOT_DIR) if METRICS_SNAPSHOT_DIR else None
+
+# Default end-to-end budget for synchronous research requests
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("DEERFLOW_REQUEST_DEADLINE", "180"))
+
+# Shared outbound HTTP session so connections are pooled across requests
+HTTP_POOL_LIMIT = int(os.environ.get("DEERFLOW_HTTP_POOL_LIMIT", "100"))
+http_session: Optional[aiohttp.ClientSession] = None
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared outbound HTTP session, creating it on first use"""
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=HTTP_POOL_LIMIT))
+    return http_session
+
+def get_http_pool_stats() -> Dict[str, float]:
+    """Connection pool occupancy of the shared HTTP session"""
+    if http_session is None or http_session.closed:
+        return {"limit": HTTP_POOL_LIMIT, "in_use": 0, "idle": 0}
+    connector = http_session.connector
+    acquired = getattr(connector, "_acquired", ())
+    idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+    return {"limit": connector.limit, "in_use": len(acquired), "idle": idle}
+
+# One circuit breaker and adaptive concurrency limiter per outbound provider
+resilience = ResilienceRegistry(
+    metrics,
+    breaker_defaults={
+        "failure_threshold": int(os.environ.get("DEERFLOW_BREAKER_FAILURES", "5")),
+        "reset_timeout": float(os.environ.get("DEERFLOW_BREAKER_RESET_SECONDS", "30"))
+    },
+    limiter_defaults={"initial_limit": 8, "max_limit": 32}
+)
+resilience.configure("deepseek", limiter={"initial_limit": 4, "max_limit": 16})
+for provider in ("intelligent_search", "tavily", "brave"):
+    resilience.guard(provider)
+
+# Backup search requests go out once the current provider passes its p95,
+# limited to roughly DEERFLOW_HEDGE_RATIO of requests per backup provider
+search_hedging = HedgePolicy(
+    quantile=0.95,
+    default_delay=float(os.environ.get("DEERFLOW_HEDGE_DEFAULT_DELAY", "2.0")),
+    budget_ratio=float(os.environ.get("DEERFLOW_HEDGE_RATIO", "0.1"))
+)
+
+# Event-loop lag and blocking-callback monitor
+LOOP_MONITOR_ENABLED = os.environ.get("DEERFLOW_LOOP_MONITOR", "true").lower() == "true"
+loop_monitor = LoopMonitor(
+    metrics,
+    interval=float(os.environ.get("DEERFLOW_LOOP_MONITOR_INTERVAL", "0.1")),
+    slow_callback_threshold=float(os.environ.get("DEERFLOW_SLOW_CALLBACK_MS", "100")) / 1000
+)
+
+async def publish_metrics_snapshots():
+    """Periodically write this worker's metrics for cross-worker aggregation"""
+    while True:
+        await asyncio.sleep(METRICS_SNAPSHOT_INTERVAL)
+        try:
+            metrics_snapshot_store.write(collector_snapshot(metrics))
+        except Exception as e:
+            logger.warning(f"Failed to publish metrics snapshot: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup/shutdown events"""
@@ -73,11 +147,58 @@ async def lifespan(app: FastAPI):
     # Initialize error recovery handlers
     await setup_error_handlers()
 
+    # Metrics exposition hooks
+    metrics.register_gauge_callback(
+        "event_loop_lag_seconds", loop_monitor.get_gauges, label="stat",
+        description="Event loop scheduling delay"
+    )
+    metrics.register_gauge_callback(
+        "http_pool_connections", get_http_pool_stats, label="state",
+        description="Outbound HTTP connection pool occupancy"
+    )
+    metrics.register_gauge_callback(
+        "provider_circuit_state", resilience.circuit_states, label="provider",
+        description="Provider circuit breaker state (0 closed, 1 half-open, 2 open)"
+    )
+    metrics.register_gauge_callback(
+        "provider_concurrency_limit", resilience.concurrency_limits, label="provider",
+        description="Adaptive in-flight request limit per provider"
+    )
+    metrics.register_gauge_callback(
+        "provider_inflight_requests", resilience.inflight, label="provider",
+        description="In-flight requests per provider"
+    )
+    metrics.register_gauge_callback(
+        "scheduler_queue_depth", task_manager.queue_depths, label="priority",
+        description="Research pipelines waiting for a run slot"
+    )
+    metrics.register_gauge_callback(
+        "scheduler_queue_wait_p95_seconds", task_manager.queue_wait_p95, label="priority",
+        description="95th percentile time research pipelines waited for a run slot"
+    )
+    # Summed over the live caches of each kind, so caches built after startup count too
+    metrics.register_cache("domain_analysis", functools.partial(async_cache.combined_stats, "domain_analysis"))
+    metrics.register_cache("tool_results", tool_cache.combined_stats)
+    if LOOP_MONITOR_ENABLED:
+        await loop_monitor.start()
+    background_tasks = []
+    if metrics_snapshot_store:
+        background_tasks.append(asyncio.create_task(publish_metrics_snapshots()))
+
     yield
 
     # Shutdown
     logger.info("Shutting down DeerFlow research service...")
 
+    await loop_monitor.stop()
+    await task_manager.shutdown()
+    for task in background_tasks:
+        task.cancel()
+    if metrics_snapshot_store:
+        metrics_snapshot_store.write(collector_snapshot(metrics))
+    if http_session and not http_session.closed:
+        await http_session.close()
+
     # Generate final metrics report
     final_metrics = metrics.get_metrics_summary()
     logger.info(f"Final metrics: {final_metrics}")
@@ -130,6 +251,8 @@ class ResearchRequest(BaseModel):
     research_length: Optional[str] = "comprehensive"  # brief, standard, comprehensive, detailed
     research_tone: Optional[str] = "analytical"  # casual, professional, analytical, academic
     min_word_count: Optional[int] = 1500
+    user_id: Optional[str] = None  # Scheduling fairness key; defaults to the client address
+    timeout: Optional[float] = None  # Seconds; defaults to DEERFLOW_REQUEST_DEADLINE
 
 class ResearchResponse(BaseModel):
     status: Optional[Dict[str, Any]] = None
@@ -138,6 +261,7 @@ class ResearchResponse(BaseModel):
     timestamp: Optional[str] = None
     sources: Optional[List[Dict[str, Any]]] = None
     service_process_log: Optional[List[str]] = []
+    deadline: Optional[Dict[str, Any]] = None
 
 # Global variables
 research_state = {}
@@ -145,6 +269,12 @@ TAVILY_API_KEY = os.environ.get("TAVILY_API_KEY")
 BRAVE_API_KEY = os.environ.get("BRAVE_API_KEY")
 DEEPSEEK_API_KEY = os.environ.get("DEEPSEEK_API_KEY")
 
+INTELLIGENT_SEARCH_URL = os.environ.get(
+    "DEERFLOW_INTELLIGENT_SEARCH_URL", "http://127.0.0.1:3000/api/enhanced-web-search/search"
+)
+TAVILY_SEARCH_URL = os.environ.get("DEERFLOW_TAVILY_URL", "https://api.tavily.com/search")
+BRAVE_SEARCH_URL = os.environ.get("DEERFLOW_BRAVE_URL", "https://api.search.brave.com/res/v1/web/search")
+
 def get_token_limit_by_depth(research_depth: int) -> int:
     """
     Universal token allocation based on research depth for ALL models
@@ -164,88 +294,79 @@ async def search_web(query: str, max_results: int = 8):
     """Enhanced web search using intelligent rate limiting and caching."""
     logger.info(f"Enhanced web search for: {query} with {max_results} results")
 
-    try:
-        # Use the intelligent search manager from the Node.js server
-        import aiohttp
-        import asyncio
-
-        async with aiohttp.ClientSession() as session:
-            # Call our intelligent search endpoint
-            async with session.post(
-                'http://127.0.0.1:3000/api/enhanced-web-search/search',
-                json={
-                    'query': query,
-                    'maxResults': max_results,
-                    'searchType': 'all',
-                    'freshness': 'week'
-                },
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    results = data.get('results', [])
-
-                    # Convert to DeerFlow format
-                    formatted_results = []
-                    for result in results:
-                        formatted_results.append({
-                            'title': result.get('title', 'Untitled'),
-                            'url': result.get('url', ''),
-                            'content': result.get('content', ''),
-                            'source': result.get('source', 'Web'),
-                            'score': result.get('score', 1.0)
-                        })
-
-                    logger.info(f"Intelligent search returned {len(formatted_results)} results from {data.get('searchEnginesUsed', [])}")
-                    return formatted_results
-                else:
-                    logger.error(f"Search endpoint returned status: {response.status}")
-
-    except Exception as e:
-        logger.error(f"Intelligent search failed, using fallback: {e}")
-
-    # Fallback to direct search with basic rate limiting
-    all_results = []
-    search_engines_used = []
-
-    # Try Tavily with rate limiting
+    # Candidate providers in preference order; open circuit breakers are skipped
+    providers = [("intelligent_search", search_intelligent)]
     if TAVILY_API_KEY:
-        try:
-            await asyncio.sleep(1)  # Basic rate limiting
-            tavily_results = await search_tavily(query, max_results // 2)
-            if tavily_results:
-                all_results.extend(tavily_results)
-                search_engines_used.append("Tavily")
-                logger.info(f"Tavily fallback returned {len(tavily_results)} results")
-        except Exception as e:
-            logger.error(f"Tavily fallback error: {e}")
+        providers.append(("tavily", search_tavily))
+    if BRAVE_API_KEY:
+        providers.append(("brave", search_brave))
+    available = set(resilience.available(name for name, _ in providers))
+    attempts = [
+        (name, functools.partial(resilience.call, name, search_fn, query, max_results))
+        for name, search_fn in providers
+        if name in available
+    ]
+    if not attempts:
+        logger.warning("All search providers have open circuit breakers")
+        return []
 
-    # Try Brave with rate limiting
-    if len(all_results) < max_results and BRAVE_API_KEY:
-        try:
-            await asyncio.sleep(2)  # Longer delay for Brave
-            brave_results = await search_brave(query, max_results - len(all_results))
-            if brave_results:
-                all_results.extend(brave_results)
-                search_engines_used.append("Brave")
-                logger.info(f"Brave fallback returned {len(brave_results)} results")
-        except Exception as e:
-            logger.error(f"Brave fallback error: {e}")
+    # Hedge to the next provider when the current one runs past its p95
+    try:
+        results, outcome = await search_hedging.run(attempts)
+    except Exception as e:
+        logger.error(f"All search providers failed: {e}")
+        return []
 
     # Remove duplicates
     seen_urls = set()
     unique_results = []
-    for result in all_results:
+    for result in results:
         if result.get('url') and result['url'] not in seen_urls:
             seen_urls.add(result['url'])
             unique_results.append(result)
 
-    logger.info(f"Fallback search completed. Found {len(unique_results)} unique results from {search_engines_used}")
+    logger.info(
+        f"Search answered by {outcome.provider} in {outcome.latency:.2f}s "
+        f"(attempted {outcome.attempted}, hedged={outcome.hedged}): {len(unique_results)} unique results"
+    )
     return unique_results[:max_results]
 
+async def search_intelligent(query: str, max_results: int = 8):
+    """Search through the Node.js intelligent search endpoint."""
+    session = get_http_session()
+    async with session.post(
+        INTELLIGENT_SEARCH_URL,
+        json={
+            'query': query,
+            'maxResults': max_results,
+            'searchType': 'all',
+            'freshness': 'week'
+        },
+        timeout=aiohttp.ClientTimeout(total=remaining_timeout(30))
+    ) as response:
+        if response.status != 200:
+            raise ProviderHTTPError("intelligent_search", response.status)
+
+        data = await response.json()
+        results = data.get('results', [])
+
+        # Convert to DeerFlow format
+        formatted_results = []
+        for result in results:
+            formatted_results.append({
+                'title': result.get('title', 'Untitled'),
+                'url': result.get('url', ''),
+                'content': result.get('content', ''),
+                'source': result.get('source', 'Web'),
+                'score': result.get('score', 1.0)
+            })
+
+        logger.info(f"Intelligent search returned {len(formatted_results)} results from {data.get('searchEnginesUsed', [])}")
+        return formatted_results
+
 async def search_tavily(query: str, max_results: int = 8):
     """Search using Tavily API."""
-    url = "https://api.tavily.com/search"
+    url = TAVILY_SEARCH_URL
     params = {
         "api_key": TAVILY_API_KEY,
         "query": query,
@@ -258,10 +379,14 @@ async def search_tavily(query: str, max_results: int = 8):
         "include_raw_content": True
     }
 
-    response = requests.post(url, json=params, timeout=30)
+    session = get_http_session()
+    async with session.post(url, json=params, timeout=aiohttp.ClientTimeout(total=remaining_timeout(30))) as response:
+        if response.status != 200:
+            detail = await response.text()
+            logger.error(f"Tavily search failed: {response.status} - {detail}")
+            raise ProviderHTTPError("tavily", response.status, detail)
 
-    if response.status_code == 200:
-        data = response.json()
+        data = await response.json()
         results = data.get("results", [])
         return [
             {
@@ -273,9 +398,6 @@ async def search_tavily(query: str, max_results: int = 8):
             }
             for r in results
         ]
-    else:
-        logger.error(f"Tavily search failed: {response.status_code} - {response.text}")
-        return []
 
 async def search_duckduckgo(query: str, max_results: int = 8):
     """Search using DuckDuckGo Instant Answer API (no API key required)."""
@@ -288,44 +410,44 @@ async def search_duckduckgo(query: str, max_results: int = 8):
         encoded_query = quote(query)
         url = f"https://api.duckduckgo.com/?q={encoded_query}&format=json&no_html=1&skip_disambig=1"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=10) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    results = []
-
-                    # Process DuckDuckGo results
-                    if data.get('RelatedTopics'):
-                        for topic in data.get('RelatedTopics', [])[:max_results]:
-                            if isinstance(topic, dict) and 'Text' in topic and 'FirstURL' in topic:
-                                results.append({
-                                    'title': topic.get('Text', '')[:100] + '...' if len(topic.get('Text', '')) > 100 else topic.get('Text', ''),
-                                    'url': topic.get('FirstURL', ''),
-                                    'snippet': topic.get('Text', ''),
-                                    'domain': topic.get('FirstURL', '').split('/')[2] if '/' in topic.get('FirstURL', '') else 'duckduckgo.com'
-                                })
-
-                    # If no related topics, try abstract
-                    if not results and data.get('Abstract'):
-                        results.append({
-                            'title': data.get('Heading', 'DuckDuckGo Result'),
-                            'url': data.get('AbstractURL', 'https://duckduckgo.com'),
-                            'snippet': data.get('Abstract', ''),
-                            'domain': data.get('AbstractURL', '').split('/')[2] if data.get('AbstractURL') and '/' in data.get('AbstractURL') else 'duckduckgo.com'
-                        })
-
-                    logger.info(f"DuckDuckGo search returned {len(results)} results")
-                    return results
-                else:
-                    logger.error(f"DuckDuckGo API error: {response.status}")
-                    return []
+        session = get_http_session()
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=remaining_timeout(10))) as response:
+            if response.status == 200:
+                data = await response.json()
+                results = []
+
+                # Process DuckDuckGo results
+                if data.get('RelatedTopics'):
+                    for topic in data.get('RelatedTopics', [])[:max_results]:
+                        if isinstance(topic, dict) and 'Text' in topic and 'FirstURL' in topic:
+                            results.append({
+                                'title': topic.get('Text', '')[:100] + '...' if len(topic.get('Text', '')) > 100 else topic.get('Text', ''),
+                                'url': topic.get('FirstURL', ''),
+                                'snippet': topic.get('Text', ''),
+                                'domain': topic.get('FirstURL', '').split('/')[2] if '/' in topic.get('FirstURL', '') else 'duckduckgo.com'
+                            })
+
+                # If no related topics, try abstract
+                if not results and data.get('Abstract'):
+                    results.append({
+                        'title': data.get('Heading', 'DuckDuckGo Result'),
+                        'url': data.get('AbstractURL', 'https://duckduckgo.com'),
+                        'snippet': data.get('Abstract', ''),
+                        'domain': data.get('AbstractURL', '').split('/')[2] if data.get('AbstractURL') and '/' in data.get('AbstractURL') else 'duckduckgo.com'
+                    })
+
+                logger.info(f"DuckDuckGo search returned {len(results)} results")
+                return results
+            else:
+                logger.error(f"DuckDuckGo API error: {response.status}")
+                return []
     except Exception as e:
         logger.error(f"DuckDuckGo search failed: {e}")
         return []
 
 async def search_brave(query: str, max_results: int = 8):
     """Search using Brave Search API with enhanced features."""
-    url = "https://api.search.brave.com/res/v1/web/search"
+    url = BRAVE_SEARCH_URL
     headers = {
         "Accept": "application/json",
         "Accept-Encoding": "gzip",
@@ -339,24 +461,24 @@ async def search_brave(query: str, max_results: int = 8):
         "safesearch": "moderate"
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers, params=params, timeout=20) as response:
-            if response.status == 200:
-                data = await response.json()
-                results = data.get("web", {}).get("results", [])
-                return [
-                    {
-                        "title": r.get("title", ""),
-                        "url": r.get("url", ""),
-                        "content": r.get("description", ""),
-                        "score": 1.0 - (idx / len(results)) if len(results) > 0 else 0,
-                        "source": "brave"
-                    }
-                    for idx, r in enumerate(results)
-                ]
-            else:
-                logger.error(f"Brave search failed: {response.status}")
-                return []
+    session = get_http_session()
+    async with session.get(url, headers=headers, params=params, timeout=aiohttp.ClientTimeout(total=remaining_timeout(20))) as response:
+        if response.status == 200:
+            data = await response.json()
+            results = data.get("web", {}).get("results", [])
+            return [
+                {
+                    "title": r.get("title", ""),
+                    "url": r.get("url", ""),
+                    "content": r.get("description", ""),
+                    "score": 1.0 - (idx / len(results)) if len(results) > 0 else 0,
+                    "source": "brave"
+                }
+                for idx, r in enumerate(results)
+            ]
+        else:
+            logger.error(f"Brave search failed: {response.status}")
+            raise ProviderHTTPError("brave", response.status)
 
 async def search_newsdata(query: str, max_results: int = 5):
     """Search for news using NewsData.io API for current events."""
@@ -373,25 +495,25 @@ async def search_newsdata(query: str, max_results: int = 5):
             "prioritydomain": "top"
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params, timeout=15) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    articles = data.get("results", [])
-                    return [
-                        {
-                            "title": article.get("title", ""),
-                            "url": article.get("link", ""),
-                            "content": article.get("description", ""),
-                            "score": 1.0,
-                            "source": "newsdata",
-                            "published_date": article.get("pubDate", "")
-                        }
-                        for article in articles if article.get("link")
-                    ]
-                else:
-                    logger.error(f"NewsData search failed: {response.status}")
-                    return []
+        session = get_http_session()
+        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=remaining_timeout(15))) as response:
+            if response.status == 200:
+                data = await response.json()
+                articles = data.get("results", [])
+                return [
+                    {
+                        "title": article.get("title", ""),
+                        "url": article.get("link", ""),
+                        "content": article.get("description", ""),
+                        "score": 1.0,
+                        "source": "newsdata",
+                        "published_date": article.get("pubDate", "")
+                    }
+                    for article in articles if article.get("link")
+                ]
+            else:
+                logger.error(f"NewsData search failed: {response.status}")
+                return []
     except Exception as e:
         logger.error(f"NewsData search error: {e}")
         return []
@@ -494,15 +616,19 @@ QUALITY STANDARDS:
         "max_tokens": max_tokens
     }
 
-    response = requests.post(url, headers=headers, json=data, timeout=120)
+    async def post_completion():
+        session = get_http_session()
+        async with session.post(
+            url, headers=headers, json=data, timeout=aiohttp.ClientTimeout(total=remaining_timeout(120))
+        ) as response:
+            if response.status != 200:
+                detail = await response.text()
+                logger.error(f"DeepSeek API call failed: {response.status} - {detail}")
+                raise ProviderHTTPError("deepseek", response.status, detail)
+            response_data = await response.json()
+            return response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
 
-    if response.status_code == 200:
-        response_data = response.json()
-        generated_text = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
-        return generated_text
-    else:
-        logger.error(f"DeepSeek API call failed: {response.status_code} - {response.text}")
-        raise Exception(f"DeepSeek API call failed: {response.status_code}")
+    return await resilience.call("deepseek", post_completion)
 
 async def perform_deep_research(research_question: str, research_id: str, research_depth: int = 3):
     """Perform comprehensive research using multiple steps and sources."""
@@ -815,15 +941,31 @@ async def health_check():
             "error": str(e)
         }
 
+def wants_openmetrics(request: Request) -> bool:
+    """Prometheus-style scrapers ask for text exposition via Accept or ?format="""
+    if request.query_params.get("format") in ("openmetrics", "prometheus"):
+        return True
+    accept = request.headers.get("accept", "")
+    return "application/openmetrics-text" in accept or "text/plain" in accept
+
 @app.get("/metrics")
-async def get_metrics():
-    """Get detailed system metrics."""
+async def get_metrics(request: Request):
+    """Get detailed system metrics (JSON, or OpenMetrics text for scrapers)."""
+
+    if wants_openmetrics(request):
+        return Response(
+            content=render_collector(metrics, metrics_snapshot_store),
+            media_type=OPENMETRICS_CONTENT_TYPE
+        )
 
     try:
         metrics_data = {
             "system_metrics": metrics.get_metrics_summary(),
             "error_metrics": error_handler.get_error_summary(),
             "anomaly_detection": anomaly_detector.get_anomaly_summary() if ANOMALY_DETECTION_AVAILABLE else {"status": "unavailable"},
+            "providers": resilience.get_stats(),
+            "search_hedging": search_hedging.get_stats(),
+            "scheduler": task_manager.get_stats(),
             "configuration": {
                 "environment": config.environment,
                 "agent_config": {
@@ -844,6 +986,11 @@ async def get_metrics():
         logger.error(f"Metrics collection failed: {e}")
         raise HTTPException(status_code=500, detail=f"Metrics collection failed: {str(e)}")
 
+@app.get("/debug/loop")
+async def debug_event_loop():
+    """Event-loop lag percentiles and the stacks of recent blocking callbacks."""
+    return loop_monitor.get_report()
+
 @app.get("/config")
 async def get_configuration():
     """Get current system configuration (sanitized)."""
@@ -884,8 +1031,24 @@ async def read_root():
 if not DEEPSEEK_API_KEY:
     logger.warning("DeepSeek API key not found. LLM functionality will be unavailable.")
 
+def requester_id(user_id: Optional[str], http_request: Optional[Request]) -> str:
+    """Key used for per-user fairness in the task scheduler"""
+    if user_id:
+        return user_id
+    if http_request is not None and http_request.client:
+        return http_request.client.host
+    return "anonymous"
+
+def overloaded_error(error: Overloaded) -> HTTPException:
+    """429 telling the client when the queue should have room again"""
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
 @app.post("/research", response_model=ResearchResponse)
-async def perform_research_endpoint(request: ResearchRequest, background_tasks: BackgroundTasks):
+async def perform_research_endpoint(request: ResearchRequest, background_tasks: BackgroundTasks, http_request: Request):
     """Endpoint to perform deep research on a given topic."""
     logger.info(f"Received research request: {request.research_question}")
 
@@ -901,14 +1064,35 @@ async def perform_research_endpoint(request: ResearchRequest, background_tasks:
                 service_process_log=["Invalid research question provided"]
             )
 
-        # Perform research synchronously for immediate response
+        # Perform research synchronously for immediate response, in an interactive run slot.
+        # Searches and the LLM call cap their HTTP timeouts by what this deadline has left
+        deadline = Deadline(request.timeout or REQUEST_DEADLINE_SECONDS, "research")
         try:
-            result = await perform_deep_research(
-                request.research_question,
-                research_id,
-                int(request.research_depth or 3)
-            )
+            async with task_manager.slot(requester_id(request.user_id, http_request), TaskPriority.INTERACTIVE):
+                with deadline_scope(deadline):
+                    result = await run_stage(
+                        "deep_research",
+                        perform_deep_research(
+                            request.research_question,
+                            research_id,
+                            int(request.research_depth or 3)
+                        )
+                    )
+            result.deadline = deadline.report()
             return result
+        except Overloaded as e:
+            raise overloaded_error(e)
+        except DeadlineExceeded as e:
+            logger.warning(f"Research {research_id} ran out of time: {e}")
+            if research_id in research_state:
+                research_state[research_id]["status"] = "timeout"
+            return ResearchResponse(
+                status={"status": "timeout", "message": str(e)},
+                service_process_log=research_state.get(research_id, {}).get("log", []) + [f"Deadline exceeded: {e}"],
+                report="Research did not finish within its time budget.",
+                sources=[],
+                deadline=deadline.report()
+            )
         except Exception as research_error:
             logger.error(f"Research execution error: {research_error}")
             return ResearchResponse(
@@ -918,6 +1102,8 @@ async def perform_research_endpoint(request: ResearchRequest, background_tasks:
                 sources=[]
             )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Research endpoint error: {e}")
         return ResearchResponse(
@@ -947,6 +1133,9 @@ class AgentResearchRequest(BaseModel):
     include_reasoning: Optional[bool] = True
     learning_mode: Optional[bool] = True
     preferences: Optional[Dict[str, Any]] = None
+    user_id: Optional[str] = None
+    priority: Optional[str] = "batch"  # interactive or batch
+    timeout: Optional[float] = None  # Seconds, including queueing; defaults to DEERFLOW_REQUEST_DEADLINE
 
 class AgentResearchResponse(BaseModel):
     task_id: str
@@ -954,10 +1143,15 @@ class AgentResearchResponse(BaseModel):
     message: str
 
 @app.post("/agent/research", response_model=AgentResearchResponse)
-async def create_agent_research_task(request: AgentResearchRequest):
+async def create_agent_research_task(request: AgentResearchRequest, http_request: Request):
     """Create a new intelligent research task with planning and reasoning"""
     logger.info(f"Creating agent research task: {request.research_question}")
 
+    try:
+        priority = TaskPriority[(request.priority or "batch").upper()]
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown priority: {request.priority}")
+
     try:
         # Create task using agent core
         task_id = await agent_core.create_research_task(
@@ -967,7 +1161,10 @@ async def create_agent_research_task(request: AgentResearchRequest):
                 "include_reasoning": request.include_reasoning,
                 "learning_mode": request.learning_mode,
                 **(request.preferences or {})
-            }
+            },
+            user_id=requester_id(request.user_id, http_request),
+            priority=priority,
+            deadline=Deadline(request.timeout or REQUEST_DEADLINE_SECONDS, "agent_research")
         )
 
         return AgentResearchResponse(
@@ -976,6 +1173,8 @@ async def create_agent_research_task(request: AgentResearchRequest):
             message="Research task created successfully with intelligent planning"
         )
 
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         logger.error(f"Failed to create agent research task: {e}")
         return AgentResearchResponse(
@@ -1169,6 +1368,7 @@ class FullAgentResearchRequest(BaseModel):
     enable_multi_agent: Optional[bool] = True
     enable_reasoning: Optional[bool] = True
     preferences: Optional[Dict[str, Any]] = None
+    timeout: Optional[float] = None  # Seconds; defaults to DEERFLOW_REQUEST_DEADLINE
 
 @app.post("/deerflow/full-research")
 async def full_deerflow_research(request: FullAgentResearchRequest):
@@ -1178,15 +1378,19 @@ async def full_deerflow_research(request: FullAgentResearchRequest):
     try:
         logger.info(f"Full DeerFlow research request: {request.research_question}")
 
-        # Execute with full agent capabilities
-        result = await full_agent_system.process_complex_research(
-            query=request.research_question,
-            user_id=request.user_id,
-            preferences=request.preferences
-        )
+        # Orchestrator, agents and tools all read this deadline from context
+        deadline = Deadline(request.timeout or REQUEST_DEADLINE_SECONDS, "full_research")
+        async with task_manager.slot(request.user_id, TaskPriority.INTERACTIVE):
+            with deadline_scope(deadline):
+                result = await full_agent_system.process_complex_research(
+                    query=request.research_question,
+                    user_id=request.user_id,
+                    preferences=request.preferences
+                )
 
         return {
             "message": "Full DeerFlow agent research completed",
+            "deadline": deadline.report(),
             "capabilities": [
                 "Multi-agent orchestration",
                 "Advanced reasoning engine", 
@@ -1197,6 +1401,8 @@ async def full_deerflow_research(request: FullAgentResearchRequest):
             "result": result
         }
 
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         logger.error(f"Full DeerFlow research error: {e}")
         return {"error": str(e)}
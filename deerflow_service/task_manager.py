@@ -1,35 +1,225 @@
 
 import asyncio
 import logging
+import math
+import os
 import time
-from typing import Set, Dict, Any, Optional, Callable
+from collections import OrderedDict, deque
+from enum import IntEnum
+from typing import Set, Dict, Any, Optional, Callable, Deque
 from contextlib import asynccontextmanager
 
+from quantile_sketch import LogHistogram
+
 logger = logging.getLogger("task_manager")
 
+class TaskPriority(IntEnum):
+    """Scheduling classes; lower values are served first"""
+    INTERACTIVE = 0
+    BATCH = 1
+
+class Overloaded(Exception):
+    """Queue wait is over the SLO; the caller should retry after ``retry_after`` seconds"""
+
+    def __init__(self, priority: TaskPriority, estimated_wait: float, retry_after: int):
+        super().__init__(
+            f"{priority.name.lower()} queue wait {estimated_wait:.1f}s is over the SLO, retry after {retry_after}s"
+        )
+        self.priority = priority
+        self.estimated_wait = estimated_wait
+        self.retry_after = retry_after
+
+class _Ticket:
+    """A queued request for a run slot"""
+    __slots__ = ("user_id", "priority", "enqueued_at", "future")
+
+    def __init__(self, user_id: str, priority: TaskPriority):
+        self.user_id = user_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
 class TaskManager:
-    """Manages async tasks with proper lifecycle handling"""
-    
-    def __init__(self):
+    """Manages async tasks with proper lifecycle handling
+
+    Tasks run under a global concurrency cap. Waiting tasks are queued per
+    priority class, and within a class users take turns (round robin) so one
+    user's burst cannot starve the others. New work is shed with Overloaded
+    once the expected queue wait for its class goes over that class's SLO.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        queue_slo: Optional[Dict[TaskPriority, float]] = None,
+        max_queue: int = 256
+    ):
         self.tasks: Set[asyncio.Task] = set()
         self.task_registry: Dict[str, asyncio.Task] = {}
-    
+
+        self.max_concurrency = max_concurrency
+        self.queue_slo = queue_slo or {TaskPriority.INTERACTIVE: 10.0, TaskPriority.BATCH: 120.0}
+        self.max_queue = max_queue
+        self.running = 0
+        self._queues: Dict[TaskPriority, "OrderedDict[str, Deque[_Ticket]]"] = {
+            priority: OrderedDict() for priority in TaskPriority
+        }
+        self._queued: Dict[TaskPriority, int] = {priority: 0 for priority in TaskPriority}
+        self._wait_ewma: Dict[TaskPriority, float] = {priority: 0.0 for priority in TaskPriority}
+        self._service_ewma = 0.0
+        self.queue_wait: Dict[TaskPriority, LogHistogram] = {priority: LogHistogram() for priority in TaskPriority}
+        self.stats = {
+            priority: {"admitted": 0, "queued": 0, "shed": 0} for priority in TaskPriority
+        }
+
+    # Scheduling
+
+    def _waiting_ahead(self, priority: TaskPriority) -> int:
+        return sum(self._queued[p] for p in TaskPriority if p <= priority)
+
+    def estimated_wait(self, priority: TaskPriority) -> float:
+        """Expected queue wait for new work
+
+        The largest of: the queue ahead drained at the recent service rate,
+        recent waits in this class, and the oldest waiter's age.
+        """
+        ahead = self._waiting_ahead(priority)
+        if self.running < self.max_concurrency and ahead == 0:
+            return 0.0
+        now = time.monotonic()
+        oldest = max(
+            (now - users[0].enqueued_at for users in self._queues[priority].values() if users),
+            default=0.0
+        )
+        predicted = (ahead + 1) / self.max_concurrency * self._service_ewma
+        return max(predicted, self._wait_ewma[priority], oldest)
+
+    def check_admission(self, priority: TaskPriority = TaskPriority.INTERACTIVE):
+        """Raise Overloaded if work of this class should be shed right now"""
+        wait = self.estimated_wait(priority)
+        if wait > self.queue_slo[priority] or self._queued[priority] >= self.max_queue:
+            self.stats[priority]["shed"] += 1
+            retry_after = min(60, max(1, math.ceil(wait)))
+            logger.warning(f"Shedding {priority.name.lower()} work: estimated wait {wait:.1f}s")
+            raise Overloaded(priority, wait, retry_after)
+
+    def _record_wait(self, priority: TaskPriority, wait: float):
+        self.queue_wait[priority].record(wait)
+        self._wait_ewma[priority] = 0.8 * self._wait_ewma[priority] + 0.2 * wait
+
+    async def _acquire(self, user_id: str, priority: TaskPriority):
+        """Wait for a run slot"""
+        self.stats[priority]["admitted"] += 1
+        if self.running < self.max_concurrency and self._waiting_ahead(priority) == 0:
+            self.running += 1
+            self._record_wait(priority, 0.0)
+            return
+
+        ticket = _Ticket(user_id, priority)
+        self._queues[priority].setdefault(user_id, deque()).append(ticket)
+        self._queued[priority] += 1
+        self.stats[priority]["queued"] += 1
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # Granted a slot just as we were cancelled
+                self._release()
+            else:
+                self._discard(ticket)
+            raise
+        self._record_wait(priority, time.monotonic() - ticket.enqueued_at)
+
+    def _discard(self, ticket: _Ticket):
+        users = self._queues[ticket.priority]
+        queue = users.get(ticket.user_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            self._queued[ticket.priority] -= 1
+            if not queue:
+                del users[ticket.user_id]
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        for priority in TaskPriority:
+            users = self._queues[priority]
+            if not users:
+                continue
+            # Round robin: serve the first user, then move them to the back
+            user_id, queue = next(iter(users.items()))
+            ticket = queue.popleft()
+            self._queued[priority] -= 1
+            if queue:
+                users.move_to_end(user_id)
+            else:
+                del users[user_id]
+            return ticket
+        return None
+
+    def _release(self, started_at: Optional[float] = None):
+        if started_at is not None:
+            duration = time.monotonic() - started_at
+            # Seed with the first sample so a cold scheduler does not admit everything
+            self._service_ewma = 0.8 * self._service_ewma + 0.2 * duration if self._service_ewma else duration
+        self.running -= 1
+        while self.running < self.max_concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+            if ticket.future.done():
+                continue
+            self.running += 1
+            ticket.future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, user_id: str = "anonymous", priority: TaskPriority = TaskPriority.INTERACTIVE):
+        """Run a block under the scheduler; raises Overloaded when shedding"""
+        self.check_admission(priority)
+        await self._acquire(user_id, priority)
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(started_at)
+
+    # Task lifecycle
+
     async def create_managed_task(
-        self, 
-        coro, 
+        self,
+        coro,
         task_id: str,
-        timeout: Optional[float] = None
+        timeout: Optional[float] = None,
+        user_id: str = "anonymous",
+        priority: TaskPriority = TaskPriority.INTERACTIVE
     ) -> asyncio.Task:
-        """Create a managed task with proper error handling"""
-        task = asyncio.create_task(self._wrapped_task(coro, task_id, timeout))
+        """Create a managed task with proper error handling
+
+        Admission is decided here, so Overloaded is raised to the caller; the
+        task itself waits in the queue for a run slot.
+        """
+        try:
+            self.check_admission(priority)
+        except Overloaded:
+            coro.close()
+            raise
+        task = asyncio.create_task(self._wrapped_task(coro, task_id, timeout, user_id, priority))
         self.tasks.add(task)
         self.task_registry[task_id] = task
         task.add_done_callback(lambda t: self.tasks.discard(t))
         return task
-    
-    async def _wrapped_task(self, coro, task_id: str, timeout: Optional[float]):
-        """Wrap task with timeout and error handling"""
+
+    async def _wrapped_task(
+        self,
+        coro,
+        task_id: str,
+        timeout: Optional[float],
+        user_id: str = "anonymous",
+        priority: TaskPriority = TaskPriority.INTERACTIVE
+    ):
+        """Wrap task with scheduling, timeout and error handling"""
+        started_at = None
         try:
+            await self._acquire(user_id, priority)
+            started_at = time.monotonic()
             if timeout:
                 return await asyncio.wait_for(coro, timeout)
             return await coro
@@ -40,8 +230,12 @@ class TaskManager:
             logger.error(f"Task {task_id} failed: {e}")
             raise
         finally:
+            if started_at is not None:
+                self._release(started_at)
+            else:
+                coro.close()
             self.task_registry.pop(task_id, None)
-    
+
     async def cancel_task(self, task_id: str) -> bool:
         """Cancel a specific task"""
         task = self.task_registry.get(task_id)
@@ -53,13 +247,50 @@ class TaskManager:
                 logger.info(f"Task {task_id} cancelled successfully")
                 return True
         return False
-    
+
     async def shutdown(self):
         """Gracefully shutdown all tasks"""
         for task in self.tasks:
             if not task.done():
                 task.cancel()
-        
+
         await asyncio.gather(*self.tasks, return_exceptions=True)
         self.tasks.clear()
         self.task_registry.clear()
+
+    # Observability
+
+    def queue_depths(self) -> Dict[str, float]:
+        return {priority.name.lower(): self._queued[priority] for priority in TaskPriority}
+
+    def queue_wait_p95(self) -> Dict[str, float]:
+        return {
+            priority.name.lower(): self.queue_wait[priority].quantile(0.95) or 0.0
+            for priority in TaskPriority
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "classes": {
+                priority.name.lower(): {
+                    **self.stats[priority],
+                    "waiting": self._queued[priority],
+                    "users_waiting": len(self._queues[priority]),
+                    "slo": self.queue_slo[priority],
+                    "estimated_wait": self.estimated_wait(priority),
+                    "queue_wait": self.queue_wait[priority].summary()
+                }
+                for priority in TaskPriority
+            }
+        }
+
+# Shared scheduler for research pipelines started by the service
+task_manager = TaskManager(
+    max_concurrency=int(os.getenv("DEERFLOW_MAX_PIPELINES", "8")),
+    queue_slo={
+        TaskPriority.INTERACTIVE: float(os.getenv("DEERFLOW_INTERACTIVE_QUEUE_SLO", "10")),
+        TaskPriority.BATCH: float(os.getenv("DEERFLOW_BATCH_QUEUE_SLO", "120")),
+    }
+)
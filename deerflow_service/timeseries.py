@@ -0,0 +1,213 @@
+"""
+Fixed-Memory Time-Series Storage for DeerFlow Metrics
+
+This module provides NumPy-backed ring buffers that hold one metric family
+each. Points carry an interned label set instead of being keyed per task, so
+recording is O(1) and memory stays constant regardless of how many tasks run.
+"""
+
+import time
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("timeseries")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Label id used once a family has exhausted its label-set budget
+OVERFLOW_LABEL_ID = 0
+OVERFLOW_LABELS: LabelKey = (("overflow", "true"),)
+
+
+class RingBuffer:
+    """Fixed-capacity circular buffer of (timestamp, value, label_id) rows"""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.label_ids = np.zeros(capacity, dtype=np.int32)
+        self.head = 0  # Next write position
+        self.size = 0
+
+    def append(self, timestamp: float, value: float, label_id: int):
+        """Write one point, overwriting the oldest once full"""
+        i = self.head
+        self.timestamps[i] = timestamp
+        self.values[i] = value
+        self.label_ids[i] = label_id
+        self.head = (i + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def _ordered_indices(self) -> np.ndarray:
+        """Index array of live rows, oldest first"""
+        start = (self.head - self.size) % self.capacity
+        return (np.arange(self.size) + start) % self.capacity
+
+    def window(self, cutoff: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return (timestamps, values, label_ids) newer than cutoff, oldest first"""
+        if self.size == 0:
+            empty = np.empty(0)
+            return empty, empty, np.empty(0, dtype=np.int32)
+
+        idx = self._ordered_indices()
+        ts = self.timestamps[idx]
+        mask = ts > cutoff
+        return ts[mask], self.values[idx][mask], self.label_ids[idx][mask]
+
+    def expire(self, cutoff: float):
+        """Drop every point at or before cutoff
+
+        Timestamps need not be monotonic (wall-clock steps, late writes), so
+        stale rows are found with a mask and the survivors compacted in order.
+        """
+        if self.size == 0:
+            return
+        idx = self._ordered_indices()
+        keep = idx[self.timestamps[idx] > cutoff]
+        kept = keep.size
+        if kept == self.size:
+            return
+        # Fancy indexing copies, so compacting in place is safe
+        self.timestamps[:kept] = self.timestamps[keep]
+        self.values[:kept] = self.values[keep]
+        self.label_ids[:kept] = self.label_ids[keep]
+        self.head = kept % self.capacity
+        self.size = kept
+
+    def clear(self):
+        self.head = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class MetricFamily:
+    """A named series of points sharing one ring buffer and a label dictionary"""
+
+    def __init__(self, name: str, capacity: int = 4096, max_label_sets: int = 256):
+        self.name = name
+        self.buffer = RingBuffer(capacity)
+        self.max_label_sets = max_label_sets
+        self._label_ids: Dict[LabelKey, int] = {OVERFLOW_LABELS: OVERFLOW_LABEL_ID}
+        self._label_sets: List[LabelKey] = [OVERFLOW_LABELS]
+        self.total_recorded = 0
+
+    def _intern_labels(self, labels: Optional[Dict[str, str]]) -> int:
+        key: LabelKey = tuple(sorted((labels or {}).items()))
+        label_id = self._label_ids.get(key)
+        if label_id is not None:
+            return label_id
+
+        if len(self._label_sets) >= self.max_label_sets:
+            logger.warning(f"Metric family {self.name} exceeded {self.max_label_sets} label sets")
+            return OVERFLOW_LABEL_ID
+
+        label_id = len(self._label_sets)
+        self._label_ids[key] = label_id
+        self._label_sets.append(key)
+        return label_id
+
+    def record(self, value: float, labels: Optional[Dict[str, str]] = None, timestamp: Optional[float] = None):
+        """Record a point in O(1)"""
+        self.buffer.append(timestamp if timestamp is not None else time.time(), value, self._intern_labels(labels))
+        self.total_recorded += 1
+
+    def labels_for(self, label_id: int) -> Dict[str, str]:
+        return dict(self._label_sets[label_id])
+
+    def points(self, window_seconds: float, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Materialize points inside the window as dictionaries"""
+        now = now if now is not None else time.time()
+        ts, values, label_ids = self.buffer.window(now - window_seconds)
+        return [
+            {"timestamp": float(t), "value": float(v), "labels": self.labels_for(int(l))}
+            for t, v, l in zip(ts, values, label_ids)
+        ]
+
+    def aggregate(self, window_seconds: float, now: Optional[float] = None) -> Dict[LabelKey, Dict[str, float]]:
+        """Vectorized count/sum/min/max/mean per label set over the window"""
+        now = now if now is not None else time.time()
+        _, values, label_ids = self.buffer.window(now - window_seconds)
+        if values.size == 0:
+            return {}
+
+        n_labels = len(self._label_sets)
+        counts = np.bincount(label_ids, minlength=n_labels)
+        sums = np.bincount(label_ids, weights=values, minlength=n_labels)
+        mins = np.full(n_labels, np.inf)
+        maxs = np.full(n_labels, -np.inf)
+        np.minimum.at(mins, label_ids, values)
+        np.maximum.at(maxs, label_ids, values)
+
+        result = {}
+        for label_id in np.flatnonzero(counts):
+            count = int(counts[label_id])
+            result[self._label_sets[label_id]] = {
+                "count": count,
+                "sum": float(sums[label_id]),
+                "min": float(mins[label_id]),
+                "max": float(maxs[label_id]),
+                "mean": float(sums[label_id] / count),
+            }
+        return result
+
+    def expire(self, cutoff: float):
+        self.buffer.expire(cutoff)
+
+    def clear(self):
+        self.buffer.clear()
+        self.total_recorded = 0
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+
+class TimeSeriesStore:
+    """Registry of metric families with a fixed per-family footprint"""
+
+    def __init__(self, capacity: int = 4096, max_label_sets: int = 256):
+        self.capacity = capacity
+        self.max_label_sets = max_label_sets
+        self.families: Dict[str, MetricFamily] = {}
+
+    def family(self, name: str) -> MetricFamily:
+        family = self.families.get(name)
+        if family is None:
+            family = MetricFamily(name, self.capacity, self.max_label_sets)
+            self.families[name] = family
+        return family
+
+    def record(self, name: str, value: float, labels: Optional[Dict[str, str]] = None, timestamp: Optional[float] = None):
+        self.family(name).record(value, labels, timestamp)
+
+    def expire(self, cutoff: float):
+        """Drop points older than cutoff from every family"""
+        for family in self.families.values():
+            family.expire(cutoff)
+
+    def memory_bytes(self) -> int:
+        """Bytes held by ring buffer arrays (constant per family)"""
+        return sum(
+            f.buffer.timestamps.nbytes + f.buffer.values.nbytes + f.buffer.label_ids.nbytes
+            for f in self.families.values()
+        )
+
+    def clear(self):
+        self.families.clear()
+
+    def items(self):
+        return self.families.items()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.families
+
+    def __len__(self) -> int:
+        """Number of families currently holding points"""
+        return sum(1 for f in self.families.values() if len(f) > 0)
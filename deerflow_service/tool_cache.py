@@ -0,0 +1,434 @@
+"""
+Tool Result Cache for DeerFlow
+
+This module provides the cache behind enhanced_tools.CacheManager. Values are
+serialized once on write, which gives exact byte accounting and copy-on-read
+semantics. The memory tier is an LRU bounded by bytes and entry count, and
+entries it evicts can spill to a local disk tier. A hashed timing wheel expires
+entries in the background so unused keys do not linger until the next read.
+Backends share one small interface so another tier (e.g. Redis) can be
+stacked behind memory later.
+"""
+
+import json
+import time
+import pickle
+import asyncio
+import hashlib
+import logging
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple, Set
+
+logger = logging.getLogger("tool_cache")
+
+# Every ToolCache alive in this process, for metrics exposition
+_live_caches: "weakref.WeakSet[ToolCache]" = weakref.WeakSet()
+
+# Rough per-entry bookkeeping cost added to the payload size
+ENTRY_OVERHEAD_BYTES = 96
+
+
+class Serializer(ABC):
+    """Converts cached values to and from bytes"""
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        pass
+
+
+class PickleSerializer(Serializer):
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+class JSONSerializer(Serializer):
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+SERIALIZERS = {"pickle": PickleSerializer, "json": JSONSerializer}
+
+
+class CacheEntry:
+    __slots__ = ("data", "expires_at", "tool")
+
+    def __init__(self, data: bytes, expires_at: float, tool: str):
+        self.data = data
+        self.expires_at = expires_at
+        self.tool = tool
+
+    def size(self, key: str) -> int:
+        return len(self.data) + len(key) + ENTRY_OVERHEAD_BYTES
+
+
+class CacheBackend(ABC):
+    """One cache tier storing serialized entries"""
+
+    name = "backend"
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, entry: CacheEntry) -> List[Tuple[str, CacheEntry]]:
+        """Store an entry, returning entries evicted to make room"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> Optional[CacheEntry]:
+        pass
+
+    @abstractmethod
+    async def clear(self):
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        pass
+
+
+class MemoryLRUBackend(CacheBackend):
+    """In-process LRU bounded by total bytes and entry count"""
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 10000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry) -> List[Tuple[str, CacheEntry]]:
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old.size(key)
+        if entry.size(key) > self.max_bytes:
+            # Larger than the whole tier: hand it straight to the next one
+            return [(key, entry)]
+
+        self.entries[key] = entry
+        self.bytes += entry.size(key)
+
+        evicted = []
+        while self.bytes > self.max_bytes or len(self.entries) > self.max_entries:
+            old_key, old_entry = self.entries.popitem(last=False)
+            self.bytes -= old_entry.size(old_key)
+            self.evictions += 1
+            evicted.append((old_key, old_entry))
+        return evicted
+
+    async def delete(self, key: str) -> Optional[CacheEntry]:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size(key)
+        return entry
+
+    async def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions
+        }
+
+
+class DiskBackend(CacheBackend):
+    """Spill tier of one file per entry, bounded by total bytes
+
+    The index (key -> path, size, expiry, tool) lives in memory, so the tier
+    starts empty after a restart. File I/O runs in worker threads.
+    """
+
+    name = "disk"
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.index: "OrderedDict[str, Tuple[Path, int, float, str]]" = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (hashlib.sha1(key.encode("utf-8")).hexdigest() + ".bin")
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        meta = self.index.get(key)
+        if meta is None:
+            return None
+        path, _, expires_at, tool = meta
+        try:
+            data = await asyncio.to_thread(path.read_bytes)
+        except OSError:
+            await self.delete(key)
+            return None
+        self.index.move_to_end(key)
+        return CacheEntry(data, expires_at, tool)
+
+    async def set(self, key: str, entry: CacheEntry) -> List[Tuple[str, CacheEntry]]:
+        await self.delete(key)
+        if len(entry.data) > self.max_bytes:
+            # Larger than the whole tier: writing it would evict everything, itself included
+            return [(key, entry)]
+        path = self._path(key)
+        await asyncio.to_thread(path.write_bytes, entry.data)
+        size = len(entry.data)
+        self.index[key] = (path, size, entry.expires_at, entry.tool)
+        self.bytes += size
+
+        evicted = []
+        while self.bytes > self.max_bytes and self.index:
+            old_key = next(iter(self.index))
+            evicted.append((old_key, await self.delete(old_key)))
+            self.evictions += 1
+        return evicted
+
+    async def delete(self, key: str) -> Optional[CacheEntry]:
+        meta = self.index.pop(key, None)
+        if meta is None:
+            return None
+        path, size, expires_at, tool = meta
+        self.bytes -= size
+        try:
+            await asyncio.to_thread(path.unlink)
+        except OSError:
+            pass
+        return CacheEntry(b"", expires_at, tool)
+
+    async def clear(self):
+        for key in list(self.index):
+            await self.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.index),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
+
+
+class TTLWheel:
+    """Hashed timing wheel of keys bucketed by expiry tick
+
+    Keys whose TTL is longer than one revolution come back around early; the
+    caller checks the real expiry and reschedules them.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self.slots: List[Set[str]] = [set() for _ in range(slots)]
+        self.current_tick = int(time.time() / tick)
+
+    def schedule(self, key: str, expires_at: float):
+        tick = max(int(expires_at / self.tick), self.current_tick + 1)
+        self.slots[tick % len(self.slots)].add(key)
+
+    def advance(self, now: float) -> Set[str]:
+        """Pop keys from every slot passed since the last advance"""
+        target = int(now / self.tick)
+        due: Set[str] = set()
+        steps = min(target - self.current_tick, len(self.slots))
+        for step in range(1, steps + 1):
+            slot = self.slots[(self.current_tick + step) % len(self.slots)]
+            due |= slot
+            slot.clear()
+        self.current_tick = max(self.current_tick, target)
+        return due
+
+
+class ToolCache:
+    """Tiered, TTL-aware cache with per-tool statistics"""
+
+    def __init__(
+        self,
+        tiers: List[CacheBackend],
+        serializer: Optional[Serializer] = None,
+        default_ttl: float = 300.0,
+        sweep_interval: float = 1.0
+    ):
+        if not tiers:
+            raise ValueError("ToolCache needs at least one backend")
+        self.tiers = tiers
+        self.serializer = serializer or PickleSerializer()
+        self.default_ttl = default_ttl
+        self.sweep_interval = sweep_interval
+        self.wheel = TTLWheel(tick=sweep_interval)
+        self.expiries: Dict[str, float] = {}
+        self.tool_stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0}
+        )
+        self._sweeper: Optional[asyncio.Task] = None
+        _live_caches.add(self)
+
+    @staticmethod
+    def tool_for(key: str) -> str:
+        """Tool name from a "tool:..." style key"""
+        return key.split(":", 1)[0] if ":" in key else "default"
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            try:
+                self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+            except RuntimeError:
+                pass  # No running loop; entries still expire on read
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.warning(f"Cache sweep failed: {e}")
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """Remove entries whose TTL has passed; returns how many were removed"""
+        now = now if now is not None else time.time()
+        removed = 0
+        for key in self.wheel.advance(now):
+            expires_at = self.expiries.get(key)
+            if expires_at is None:
+                continue
+            if expires_at > now:
+                self.wheel.schedule(key, expires_at)
+                continue
+            await self._expire(key)
+            removed += 1
+        return removed
+
+    async def _expire(self, key: str):
+        self.expiries.pop(key, None)
+        for tier in self.tiers:
+            entry = await tier.delete(key)
+            if entry is not None:
+                self.tool_stats[entry.tool]["expirations"] += 1
+
+    async def get(self, key: str, tool: Optional[str] = None) -> Optional[Any]:
+        tool = tool or self.tool_for(key)
+        now = time.time()
+        for depth, tier in enumerate(self.tiers):
+            entry = await tier.get(key)
+            if entry is None:
+                continue
+            if entry.expires_at <= now:
+                await self._expire(key)
+                break
+            if depth > 0:
+                # Promote to the memory tier
+                await tier.delete(key)
+                await self._store(key, entry, start=0)
+            self.tool_stats[tool]["hits"] += 1
+            return self.serializer.loads(entry.data)
+
+        self.tool_stats[tool]["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, tool: Optional[str] = None):
+        tool = tool or self.tool_for(key)
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        entry = CacheEntry(self.serializer.dumps(value), expires_at, tool)
+
+        # Drop stale copies in lower tiers
+        for tier in self.tiers[1:]:
+            await tier.delete(key)
+        self.tool_stats[tool]["sets"] += 1
+        if await self._store(key, entry, start=0):
+            self.expiries[key] = expires_at
+            self.wheel.schedule(key, expires_at)
+        self._ensure_sweeper()
+
+    async def _store(self, key: str, entry: CacheEntry, start: int) -> bool:
+        """Write to tier ``start``, cascading its evictions down the tiers
+
+        Returns False when ``key`` itself fell out of the last tier.
+        """
+        pending = [(key, entry)]
+        for tier in self.tiers[start:]:
+            spilled = []
+            for item_key, item in pending:
+                spilled.extend(await tier.set(item_key, item))
+            pending = spilled
+            if not pending:
+                return True
+        # Evicted from the last tier
+        stored = True
+        for item_key, item in pending:
+            stored = stored and item_key != key
+            self.expiries.pop(item_key, None)
+            self.tool_stats[item.tool]["evictions"] += 1
+        return stored
+
+    async def delete(self, key: str):
+        self.expiries.pop(key, None)
+        for tier in self.tiers:
+            await tier.delete(key)
+
+    async def clear(self):
+        self.expiries.clear()
+        for tier in self.tiers:
+            await tier.clear()
+
+    async def close(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def __len__(self) -> int:
+        return len(self.expiries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        tools = {}
+        for tool, stats in self.tool_stats.items():
+            lookups = stats["hits"] + stats["misses"]
+            tools[tool] = {**stats, "hit_ratio": stats["hits"] / lookups if lookups else 0.0}
+
+        hits = sum(s["hits"] for s in self.tool_stats.values())
+        misses = sum(s["misses"] for s in self.tool_stats.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "size": len(self.expiries),
+            "tiers": {tier.name: tier.stats() for tier in self.tiers},
+            "tools": tools
+        }
+
+
+def combined_stats() -> Dict[str, int]:
+    """Hits, misses and entry count summed over every live ToolCache"""
+    totals = {"hits": 0, "misses": 0, "size": 0}
+    for cache in list(_live_caches):
+        for stats in cache.tool_stats.values():
+            totals["hits"] += stats["hits"]
+            totals["misses"] += stats["misses"]
+        totals["size"] += len(cache)
+    return totals
@@ -7,22 +7,55 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional, Type
 import backoff
 
+from deadline import DeadlineExceeded, run_stage
+
 logger = logging.getLogger("tools")
 
 class BaseTool(ABC):
-    """Base class for all research tools"""
+    """Base class for all research tools
+    
+    A tool owns one HTTP session for its lifetime. ToolRegistry opens it on
+    startup (or first use) and closes it on shutdown so connections are reused
+    across calls; ``async with tool:`` still works for one-off use.
+    """
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.session: Optional[aiohttp.ClientSession] = None
+        self.max_concurrency = config.get("max_concurrency", 8)
+    
+    async def open(self):
+        """Create the shared HTTP session if it is not already open"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.get("connection_limit", self.max_concurrency * 2),
+                ttl_dns_cache=300
+            )
+            timeout = aiohttp.ClientTimeout(total=self.config.get("timeout", 30))
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    
+    async def close(self):
+        """Close the HTTP session"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+    
+    async def health_check(self) -> bool:
+        """Probe the tool's upstream; without a ``health_url`` an open session counts as healthy"""
+        if self.session is None or self.session.closed:
+            return False
+        health_url = self.config.get("health_url")
+        if not health_url:
+            return True
+        async with self.session.get(health_url) as response:
+            return response.status < 500
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        await self.open()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        await self.close()
     
     @abstractmethod
     async def execute(self, query: str, **kwargs) -> Dict[str, Any]:
@@ -121,12 +154,22 @@ class FinancialSearchTool(BaseTool):
             }
 
 class ToolRegistry:
-    """Registry for managing available tools"""
+    """Registry for managing available tools
+    
+    Tool instances are long-lived: ``start()`` opens them, ``shutdown()``
+    closes them. Each tool has a concurrency limit, and a background loop
+    probes tool health so calls to an unhealthy tool fail fast.
+    """
     
-    def __init__(self):
+    def __init__(self, health_interval: float = 30.0, health_timeout: float = 5.0):
         self.tools: Dict[str, Type[BaseTool]] = {}
         self.instances: Dict[str, BaseTool] = {}
         self.configs: Dict[str, Dict[str, Any]] = {}
+        self.limits: Dict[str, asyncio.Semaphore] = {}
+        self.health: Dict[str, Dict[str, Any]] = {}
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._health_task: Optional[asyncio.Task] = None
     
     def register(self, name: str, tool_class: Type[BaseTool], config: Dict[str, Any]):
         """Register a tool"""
@@ -134,15 +177,89 @@ class ToolRegistry:
         self.configs[name] = config
         logger.info(f"Registered tool: {name}")
     
+    async def start(self):
+        """Open every registered tool and start health probing"""
+        for name in self.tools:
+            await self.get_tool(name)
+        await self.probe_health()
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"Tool registry started with {len(self.instances)} tools")
+    
+    async def shutdown(self):
+        """Stop health probing and close every tool"""
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        
+        for name, tool in self.instances.items():
+            try:
+                await tool.close()
+            except Exception as e:
+                logger.warning(f"Failed to close tool {name}: {e}")
+        self.instances.clear()
+        self.limits.clear()
+        logger.info("Tool registry shut down")
+    
     async def get_tool(self, name: str) -> Optional[BaseTool]:
-        """Get or create tool instance"""
+        """Get or create tool instance, opened and ready for calls"""
         if name not in self.instances:
             if name in self.tools:
                 tool_class = self.tools[name]
                 config = self.configs.get(name, {})
-                self.instances[name] = tool_class(config)
+                tool = tool_class(config)
+                self.instances[name] = tool
+                self.limits[name] = asyncio.Semaphore(tool.max_concurrency)
         
-        return self.instances.get(name)
+        tool = self.instances.get(name)
+        if tool is not None:
+            await tool.open()
+        return tool
+    
+    def is_healthy(self, name: str) -> bool:
+        """Tools that have not been probed yet count as healthy"""
+        return self.health.get(name, {}).get("healthy", True)
+    
+    async def _probe(self, name: str, tool: BaseTool):
+        start = time.time()
+        error = None
+        try:
+            healthy = await asyncio.wait_for(tool.health_check(), self.health_timeout)
+        except Exception as e:
+            healthy = False
+            error = str(e) or type(e).__name__
+        
+        if not healthy and self.is_healthy(name):
+            logger.warning(f"Tool {name} failed its health check: {error}")
+        elif healthy and not self.is_healthy(name):
+            logger.info(f"Tool {name} is healthy again")
+        
+        self.health[name] = {
+            "healthy": healthy,
+            "error": error,
+            "latency": time.time() - start,
+            "checked_at": time.time()
+        }
+    
+    async def probe_health(self):
+        """Run every tool's health check concurrently"""
+        await asyncio.gather(*(self._probe(name, tool) for name, tool in list(self.instances.items())))
+    
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.probe_health()
+            except Exception as e:
+                logger.error(f"Tool health probing failed: {e}")
+    
+    async def _execute_limited(self, tool_name: str, tool: BaseTool, query: str, **kwargs) -> Dict[str, Any]:
+        async with self.limits[tool_name]:
+            return await tool.execute(query, **kwargs)
     
     async def execute_tool(
         self, 
@@ -158,11 +275,23 @@ class ToolRegistry:
                 "error": f"Tool {tool_name} not found"
             }
         
+        if not self.is_healthy(tool_name):
+            return {
+                "status": "error",
+                "error": f"Tool {tool_name} is unhealthy: {self.health[tool_name].get('error')}"
+            }
+        
         try:
-            async with tool:
-                result = await tool.execute(query, **kwargs)
-                logger.info(f"Tool {tool_name} executed successfully")
-                return result
+            # Bounded by the caller's deadline, if one is active, including the wait for a slot
+            result = await run_stage(f"tool:{tool_name}", self._execute_limited(tool_name, tool, query, **kwargs))
+            logger.info(f"Tool {tool_name} executed successfully")
+            return result
+        except DeadlineExceeded as e:
+            logger.warning(f"Tool {tool_name} cancelled: {e}")
+            return {
+                "status": "timeout",
+                "error": str(e)
+            }
         except Exception as e:
             logger.error(f"Tool {tool_name} execution failed: {e}")
             return {
@@ -170,6 +299,14 @@ class ToolRegistry:
                 "error": str(e)
             }
     
+    async def execute_many(self, tool_name: str, queries: List[str], **kwargs) -> List[Dict[str, Any]]:
+        """Run several queries on one tool over its shared session, results in query order"""
+        return await asyncio.gather(*(self.execute_tool(tool_name, query, **kwargs) for query in queries))
+    
     def get_available_tools(self) -> List[str]:
         """Get list of available tools"""
         return list(self.tools.keys())
+    
+    def get_health(self) -> Dict[str, Dict[str, Any]]:
+        """Latest health probe result per tool"""
+        return dict(self.health)
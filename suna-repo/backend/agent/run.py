@@ -1,8 +1,9 @@
 import os
 import json
 import re
+import time
 from uuid import uuid4
-from typing import Optional
+from typing import Any, Dict, Optional
 
 # from agent.tools.message_tool import MessageTool
 from agent.tools.message_tool import MessageTool
@@ -20,12 +21,126 @@ from agent.tools.sb_browser_tool import SandboxBrowserTool
 from agent.tools.data_providers_tool import DataProvidersTool
 from agent.prompt import get_system_prompt
 from utils.logger import logger
+from utils.spans import RunSpans, span
 from utils.auth_utils import get_account_id_from_thread
 from services.billing import check_billing_status
 from agent.tools.sb_vision_tool import SandboxVisionTool
 
 load_dotenv()
 
+# Seconds to use the separate queries after the get_iteration_context RPC failed
+ITERATION_CONTEXT_RPC_RETRY = 300
+
+_iteration_context_rpc_retry_at = 0.0
+
+async def get_iteration_context(client, thread_id: str) -> Dict[str, Any]:
+    """Get the latest message type and consume the latest temporary messages.
+
+    Uses the get_iteration_context SQL function, which deletes the returned
+    browser_state and image_context messages in the same transaction. Falls
+    back to separate queries if the function is not available.
+
+    Returns:
+        Dict with latest_message_type and the browser_state and image_context
+        message contents (None when there is no such message).
+    """
+    global _iteration_context_rpc_retry_at
+    if time.monotonic() >= _iteration_context_rpc_retry_at:
+        try:
+            result = await client.rpc('get_iteration_context', {'p_thread_id': thread_id}).execute()
+            return result.data or {}
+        except Exception as e:
+            logger.warning(f"get_iteration_context RPC failed, using separate queries: {str(e)}")
+            _iteration_context_rpc_retry_at = time.monotonic() + ITERATION_CONTEXT_RPC_RETRY
+
+    context = {'latest_message_type': None, 'browser_state': None, 'image_context': None}
+    latest_message = await client.table('messages').select('type').eq('thread_id', thread_id).in_('type', ['assistant', 'tool', 'user']).order('created_at', desc=True).limit(1).execute()
+    if latest_message.data:
+        context['latest_message_type'] = latest_message.data[0].get('type')
+        if context['latest_message_type'] == 'assistant':
+            return context
+
+    for message_type in ('browser_state', 'image_context'):
+        latest = await client.table('messages').select('message_id, content').eq('thread_id', thread_id).eq('type', message_type).order('created_at', desc=True).limit(1).execute()
+        if latest.data:
+            context[message_type] = latest.data[0]['content']
+            await client.table('messages').delete().eq('message_id', latest.data[0]['message_id']).execute()
+    return context
+
+def _message_content(content: Any) -> Dict[str, Any]:
+    # Message content is stored as a JSON string
+    return json.loads(content) if isinstance(content, str) else content
+
+def build_temporary_message(iteration_context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Build the temporary user message showing browser state and requested images."""
+    temp_message_content_list = [] # List to hold text/image blocks
+
+    if iteration_context.get('browser_state'):
+        try:
+            browser_content = _message_content(iteration_context['browser_state'])
+            screenshot_base64 = browser_content.get("screenshot_base64")
+            screenshot_url = browser_content.get("screenshot_url")
+            
+            # Create a copy of the browser state without screenshot data
+            browser_state_text = browser_content.copy()
+            browser_state_text.pop('screenshot_base64', None)
+            browser_state_text.pop('screenshot_url', None)
+
+            if browser_state_text:
+                temp_message_content_list.append({
+                    "type": "text",
+                    "text": f"The following is the current state of the browser:\n{json.dumps(browser_state_text, indent=2)}"
+                })
+                
+            # Prioritize screenshot_url if available
+            if screenshot_url:
+                temp_message_content_list.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": screenshot_url,
+                    }
+                })
+            elif screenshot_base64:
+                # Fallback to base64 if URL not available
+                temp_message_content_list.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{screenshot_base64}",
+                    }
+                })
+            else:
+                logger.warning("Browser state found but no screenshot data.")
+        except Exception as e:
+            logger.error(f"Error parsing browser state: {e}")
+
+    if iteration_context.get('image_context'):
+        try:
+            image_context_content = _message_content(iteration_context['image_context'])
+            base64_image = image_context_content.get("base64")
+            mime_type = image_context_content.get("mime_type")
+            file_path = image_context_content.get("file_path", "unknown file")
+
+            if base64_image and mime_type:
+                temp_message_content_list.append({
+                    "type": "text",
+                    "text": f"Here is the image you requested to see: '{file_path}'"
+                })
+                temp_message_content_list.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{mime_type};base64,{base64_image}",
+                    }
+                })
+            else:
+                logger.warning(f"Image context found for '{file_path}' but missing base64 or mime_type.")
+        except Exception as e:
+            logger.error(f"Error parsing image context: {e}")
+
+    # If we have any content, construct the temporary_message
+    if temp_message_content_list:
+        return {"role": "user", "content": temp_message_content_list}
+    return None
+
 async def run_agent(
     thread_id: str,
     project_id: str,
@@ -87,206 +202,148 @@ async def run_agent(
 
     iteration_count = 0
     continue_execution = True
-
-    while continue_execution and iteration_count < max_iterations:
-        iteration_count += 1
-        logger.info(f"🔄 Running iteration {iteration_count} of {max_iterations}...")
-
-        # Billing check on each iteration - still needed within the iterations
-        can_run, message, subscription = await check_billing_status(client, account_id)
-        if not can_run:
-            error_msg = f"Billing limit reached: {message}"
-            # Yield a special message to indicate billing limit reached
-            yield {
-                "type": "status",
-                "status": "stopped",
-                "message": error_msg
-            }
-            break
-        # Check if last message is from assistant using direct Supabase query
-        latest_message = await client.table('messages').select('*').eq('thread_id', thread_id).in_('type', ['assistant', 'tool', 'user']).order('created_at', desc=True).limit(1).execute()
-        if latest_message.data and len(latest_message.data) > 0:
-            message_type = latest_message.data[0].get('type')
-            if message_type == 'assistant':
+    run_spans = RunSpans(thread_id)
+
+    # finally also runs when the consumer stops early and closes the generator
+    try:
+        while continue_execution and iteration_count < max_iterations:
+            iteration_count += 1
+            logger.info(f"🔄 Running iteration {iteration_count} of {max_iterations}...")
+
+            run_spans.start_iteration()
+
+            # Billing check on each iteration - still needed within the iterations
+            with span('billing'):
+                can_run, message, subscription = await check_billing_status(client, account_id)
+            if not can_run:
+                error_msg = f"Billing limit reached: {message}"
+                # Yield a special message to indicate billing limit reached
+                yield {
+                    "type": "status",
+                    "status": "stopped",
+                    "message": error_msg
+                }
+                break
+            # Latest message type and temporary messages, in one round trip
+            with span('db'):
+                iteration_context = await get_iteration_context(client, thread_id)
+            if iteration_context.get('latest_message_type') == 'assistant':
                 logger.info(f"Last message was from assistant, stopping execution")
                 continue_execution = False
                 break
 
-        # ---- Temporary Message Handling (Browser State & Image Context) ----
-        temporary_message = None
-        temp_message_content_list = [] # List to hold text/image blocks
-
-        # Get the latest browser_state message
-        latest_browser_state_msg = await client.table('messages').select('*').eq('thread_id', thread_id).eq('type', 'browser_state').order('created_at', desc=True).limit(1).execute()
-        if latest_browser_state_msg.data and len(latest_browser_state_msg.data) > 0:
-            try:
-                browser_content = json.loads(latest_browser_state_msg.data[0]["content"])
-                screenshot_base64 = browser_content.get("screenshot_base64")
-                screenshot_url = browser_content.get("screenshot_url")
-                
-                # Create a copy of the browser state without screenshot data
-                browser_state_text = browser_content.copy()
-                browser_state_text.pop('screenshot_base64', None)
-                browser_state_text.pop('screenshot_url', None)
-
-                if browser_state_text:
-                    temp_message_content_list.append({
-                        "type": "text",
-                        "text": f"The following is the current state of the browser:\n{json.dumps(browser_state_text, indent=2)}"
-                    })
-                    
-                # Prioritize screenshot_url if available
-                if screenshot_url:
-                    temp_message_content_list.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": screenshot_url,
-                        }
-                    })
-                elif screenshot_base64:
-                    # Fallback to base64 if URL not available
-                    temp_message_content_list.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{screenshot_base64}",
-                        }
-                    })
-                else:
-                    logger.warning("Browser state found but no screenshot data.")
-
-                await client.table('messages').delete().eq('message_id', latest_browser_state_msg.data[0]["message_id"]).execute()
-            except Exception as e:
-                logger.error(f"Error parsing browser state: {e}")
+            # ---- Temporary Message Handling (Browser State & Image Context) ----
+            temporary_message = build_temporary_message(iteration_context)
+            # ---- End Temporary Message Handling ----
 
-        # Get the latest image_context message (NEW)
-        latest_image_context_msg = await client.table('messages').select('*').eq('thread_id', thread_id).eq('type', 'image_context').order('created_at', desc=True).limit(1).execute()
-        if latest_image_context_msg.data and len(latest_image_context_msg.data) > 0:
-            try:
-                image_context_content = json.loads(latest_image_context_msg.data[0]["content"])
-                base64_image = image_context_content.get("base64")
-                mime_type = image_context_content.get("mime_type")
-                file_path = image_context_content.get("file_path", "unknown file")
-
-                if base64_image and mime_type:
-                    temp_message_content_list.append({
-                        "type": "text",
-                        "text": f"Here is the image you requested to see: '{file_path}'"
-                    })
-                    temp_message_content_list.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:{mime_type};base64,{base64_image}",
-                        }
-                    })
-                else:
-                    logger.warning(f"Image context found for '{file_path}' but missing base64 or mime_type.")
-
-                await client.table('messages').delete().eq('message_id', latest_image_context_msg.data[0]["message_id"]).execute()
-            except Exception as e:
-                logger.error(f"Error parsing image context: {e}")
-
-        # If we have any content, construct the temporary_message
-        if temp_message_content_list:
-            temporary_message = {"role": "user", "content": temp_message_content_list}
-            # logger.debug(f"Constructed temporary message with {len(temp_message_content_list)} content blocks.")
-        # ---- End Temporary Message Handling ----
-
-        # Set max_tokens based on model
-        max_tokens = None
-        if "sonnet" in model_name.lower():
-            max_tokens = 64000
-        elif "gpt-4" in model_name.lower():
-            max_tokens = 4096
+            # Set max_tokens based on model
+            max_tokens = None
+            if "sonnet" in model_name.lower():
+                max_tokens = 64000
+            elif "gpt-4" in model_name.lower():
+                max_tokens = 4096
             
-        try:
-            # Make the LLM call and process the response
-            response = await thread_manager.run_thread(
-                thread_id=thread_id,
-                system_prompt=system_message,
-                stream=stream,
-                llm_model=model_name,
-                llm_temperature=0,
-                llm_max_tokens=max_tokens,
-                tool_choice="auto",
-                max_xml_tool_calls=1,
-                temporary_message=temporary_message,
-                processor_config=ProcessorConfig(
-                    xml_tool_calling=True,
-                    native_tool_calling=False,
-                    execute_tools=True,
-                    execute_on_stream=True,
-                    tool_execution_strategy="parallel",
-                    xml_adding_strategy="user_message"
-                ),
-                native_max_auto_continues=native_max_auto_continues,
-                include_xml_examples=True,
-                enable_thinking=enable_thinking,
-                reasoning_effort=reasoning_effort,
-                enable_context_manager=enable_context_manager
-            )
-
-            if isinstance(response, dict) and "status" in response and response["status"] == "error":
-                logger.error(f"Error response from run_thread: {response.get('message', 'Unknown error')}")
-                yield response
-                break
-
-            # Track if we see ask, complete, or web-browser-takeover tool calls
-            last_tool_call = None
-
-            # Process the response
-            error_detected = False
             try:
-                async for chunk in response:
-                    # If we receive an error chunk, we should stop after this iteration
-                    if isinstance(chunk, dict) and chunk.get('type') == 'status' and chunk.get('status') == 'error':
-                        logger.error(f"Error chunk detected: {chunk.get('message', 'Unknown error')}")
-                        error_detected = True
-                        yield chunk  # Forward the error chunk
-                        continue     # Continue processing other chunks but don't break yet
-                        
-                    # Check for XML versions like <ask>, <complete>, or <web-browser-takeover> in assistant content chunks
-                    if chunk.get('type') == 'assistant' and 'content' in chunk:
-                        try:
-                            # The content field might be a JSON string or object
-                            content = chunk.get('content', '{}')
-                            if isinstance(content, str):
-                                assistant_content_json = json.loads(content)
-                            else:
-                                assistant_content_json = content
-
-                            # The actual text content is nested within
-                            assistant_text = assistant_content_json.get('content', '')
-                            if isinstance(assistant_text, str): # Ensure it's a string
-                                 # Check for the closing tags as they signal the end of the tool usage
-                                if '</ask>' in assistant_text or '</complete>' in assistant_text or '</web-browser-takeover>' in assistant_text:
-                                   if '</ask>' in assistant_text:
-                                       xml_tool = 'ask'
-                                   elif '</complete>' in assistant_text:
-                                       xml_tool = 'complete'
-                                   elif '</web-browser-takeover>' in assistant_text:
-                                       xml_tool = 'web-browser-takeover'
-
-                                   last_tool_call = xml_tool
-                                   logger.info(f"Agent used XML tool: {xml_tool}")
-                        except json.JSONDecodeError:
-                            # Handle cases where content might not be valid JSON
-                            logger.warning(f"Warning: Could not parse assistant content JSON: {chunk.get('content')}")
-                        except Exception as e:
-                            logger.error(f"Error processing assistant chunk: {e}")
-
-                    yield chunk
-
-                # Check if we should stop based on the last tool call or error
-                if error_detected:
-                    logger.info(f"Stopping due to error detected in response")
+                # Make the LLM call and process the response
+                response = await thread_manager.run_thread(
+                    thread_id=thread_id,
+                    system_prompt=system_message,
+                    stream=stream,
+                    llm_model=model_name,
+                    llm_temperature=0,
+                    llm_max_tokens=max_tokens,
+                    tool_choice="auto",
+                    max_xml_tool_calls=1,
+                    temporary_message=temporary_message,
+                    processor_config=ProcessorConfig(
+                        xml_tool_calling=True,
+                        native_tool_calling=False,
+                        execute_tools=True,
+                        execute_on_stream=True,
+                        tool_execution_strategy="parallel",
+                        xml_adding_strategy="user_message"
+                    ),
+                    native_max_auto_continues=native_max_auto_continues,
+                    include_xml_examples=True,
+                    enable_thinking=enable_thinking,
+                    reasoning_effort=reasoning_effort,
+                    enable_context_manager=enable_context_manager
+                )
+
+                if isinstance(response, dict) and "status" in response and response["status"] == "error":
+                    logger.error(f"Error response from run_thread: {response.get('message', 'Unknown error')}")
+                    yield response
                     break
+
+                # Track if we see ask, complete, or web-browser-takeover tool calls
+                last_tool_call = None
+
+                # Process the response
+                error_detected = False
+                try:
+                    async for chunk in response:
+                        # If we receive an error chunk, we should stop after this iteration
+                        if isinstance(chunk, dict) and chunk.get('type') == 'status' and chunk.get('status') == 'error':
+                            logger.error(f"Error chunk detected: {chunk.get('message', 'Unknown error')}")
+                            error_detected = True
+                            yield chunk  # Forward the error chunk
+                            continue     # Continue processing other chunks but don't break yet
+                        
+                        # Check for XML versions like <ask>, <complete>, or <web-browser-takeover> in assistant content chunks
+                        if chunk.get('type') == 'assistant' and 'content' in chunk:
+                            try:
+                                # The content field might be a JSON string or object
+                                content = chunk.get('content', '{}')
+                                if isinstance(content, str):
+                                    assistant_content_json = json.loads(content)
+                                else:
+                                    assistant_content_json = content
+
+                                # The actual text content is nested within
+                                assistant_text = assistant_content_json.get('content', '')
+                                if isinstance(assistant_text, str): # Ensure it's a string
+                                     # Check for the closing tags as they signal the end of the tool usage
+                                    if '</ask>' in assistant_text or '</complete>' in assistant_text or '</web-browser-takeover>' in assistant_text:
+                                       if '</ask>' in assistant_text:
+                                           xml_tool = 'ask'
+                                       elif '</complete>' in assistant_text:
+                                           xml_tool = 'complete'
+                                       elif '</web-browser-takeover>' in assistant_text:
+                                           xml_tool = 'web-browser-takeover'
+
+                                       last_tool_call = xml_tool
+                                       logger.info(f"Agent used XML tool: {xml_tool}")
+                            except json.JSONDecodeError:
+                                # Handle cases where content might not be valid JSON
+                                logger.warning(f"Warning: Could not parse assistant content JSON: {chunk.get('content')}")
+                            except Exception as e:
+                                logger.error(f"Error processing assistant chunk: {e}")
+
+                        yield chunk
+
+                    # Check if we should stop based on the last tool call or error
+                    if error_detected:
+                        logger.info(f"Stopping due to error detected in response")
+                        break
                     
-                if last_tool_call in ['ask', 'complete', 'web-browser-takeover']:
-                    logger.info(f"Agent decided to stop with tool: {last_tool_call}")
-                    continue_execution = False
+                    if last_tool_call in ['ask', 'complete', 'web-browser-takeover']:
+                        logger.info(f"Agent decided to stop with tool: {last_tool_call}")
+                        continue_execution = False
+                except Exception as e:
+                    # Just log the error and re-raise to stop all iterations
+                    error_msg = f"Error during response streaming: {str(e)}"
+                    logger.error(f"Error: {error_msg}")
+                    yield {
+                        "type": "status",
+                        "status": "error",
+                        "message": error_msg
+                    }
+                    # Stop execution immediately on any error
+                    break
+                
             except Exception as e:
                 # Just log the error and re-raise to stop all iterations
-                error_msg = f"Error during response streaming: {str(e)}"
+                error_msg = f"Error running thread: {str(e)}"
                 logger.error(f"Error: {error_msg}")
                 yield {
                     "type": "status",
@@ -295,18 +352,8 @@ async def run_agent(
                 }
                 # Stop execution immediately on any error
                 break
-                
-        except Exception as e:
-            # Just log the error and re-raise to stop all iterations
-            error_msg = f"Error running thread: {str(e)}"
-            logger.error(f"Error: {error_msg}")
-            yield {
-                "type": "status",
-                "status": "error",
-                "message": error_msg
-            }
-            # Stop execution immediately on any error
-            break
+    finally:
+        run_spans.finish()
 
 
 # # TESTING
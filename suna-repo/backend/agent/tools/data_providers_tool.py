@@ -1,6 +1,6 @@
 import json
 
-from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema, tool_execution
 from agent.tools.data_providers.LinkedinProvider import LinkedinProvider
 from agent.tools.data_providers.YahooFinanceProvider import YahooFinanceProvider
 from agent.tools.data_providers.AmazonProvider import AmazonProvider
@@ -56,6 +56,7 @@ Use this tool when you need to discover what endpoints are available.
 </get-data-provider-endpoints>
         '''
     )
+    @tool_execution(read_only=True)
     async def get_data_provider_endpoints(
         self,
         service_name: str
@@ -128,6 +129,7 @@ Use this tool when you need to discover what endpoints are available.
         </execute-data-provider-call>
         '''
     )
+    @tool_execution(read_only=True, max_concurrency=3)
     async def execute_data_provider_call(
         self,
         service_name: str,
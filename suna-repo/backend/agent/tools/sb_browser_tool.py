@@ -1,7 +1,7 @@
 import traceback
 import json
 
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, openapi_schema, xml_schema, tool_execution
 from agentpress.thread_manager import ThreadManager
 from sandbox.tool_base import SandboxToolsBase
 from utils.logger import logger
@@ -132,6 +132,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-navigate-to>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_navigate_to(self, url: str) -> ToolResult:
         """Navigate to a specific url
         
@@ -201,6 +202,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         <browser-go-back></browser-go-back>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_go_back(self) -> ToolResult:
         """Navigate back in browser history
         
@@ -237,6 +239,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-wait>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_wait(self, seconds: int = 3) -> ToolResult:
         """Wait for the specified number of seconds
         
@@ -277,6 +280,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-click-element>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_click_element(self, index: int) -> ToolResult:
         """Click on an element by index
         
@@ -322,6 +326,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-input-text>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_input_text(self, index: int, text: str) -> ToolResult:
         """Input text into an element
         
@@ -363,6 +368,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-send-keys>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_send_keys(self, keys: str) -> ToolResult:
         """Send keyboard keys
         
@@ -403,6 +409,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-switch-tab>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_switch_tab(self, page_id: int) -> ToolResult:
         """Switch to a different browser tab
         
@@ -483,6 +490,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-close-tab>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_close_tab(self, page_id: int) -> ToolResult:
         """Close a browser tab
         
@@ -581,6 +589,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-scroll-down>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_scroll_down(self, amount: int = None) -> ToolResult:
         """Scroll down the page
         
@@ -626,6 +635,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-scroll-up>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_scroll_up(self, amount: int = None) -> ToolResult:
         """Scroll up the page
         
@@ -672,6 +682,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-scroll-to-text>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_scroll_to_text(self, text: str) -> ToolResult:
         """Scroll to specific text on the page
         
@@ -712,6 +723,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-get-dropdown-options>
         '''
     )
+    @tool_execution(read_only=True, resources=["browser"])
     async def browser_get_dropdown_options(self, index: int) -> ToolResult:
         """Get all options from a dropdown element
         
@@ -757,6 +769,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-select-dropdown-option>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_select_dropdown_option(self, index: int, text: str) -> ToolResult:
         """Select an option from a dropdown by text
         
@@ -820,6 +833,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         <browser-drag-drop element_source="#draggable" element_target="#droppable"></browser-drag-drop>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_drag_drop(self, element_source: str = None, element_target: str = None, 
                                coord_source_x: int = None, coord_source_y: int = None,
                                coord_target_x: int = None, coord_target_y: int = None) -> ToolResult:
@@ -884,6 +898,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         <browser-click-coordinates x="100" y="200"></browser-click-coordinates>
         '''
     )
+    @tool_execution(resources=["browser"])
     async def browser_click_coordinates(self, x: int, y: int) -> ToolResult:
         """Click at specific X,Y coordinates on the page
         
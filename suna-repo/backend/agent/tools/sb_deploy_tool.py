@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, openapi_schema, xml_schema, tool_execution
 from sandbox.tool_base import SandboxToolsBase
 from utils.files_utils import clean_path
 from agentpress.thread_manager import ThreadManager
@@ -60,6 +60,7 @@ class SandboxDeployTool(SandboxToolsBase):
         </deploy>
         '''
     )
+    @tool_execution(resources=["path:directory_path", "deploy"])
     async def deploy(self, name: str, directory_path: str) -> ToolResult:
         """
         Deploy a static website (HTML+CSS+JS) from the sandbox to Cloudflare Pages.
@@ -1,4 +1,4 @@
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, openapi_schema, xml_schema, tool_execution
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
 
@@ -58,6 +58,7 @@ class SandboxExposeTool(SandboxToolsBase):
         </expose-port>
         '''
     )
+    @tool_execution()
     async def expose_port(self, port: int) -> ToolResult:
         try:
             # Ensure sandbox is initialized
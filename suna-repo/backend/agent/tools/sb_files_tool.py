@@ -1,5 +1,5 @@
 
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, openapi_schema, xml_schema, tool_execution
 from sandbox.tool_base import SandboxToolsBase    
 from utils.files_utils import should_exclude_file, clean_path
 from agentpress.thread_manager import ThreadManager
@@ -110,6 +110,7 @@ class SandboxFilesTool(SandboxToolsBase):
         </create-file>
         '''
     )
+    @tool_execution(resources=["path:file_path"])
     async def create_file(self, file_path: str, file_contents: str, permissions: str = "644") -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -178,6 +179,7 @@ class SandboxFilesTool(SandboxToolsBase):
         </str-replace>
         '''
     )
+    @tool_execution(resources=["path:file_path"])
     async def str_replace(self, file_path: str, old_str: str, new_str: str) -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -261,6 +263,7 @@ class SandboxFilesTool(SandboxToolsBase):
         </full-file-rewrite>
         '''
     )
+    @tool_execution(resources=["path:file_path"])
     async def full_file_rewrite(self, file_path: str, file_contents: str, permissions: str = "644") -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -311,6 +314,7 @@ class SandboxFilesTool(SandboxToolsBase):
         </delete-file>
         '''
     )
+    @tool_execution(resources=["path:file_path"])
     async def delete_file(self, file_path: str) -> ToolResult:
         try:
             # Ensure sandbox is initialized
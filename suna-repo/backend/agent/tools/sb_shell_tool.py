@@ -1,7 +1,7 @@
 from typing import Optional, Dict, Any
 import time
 from uuid import uuid4
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, openapi_schema, xml_schema, tool_execution
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
 
@@ -104,6 +104,7 @@ class SandboxShellTool(SandboxToolsBase):
         </execute-command>
         '''
     )
+    @tool_execution(resources=["sandbox"])
     async def execute_command(
         self, 
         command: str, 
@@ -259,6 +260,7 @@ class SandboxShellTool(SandboxToolsBase):
         <check-command-output session_name="build_process" kill_session="true"/>
         '''
     )
+    @tool_execution(resources=["sandbox"])
     async def check_command_output(
         self,
         session_name: str,
@@ -320,6 +322,7 @@ class SandboxShellTool(SandboxToolsBase):
         <terminate-command session_name="dev_server"/>
         '''
     )
+    @tool_execution(resources=["sandbox"])
     async def terminate_command(
         self,
         session_name: str
@@ -362,6 +365,7 @@ class SandboxShellTool(SandboxToolsBase):
         <list-commands/>
         '''
     )
+    @tool_execution(read_only=True, resources=["sandbox"])
     async def list_commands(self) -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -3,7 +3,7 @@ import base64
 import mimetypes
 from typing import Optional
 
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, openapi_schema, xml_schema, tool_execution
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
 import json
@@ -54,6 +54,7 @@ class SandboxVisionTool(SandboxToolsBase):
         <see-image file_path="docs/diagram.png"></see-image>
         '''
     )
+    @tool_execution(read_only=True, resources=["path:file_path"], max_concurrency=3)
     async def see_image(self, file_path: str) -> ToolResult:
         """Reads an image file, converts it to base64, and adds it as a temporary message."""
         try:
@@ -1,7 +1,7 @@
 from tavily import AsyncTavilyClient
 import httpx
 from dotenv import load_dotenv
-from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema, tool_execution
 from utils.config import config
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
@@ -89,6 +89,7 @@ class SandboxWebSearchTool(SandboxToolsBase):
         </web-search>
         '''
     )
+    @tool_execution(read_only=True, max_concurrency=5)
     async def web_search(
         self, 
         query: str,
@@ -211,6 +212,8 @@ class SandboxWebSearchTool(SandboxToolsBase):
         -->
         '''
     )
+    # Results are saved as new timestamped files under scrape/, which no other scrape touches
+    @tool_execution(read_only=True, resources=["sandbox"], max_concurrency=3)
     async def scrape_webpage(
         self,
         urls: str
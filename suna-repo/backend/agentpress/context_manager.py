@@ -3,12 +3,19 @@ Context Management for AgentPress Threads.
 
 This module handles token counting and thread summarization to prevent
 reaching the context window limitations of LLM models.
+
+Token counts are kept per thread as a running sum fed by the thread message
+cache: every row a cache load adds is handed to the context manager, each
+message is tokenized once, the first time a tokenizer is asked for, and
+counting itself never queries the database. A new summary resets the sum.
 """
 
 import json
+from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
 
 from litellm import token_counter, completion_cost
+from agentpress.message_cache import ThreadMessageCache
 from services.supabase import DBConnection
 from services.llm import make_llm_api_call
 from utils.logger import logger
@@ -18,45 +25,150 @@ DEFAULT_TOKEN_THRESHOLD = 120000  # 80k tokens threshold for summarization
 SUMMARY_TARGET_TOKENS = 10000    # Target ~10k tokens for the summary message
 RESERVE_TOKENS = 5000            # Reserve tokens for new messages
 
+TOKEN_COUNT_MODEL = "gpt-4"      # Tokenizer used for the summarization threshold
+
+
+@dataclass
+class ThreadTokenLedger:
+    """Messages of one thread since its latest summary, with running token counts."""
+    messages: List[Any] = field(default_factory=list)   # After the latest summary
+    summary: Optional[Any] = None                         # The latest summary itself
+    counted: Dict[str, int] = field(default_factory=dict)         # Messages counted per tokenizer
+    totals: Dict[str, int] = field(default_factory=dict)          # Their tokens per tokenizer
+    summary_tokens: Dict[str, int] = field(default_factory=dict)
+
+
+def format_llm_message(row: Dict[str, Any]) -> Any:
+    """Message row content as an LLM message, wrapped in its role if needed."""
+    content = row['content']
+    if isinstance(content, str):
+        try:
+            content = json.loads(content)
+        except json.JSONDecodeError:
+            pass  # Keep as string if not valid JSON
+
+    # Ensure we have the proper format for the LLM
+    if 'role' not in content and 'type' in row:
+        # Convert message type to role if needed
+        role = row['type']
+        if role == 'assistant' or role == 'user' or role == 'system' or role == 'tool':
+            content = {'role': role, 'content': content}
+    return content
+
+
 class ContextManager:
     """Manages thread context including token counting and summarization."""
     
-    def __init__(self, token_threshold: int = DEFAULT_TOKEN_THRESHOLD):
+    def __init__(
+        self,
+        token_threshold: int = DEFAULT_TOKEN_THRESHOLD,
+        message_cache: Optional[ThreadMessageCache] = None
+    ):
         """Initialize the ContextManager.
         
         Args:
             token_threshold: Token count threshold to trigger summarization
+            message_cache: Message cache whose loads feed the token counts;
+                share the caller's cache so each iteration fetches once
         """
         self.db = DBConnection()
         self.token_threshold = token_threshold
-    
-    async def get_thread_token_count(self, thread_id: str) -> int:
+        self.message_cache = message_cache or ThreadMessageCache(self.db)
+        self.message_cache.add_listener(self.record_rows)
+        self._ledgers: Dict[str, ThreadTokenLedger] = {}
+        self._reply_overhead: Dict[str, int] = {}
+
+    def invalidate_token_counts(self, thread_id: Optional[str] = None):
+        """Forget the running token counts of one thread, or of every thread."""
+        if thread_id is None:
+            self._ledgers.clear()
+        else:
+            self._ledgers.pop(thread_id, None)
+
+    def record_rows(self, thread_id: Optional[str], rows: Optional[List[Dict[str, Any]]], reset: bool):
+        """Message cache listener: add the rows a load appended to the thread's ledger."""
+        if rows is None:
+            self.invalidate_token_counts(thread_id)
+            return
+        ledger = self._ledgers.get(thread_id)
+        if reset or ledger is None:
+            ledger = self._ledgers[thread_id] = ThreadTokenLedger()
+        for row in rows:
+            if row.get('type') == 'summary':
+                # Loads start at the latest summary; a newer one causes a reset
+                ledger.summary = format_llm_message(row)
+            else:
+                ledger.messages.append(format_llm_message(row))
+
+    def reply_overhead(self, model: str) -> int:
+        """Tokens token_counter adds once per request rather than per message."""
+        if model not in self._reply_overhead:
+            try:
+                self._reply_overhead[model] = token_counter(model=model, messages=[])
+            except Exception:
+                self._reply_overhead[model] = 0
+        return self._reply_overhead[model]
+
+    def count_message_tokens(self, message: Any, model: str = TOKEN_COUNT_MODEL) -> int:
+        """Tokens one message contributes to a request, so counts can be summed."""
+        count = token_counter(model=model, messages=[message])
+        return max(count - self.reply_overhead(model), 0)
+
+    async def get_thread_token_count(
+        self,
+        thread_id: str,
+        model: str = TOKEN_COUNT_MODEL,
+        include_summary: bool = False,
+        refresh: bool = False
+    ) -> int:
         """Get the current token count for a thread using LiteLLM.
         
+        Counts the messages the message cache has loaded for the thread; only
+        those not yet counted with this tokenizer are tokenized. The cache is
+        read only when it has not loaded the thread yet, or on refresh.
+        
         Args:
             thread_id: ID of the thread to analyze
+            model: Model whose tokenizer is used
+            include_summary: Also count the latest summary message, which is
+                part of the LLM context but not of the text to summarize
+            refresh: Fetch rows added since the cache's last load first, for
+                callers that have not just loaded the thread's messages
             
         Returns:
             The total token count for relevant messages in the thread
         """
         logger.debug(f"Getting token count for thread {thread_id}")
-        
+
         try:
-            # Get messages for the thread
-            messages = await self.get_messages_for_summarization(thread_id)
-            
-            if not messages:
+            if refresh or thread_id not in self._ledgers:
+                await self.message_cache.get_messages(thread_id)
+            ledger = self._ledgers.get(thread_id)
+            if ledger is None:
                 logger.debug(f"No messages found for thread {thread_id}")
                 return 0
-            
-            # Use litellm's token_counter for accurate model-specific counting
-            # This is much more accurate than the SQL-based estimation
-            token_count = token_counter(model="gpt-4", messages=messages)
-            
+
+            total = ledger.totals.get(model, 0)
+            for message in ledger.messages[ledger.counted.get(model, 0):]:
+                total += self.count_message_tokens(message, model)
+            ledger.totals[model] = total
+            ledger.counted[model] = len(ledger.messages)
+
+            token_count = total
+            if include_summary and ledger.summary is not None:
+                if model not in ledger.summary_tokens:
+                    ledger.summary_tokens[model] = self.count_message_tokens(ledger.summary, model)
+                token_count += ledger.summary_tokens[model]
+            if not token_count:
+                logger.debug(f"No messages found for thread {thread_id}")
+                return 0
+            token_count += self.reply_overhead(model)
+
             logger.info(f"Thread {thread_id} has {token_count} tokens (calculated with litellm)")
             return token_count
                 
         except Exception as e:
+            self._ledgers.pop(thread_id, None)
             logger.error(f"Error getting token count: {str(e)}")
             return 0
     
@@ -115,22 +227,7 @@ class ContextManager:
                     logger.debug(f"Skipping summary message from {msg.get('created_at')}")
                     continue
                     
-                # Parse content if it's a string
-                content = msg['content']
-                if isinstance(content, str):
-                    try:
-                        content = json.loads(content)
-                    except json.JSONDecodeError:
-                        pass  # Keep as string if not valid JSON
-                
-                # Ensure we have the proper format for the LLM
-                if 'role' not in content and 'type' in msg:
-                    # Convert message type to role if needed
-                    role = msg['type']
-                    if role == 'assistant' or role == 'user' or role == 'system' or role == 'tool':
-                        content = {'role': role, 'content': content}
-                
-                messages.append(content)
+                messages.append(format_llm_message(msg))
             
             logger.info(f"Got {len(messages)} messages to summarize for thread {thread_id}")
             return messages
@@ -253,7 +350,7 @@ The above is a summary of the conversation history. The conversation continues b
         """
         try:
             # Get token count using LiteLLM (accurate model-specific counting)
-            token_count = await self.get_thread_token_count(thread_id)
+            token_count = await self.get_thread_token_count(thread_id, refresh=True)
             
             # If token count is below threshold and not forcing, no summarization needed
             if token_count < self.token_threshold and not force:
@@ -0,0 +1,203 @@
+"""
+Per-thread LLM message cache for AgentPress.
+
+ThreadManager asks for a thread's LLM messages on every iteration and
+auto-continue of a run. This module caches the parsed messages per thread and
+fetches only the rows added since the newest cached one:
+- The first call loads the latest summary and everything after it, like the
+  get_llm_formatted_messages RPC
+- Later calls query the rows since the cursor (last created_at/message_id)
+  and parse only those
+- A new summary, or a row that commits behind the cursor, triggers a full
+  reload; add_message also invalidates the thread when it inserts a summary
+- Callers get copies, because LLM request preparation edits messages in place
+- Listeners receive the rows each load adds, so per-thread state such as the
+  context manager's token counts follows the same fetches
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from services.supabase import DBConnection
+from utils.logger import logger
+
+# Rows are fetched in pages; PostgREST caps a single response at 1000 rows
+PAGE_SIZE = 1000
+
+# Delta queries look back this far so rows that committed slightly out of
+# created_at order are still seen
+CURSOR_OVERLAP = timedelta(seconds=1)
+
+MESSAGE_COLUMNS = 'message_id, type, content, created_at'
+
+# Called with (thread_id, rows, reset): reset means rows replace everything
+# seen before for the thread; rows is None when the thread (or, with
+# thread_id None, every thread) was invalidated
+RowListener = Callable[[Optional[str], Optional[List[Dict[str, Any]]], bool], None]
+
+
+@dataclass
+class ThreadMessages:
+    """Cached LLM messages of one thread, in created_at order."""
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    message_ids: Set[str] = field(default_factory=set)
+    last_created_at: Optional[datetime] = None
+    last_message_id: Optional[str] = None
+
+
+def parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _parse_message(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Row content as an LLM message, with tool call arguments as JSON strings."""
+    content = row['content']
+    if isinstance(content, str):
+        try:
+            content = json.loads(content)
+        except json.JSONDecodeError:
+            logger.error(f"Failed to parse message: {content}")
+            return None
+
+    if isinstance(content, dict) and content.get('tool_calls'):
+        for tool_call in content['tool_calls']:
+            if isinstance(tool_call, dict) and 'function' in tool_call:
+                if 'arguments' in tool_call['function'] and not isinstance(tool_call['function']['arguments'], str):
+                    tool_call['function']['arguments'] = json.dumps(tool_call['function']['arguments'])
+    return content
+
+
+def _copy_message(message: Any) -> Any:
+    """Copy deep enough that adding cache_control to content blocks leaves the cache intact."""
+    if not isinstance(message, dict):
+        return message
+    copied = dict(message)
+    content = copied.get('content')
+    if isinstance(content, list):
+        copied['content'] = [dict(block) if isinstance(block, dict) else block for block in content]
+    return copied
+
+
+async def fetch_rows(query_builder) -> List[Dict[str, Any]]:
+    """Run a select in created_at order, in pages until a short page comes back."""
+    rows = []
+    offset = 0
+    while True:
+        result = await query_builder().order('created_at').range(offset, offset + PAGE_SIZE - 1).execute()
+        page = result.data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
+
+
+class ThreadMessageCache:
+    """Caches parsed LLM messages per thread and fetches deltas."""
+
+    def __init__(self, db: Optional[DBConnection] = None):
+        self.db = db or DBConnection()
+        self._threads: Dict[str, ThreadMessages] = {}
+        self._listeners: List[RowListener] = []
+        self.stats = {"full_loads": 0, "delta_loads": 0, "delta_rows": 0}
+
+    def add_listener(self, listener: RowListener):
+        """Have listener called with the rows every load adds to a thread."""
+        self._listeners.append(listener)
+
+    def _notify(self, thread_id: Optional[str], rows: Optional[List[Dict[str, Any]]], reset: bool):
+        for listener in self._listeners:
+            try:
+                listener(thread_id, rows, reset)
+            except Exception as e:
+                logger.error(f"Message cache listener failed for thread {thread_id}: {str(e)}")
+
+    def invalidate(self, thread_id: Optional[str] = None):
+        """Forget one thread, or every thread when thread_id is None."""
+        if thread_id is None:
+            self._threads.clear()
+        else:
+            self._threads.pop(thread_id, None)
+        self._notify(thread_id, None, True)
+
+    async def get_messages(self, thread_id: str) -> List[Dict[str, Any]]:
+        """Current LLM messages of a thread (from the latest summary onwards)."""
+        client = await self.db.client
+        entry = self._threads.get(thread_id)
+        if entry is None or not await self._load_delta(client, thread_id, entry):
+            entry = await self._load_full(client, thread_id)
+            self._threads[thread_id] = entry
+        return [_copy_message(message) for message in entry.messages]
+
+    def _append(self, entry: ThreadMessages, rows: List[Dict[str, Any]]):
+        for row in rows:
+            message = _parse_message(row)
+            if message is not None:
+                entry.messages.append(message)
+            entry.message_ids.add(row['message_id'])
+            entry.last_created_at = parse_timestamp(row['created_at'])
+            entry.last_message_id = row['message_id']
+
+    async def _load_full(self, client, thread_id: str) -> ThreadMessages:
+        self.stats["full_loads"] += 1
+        summary_result = await client.table('messages').select('message_id, created_at') \
+            .eq('thread_id', thread_id) \
+            .eq('type', 'summary') \
+            .eq('is_llm_message', True) \
+            .order('created_at', desc=True) \
+            .limit(1) \
+            .execute()
+        summary = summary_result.data[0] if summary_result.data else None
+
+        def query():
+            builder = client.table('messages').select(MESSAGE_COLUMNS) \
+                .eq('thread_id', thread_id) \
+                .eq('is_llm_message', True)
+            if summary:
+                builder = builder.gte('created_at', summary['created_at'])
+            return builder
+
+        rows = await fetch_rows(query)
+        if summary:
+            # Same rule as get_llm_formatted_messages: the summary and anything after it
+            summary_time = parse_timestamp(summary['created_at'])
+            rows = [
+                row for row in rows
+                if row['message_id'] == summary['message_id'] or parse_timestamp(row['created_at']) > summary_time
+            ]
+
+        entry = ThreadMessages()
+        self._append(entry, rows)
+        self._notify(thread_id, rows, True)
+        logger.debug(f"Loaded {len(entry.messages)} messages for thread {thread_id}")
+        return entry
+
+    async def _load_delta(self, client, thread_id: str, entry: ThreadMessages) -> bool:
+        """Append rows added since the cursor; False when a full reload is needed."""
+        if entry.last_created_at is None:
+            return False
+
+        since = (entry.last_created_at - CURSOR_OVERLAP).isoformat()
+        rows = await fetch_rows(
+            lambda: client.table('messages').select(MESSAGE_COLUMNS)
+            .eq('thread_id', thread_id)
+            .eq('is_llm_message', True)
+            .gte('created_at', since)
+        )
+        new_rows = [row for row in rows if row['message_id'] not in entry.message_ids]
+
+        for row in new_rows:
+            if row['type'] == 'summary':
+                logger.debug(f"New summary in thread {thread_id}, reloading messages")
+                return False
+            if parse_timestamp(row['created_at']) < entry.last_created_at:
+                logger.debug(f"Message {row['message_id']} committed behind the cursor, reloading thread {thread_id}")
+                return False
+
+        self.stats["delta_loads"] += 1
+        self.stats["delta_rows"] += len(new_rows)
+        self._append(entry, new_rows)
+        if new_rows:
+            self._notify(thread_id, new_rows, False)
+        return True
@@ -16,12 +16,14 @@ from services.llm import make_llm_api_call
 from agentpress.tool import Tool
 from agentpress.tool_registry import ToolRegistry
 from agentpress.context_manager import ContextManager
+from agentpress.message_cache import ThreadMessageCache
 from agentpress.response_processor import (
     ResponseProcessor,
     ProcessorConfig
 )
 from services.supabase import DBConnection
 from utils.logger import logger
+from utils.spans import span
 
 # Type alias for tool choice
 ToolChoice = Literal["auto", "required", "none"]
@@ -44,7 +46,10 @@ class ThreadManager:
             tool_registry=self.tool_registry,
             add_message_callback=self.add_message
         )
-        self.context_manager = ContextManager()
+        # Shared by every iteration of a run; only new rows are fetched each time
+        self.message_cache = ThreadMessageCache(self.db)
+        # Token counts are fed by the message cache's loads, without queries of their own
+        self.context_manager = ContextManager(message_cache=self.message_cache)
 
     def add_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
         """Add a tool to the ThreadManager."""
@@ -84,9 +89,14 @@ class ThreadManager:
 
         try:
             # Add returning='representation' to get the inserted row data including the id
-            result = await client.table('messages').insert(data_to_insert, returning='representation').execute()
+            with span('db'):
+                result = await client.table('messages').insert(data_to_insert, returning='representation').execute()
             logger.info(f"Successfully added message to thread {thread_id}")
 
+            if type == 'summary':
+                # Messages before the summary drop out of the LLM context
+                self.message_cache.invalidate(thread_id)
+
             if result.data and len(result.data) > 0 and isinstance(result.data[0], dict) and 'message_id' in result.data[0]:
                 return result.data[0]
             else:
@@ -99,8 +109,9 @@ class ThreadManager:
     async def get_llm_messages(self, thread_id: str) -> List[Dict[str, Any]]:
         """Get all messages for a thread.
 
-        This method uses the SQL function which handles context truncation
-        by considering summary messages.
+        Returns the latest summary and every LLM message after it, as the
+        get_llm_formatted_messages SQL function does. Messages are cached per
+        thread, so repeated calls during a run only fetch and parse new rows.
 
         Args:
             thread_id: The ID of the thread to get messages for.
@@ -109,40 +120,13 @@ class ThreadManager:
             List of message objects.
         """
         logger.debug(f"Getting messages for thread {thread_id}")
-        client = await self.db.client
 
         try:
-            result = await client.rpc('get_llm_formatted_messages', {'p_thread_id': thread_id}).execute()
-
-            # Parse the returned data which might be stringified JSON
-            if not result.data:
-                return []
-
-            # Return properly parsed JSON objects
-            messages = []
-            for item in result.data:
-                if isinstance(item, str):
-                    try:
-                        parsed_item = json.loads(item)
-                        messages.append(parsed_item)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse message: {item}")
-                else:
-                    messages.append(item)
-
-            # Ensure tool_calls have properly formatted function arguments
-            for message in messages:
-                if message.get('tool_calls'):
-                    for tool_call in message['tool_calls']:
-                        if isinstance(tool_call, dict) and 'function' in tool_call:
-                            # Ensure function.arguments is a string
-                            if 'arguments' in tool_call['function'] and not isinstance(tool_call['function']['arguments'], str):
-                                tool_call['function']['arguments'] = json.dumps(tool_call['function']['arguments'])
-
-            return messages
-
+            with span('db'):
+                return await self.message_cache.get_messages(thread_id)
         except Exception as e:
             logger.error(f"Failed to get messages for thread {thread_id}: {str(e)}", exc_info=True)
+            self.message_cache.invalidate(thread_id)
             return []
 
     async def run_thread(
@@ -248,6 +232,7 @@ Here are the XML tools available with examples:
         # Control whether we need to auto-continue due to tool_calls finish reason
         auto_continue = True
         auto_continue_count = 0
+        system_prompt_tokens = None
 
         # Define inner function to handle a single run
         async def _run_once(temp_msg=None):
@@ -262,9 +247,16 @@ Here are the XML tools available with examples:
                 # 2. Check token count before proceeding
                 token_count = 0
                 try:
-                    from litellm import token_counter
-                    # Use the potentially modified working_system_prompt for token counting
-                    token_count = token_counter(model=llm_model, messages=[working_system_prompt] + messages)
+                    # The system prompt is fixed for this run, so it is counted once;
+                    # thread messages come from the context manager's running sum
+                    nonlocal system_prompt_tokens
+                    if system_prompt_tokens is None:
+                        system_prompt_tokens = self.context_manager.count_message_tokens(working_system_prompt, llm_model)
+                    # Counted from the rows get_llm_messages just loaded
+                    thread_tokens = await self.context_manager.get_thread_token_count(
+                        thread_id, model=llm_model, include_summary=True
+                    )
+                    token_count = system_prompt_tokens + (thread_tokens or self.context_manager.reply_overhead(llm_model))
                     token_threshold = self.context_manager.token_threshold
                     logger.info(f"Thread {thread_id} token count: {token_count}/{token_threshold} ({(token_count/token_threshold)*100:.1f}%)")
 
@@ -322,17 +314,18 @@ Here are the XML tools available with examples:
                 # 5. Make LLM API call
                 logger.debug("Making LLM API call")
                 try:
-                    llm_response = await make_llm_api_call(
-                        prepared_messages, # Pass the potentially modified messages
-                        llm_model,
-                        temperature=llm_temperature,
-                        max_tokens=llm_max_tokens,
-                        tools=openapi_tool_schemas,
-                        tool_choice=tool_choice if processor_config.native_tool_calling else None,
-                        stream=stream,
-                        enable_thinking=enable_thinking,
-                        reasoning_effort=reasoning_effort
-                    )
+                    with span('llm'):
+                        llm_response = await make_llm_api_call(
+                            prepared_messages, # Pass the potentially modified messages
+                            llm_model,
+                            temperature=llm_temperature,
+                            max_tokens=llm_max_tokens,
+                            tools=openapi_tool_schemas,
+                            tool_choice=tool_choice if processor_config.native_tool_calling else None,
+                            stream=stream,
+                            enable_thinking=enable_thinking,
+                            reasoning_effort=reasoning_effort
+                        )
                     logger.debug("Successfully received raw LLM API response stream/object")
 
                 except Exception as e:
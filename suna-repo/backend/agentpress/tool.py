@@ -4,6 +4,7 @@ Core tool system providing the foundation for creating and managing tools.
 This module defines the base classes and decorators for creating tools in AgentPress:
 - Tool base class for implementing tool functionality
 - Schema decorators for OpenAPI and XML tool definitions
+- Execution hints telling the tool scheduler which calls may run concurrently
 - Result containers for standardized tool outputs
 """
 
@@ -82,6 +83,25 @@ class ToolSchema:
     schema: Dict[str, Any]
     xml_schema: Optional[XMLTagSchema] = None
 
+@dataclass
+class ToolExecutionHints:
+    """How calls of a tool function may be scheduled alongside other calls.
+    
+    Attributes:
+        read_only (bool): The call changes nothing, so it may run at the same
+            time as other read-only calls
+        resources (List[str]): Shared state the call reads or writes.
+            "sandbox" is the whole sandbox filesystem, "path:<param>" is the
+            sandbox path given in that parameter, and any other name is an
+            opaque resource such as "browser". A call with no resources
+            touches nothing other calls use
+        max_concurrency (int, optional): Calls of the function that may run
+            at once (None means no limit)
+    """
+    read_only: bool = False
+    resources: List[str] = field(default_factory=list)
+    max_concurrency: Optional[int] = None
+
 @dataclass
 class ToolResult:
     """Container for tool execution results.
@@ -101,9 +121,11 @@ class Tool(ABC):
     
     Attributes:
         _schemas (Dict[str, List[ToolSchema]]): Registered schemas for tool methods
+        _execution_hints (Dict[str, ToolExecutionHints]): Declared execution hints for tool methods
         
     Methods:
         get_schemas: Get all registered tool schemas
+        get_execution_hints: Get the declared execution hints
         success_response: Create a successful result
         fail_response: Create a failed result
     """
@@ -111,6 +133,7 @@ class Tool(ABC):
     def __init__(self):
         """Initialize tool with empty schema registry."""
         self._schemas: Dict[str, List[ToolSchema]] = {}
+        self._execution_hints: Dict[str, ToolExecutionHints] = {}
         logger.debug(f"Initializing tool class: {self.__class__.__name__}")
         self._register_schemas()
 
@@ -120,6 +143,8 @@ class Tool(ABC):
             if hasattr(method, 'tool_schemas'):
                 self._schemas[name] = method.tool_schemas
                 logger.debug(f"Registered schemas for method '{name}' in {self.__class__.__name__}")
+            if hasattr(method, 'tool_execution_hints'):
+                self._execution_hints[name] = method.tool_execution_hints
 
     def get_schemas(self) -> Dict[str, List[ToolSchema]]:
         """Get all registered tool schemas.
@@ -129,6 +154,14 @@ class Tool(ABC):
         """
         return self._schemas
 
+    def get_execution_hints(self) -> Dict[str, ToolExecutionHints]:
+        """Get the execution hints declared with @tool_execution.
+        
+        Returns:
+            Dict mapping method names to their execution hints
+        """
+        return self._execution_hints
+
     def success_response(self, data: Union[Dict[str, Any], str]) -> ToolResult:
         """Create a successful tool result.
         
@@ -238,3 +271,31 @@ def custom_schema(schema: Dict[str, Any]):
             schema=schema
         ))
     return decorator
+
+def tool_execution(
+    read_only: bool = False,
+    resources: Optional[List[str]] = None,
+    max_concurrency: Optional[int] = None
+):
+    """
+    Decorator declaring how calls of a tool function may be scheduled.
+    
+    Calls of functions without it run alone and in order.
+    
+    Args:
+        read_only: Whether the function has no side effects
+        resources: Shared state the function uses: "sandbox", "path:<param>"
+            or the name of another resource (see ToolExecutionHints)
+        max_concurrency: Calls of the function that may run at once
+    
+    Example:
+        @tool_execution(read_only=True, resources=["path:file_path"], max_concurrency=3)
+    """
+    def decorator(func):
+        func.tool_execution_hints = ToolExecutionHints(
+            read_only=read_only,
+            resources=list(resources or []),
+            max_concurrency=max_concurrency
+        )
+        return func
+    return decorator
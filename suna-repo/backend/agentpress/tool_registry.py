@@ -1,5 +1,5 @@
 from typing import Dict, Type, Any, List, Optional, Callable
-from agentpress.tool import Tool, SchemaType
+from agentpress.tool import Tool, SchemaType, ToolExecutionHints
 from utils.logger import logger
 
 
@@ -12,6 +12,7 @@ class ToolRegistry:
     Attributes:
         tools (Dict[str, Dict[str, Any]]): OpenAPI-style tools and schemas
         xml_tools (Dict[str, Dict[str, Any]]): XML-style tools and schemas
+        execution_hints (Dict[str, ToolExecutionHints]): Execution hints by function name
         
     Methods:
         register_tool: Register a tool with optional function filtering
@@ -19,12 +20,14 @@ class ToolRegistry:
         get_xml_tool: Get a tool by XML tag name
         get_openapi_schemas: Get OpenAPI schemas for function calling
         get_xml_examples: Get examples of XML tool usage
+        get_execution_hints: Get the execution hints of a function
     """
     
     def __init__(self):
         """Initialize a new ToolRegistry instance."""
         self.tools = {}
         self.xml_tools = {}
+        self.execution_hints = {}
         logger.debug("Initialized new ToolRegistry instance")
     
     def register_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
@@ -42,6 +45,7 @@ class ToolRegistry:
         logger.debug(f"Registering tool class: {tool_class.__name__}")
         tool_instance = tool_class(**kwargs)
         schemas = tool_instance.get_schemas()
+        execution_hints = tool_instance.get_execution_hints()
         
         logger.debug(f"Available schemas for {tool_class.__name__}: {list(schemas.keys())}")
         
@@ -50,6 +54,10 @@ class ToolRegistry:
         
         for func_name, schema_list in schemas.items():
             if function_names is None or func_name in function_names:
+                if func_name in execution_hints:
+                    self.execution_hints[func_name] = execution_hints[func_name]
+                else:
+                    self.execution_hints.pop(func_name, None)
                 for schema in schema_list:
                     if schema.schema_type == SchemaType.OPENAPI:
                         self.tools[func_name] = {
@@ -95,6 +103,17 @@ class ToolRegistry:
         logger.debug(f"Retrieved {len(available_functions)} available functions")
         return available_functions
 
+    def get_execution_hints(self, function_name: str) -> Optional[ToolExecutionHints]:
+        """Get the execution hints declared for a tool function.
+        
+        Args:
+            function_name: Name of the tool function
+            
+        Returns:
+            The function's hints, or None if it declares none
+        """
+        return self.execution_hints.get(function_name)
+
     def get_tool(self, tool_name: str) -> Dict[str, Any]:
         """Get a specific tool by name.
         
@@ -0,0 +1,177 @@
+"""
+Dependency-aware tool call scheduling for AgentPress.
+
+The parallel execution strategy used to start every tool call at once, and the
+sequential one made read-only calls wait behind each other. ToolScheduler
+orders calls by the execution hints declared on tool functions instead:
+- A call waits only for the earlier calls it conflicts with; the rest run
+  concurrently
+- Two calls conflict unless both are read-only or they share no resource.
+  Sandbox paths are shared when one contains the other, and "sandbox" covers
+  every path
+- Functions without hints conflict with every call, so they run alone and in
+  the order they were called
+- Calls of a function with max_concurrency run at most that many at a time
+Calls can be submitted one by one as they stream in, or as a batch whose
+results come back in the order of the calls.
+"""
+
+import asyncio
+import json
+import posixpath
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from agentpress.tool import ToolExecutionHints, ToolResult
+from agentpress.tool_registry import ToolRegistry
+from utils.files_utils import clean_path
+from utils.logger import logger
+
+SANDBOX_RESOURCE = "sandbox"
+PATH_RESOURCE_PREFIX = "path:"
+
+# (resource name, sandbox path or None for opaque resources); "" is the whole sandbox
+Resource = Tuple[str, Optional[str]]
+
+
+@dataclass
+class ScheduledCall:
+    """A submitted tool call and what it may conflict on."""
+    tool_call: Dict[str, Any]
+    hints: Optional[ToolExecutionHints]
+    resources: List[Resource] = field(default_factory=list)
+    task: Optional[asyncio.Task] = None
+
+
+def normalize_sandbox_path(path: str) -> str:
+    """Path relative to the workspace, as the sandbox tools resolve it; "" is the workspace."""
+    path = posixpath.normpath(clean_path(str(path).strip()))
+    return '' if path == '.' else path.strip('/')
+
+
+def _arguments(tool_call: Dict[str, Any]) -> Dict[str, Any]:
+    arguments = tool_call.get('arguments')
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments)
+        except json.JSONDecodeError:
+            return {}
+    return arguments if isinstance(arguments, dict) else {}
+
+
+def resolve_resources(hints: ToolExecutionHints, tool_call: Dict[str, Any]) -> List[Resource]:
+    """The concrete resources a call uses, given its arguments."""
+    arguments = _arguments(tool_call)
+    resources = []
+    for resource in hints.resources:
+        if resource == SANDBOX_RESOURCE:
+            resources.append((SANDBOX_RESOURCE, ''))
+        elif resource.startswith(PATH_RESOURCE_PREFIX):
+            path = arguments.get(resource[len(PATH_RESOURCE_PREFIX):])
+            # Without its path the call could touch anything in the sandbox
+            resources.append((SANDBOX_RESOURCE, normalize_sandbox_path(path) if path else ''))
+        else:
+            resources.append((resource, None))
+    return resources
+
+
+def _paths_overlap(a: str, b: str) -> bool:
+    return a == '' or b == '' or a == b or b.startswith(a + '/') or a.startswith(b + '/')
+
+
+def calls_conflict(earlier: ScheduledCall, later: ScheduledCall) -> bool:
+    """Whether later must wait for earlier to finish."""
+    if earlier.hints is None or later.hints is None:
+        return True
+    if earlier.hints.read_only and later.hints.read_only:
+        return False
+    for name_a, path_a in earlier.resources:
+        for name_b, path_b in later.resources:
+            if name_a != name_b:
+                continue
+            if path_a is None or path_b is None or _paths_overlap(path_a, path_b):
+                return True
+    return False
+
+
+class ToolScheduler:
+    """Runs tool calls concurrently where their execution hints allow it."""
+
+    def __init__(
+        self,
+        tool_registry: ToolRegistry,
+        execute: Callable[[Dict[str, Any]], Awaitable[ToolResult]]
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            tool_registry: Registry to look up execution hints in
+            execute: Coroutine function running one tool call
+        """
+        self.tool_registry = tool_registry
+        self.execute = execute
+        self._running: List[ScheduledCall] = []
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+
+    def submit(self, tool_call: Dict[str, Any], exclusive: bool = False) -> asyncio.Task:
+        """Start a tool call once the earlier calls it conflicts with are done.
+
+        Args:
+            tool_call: Tool call with 'function_name' and 'arguments'
+            exclusive: Ignore the function's hints and run the call alone
+
+        Returns:
+            Task resolving to the call's ToolResult
+        """
+        hints = None if exclusive else self.tool_registry.get_execution_hints(tool_call.get('function_name'))
+        call = ScheduledCall(tool_call, hints, resolve_resources(hints, tool_call) if hints else [])
+
+        self._running = [running for running in self._running if not running.task.done()]
+        blockers = [running.task for running in self._running if calls_conflict(running, call)]
+        if blockers:
+            logger.debug(f"Tool {tool_call.get('function_name')} waits for {len(blockers)} conflicting calls")
+
+        call.task = asyncio.create_task(self._run(call, blockers))
+        self._running.append(call)
+        return call.task
+
+    def _limit(self, call: ScheduledCall):
+        if call.hints is None or not call.hints.max_concurrency:
+            return nullcontext()
+        function_name = call.tool_call.get('function_name')
+        if function_name not in self._limits:
+            self._limits[function_name] = asyncio.Semaphore(call.hints.max_concurrency)
+        return self._limits[function_name]
+
+    async def _run(self, call: ScheduledCall, blockers: List[asyncio.Task]) -> ToolResult:
+        if blockers:
+            # Failed or cancelled blockers release their dependents too
+            await asyncio.wait(blockers)
+        async with self._limit(call):
+            return await self.execute(call.tool_call)
+
+    async def run(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        exclusive: bool = False
+    ) -> List[Tuple[Dict[str, Any], ToolResult]]:
+        """Run a batch of tool calls and return their results in call order.
+
+        Args:
+            tool_calls: Tool calls to run
+            exclusive: Run the calls one at a time, in order
+
+        Returns:
+            List of tuples containing the original tool call and its result
+        """
+        tasks = [self.submit(tool_call, exclusive=exclusive) for tool_call in tool_calls]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        processed_results = []
+        for tool_call, result in zip(tool_calls, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Error executing tool {tool_call.get('function_name', 'unknown')}: {str(result)}")
+                result = ToolResult(success=False, output=f"Error executing tool: {str(result)}")
+            processed_results.append((tool_call, result))
+        return processed_results
@@ -0,0 +1,177 @@
+"""
+Incremental XML tool-call parser for AgentPress.
+
+This module finds complete XML tool calls in a streamed LLM response without
+rescanning what it has already seen:
+- Registered tag names are compiled once into a prefix trie, so each '<' in
+  the stream is matched against every tool at once
+- The parser keeps its scan offset, open tag and nesting depth across chunks
+- Text that cannot start a tool call is dropped as soon as it is scanned, so
+  work per chunk is proportional to the chunk, not to the whole response
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Characters that may follow a tag name inside '<tag ...>'
+_TAG_NAME_TERMINATORS = frozenset(" \t\r\n>/")
+
+_NO_MATCH = 0
+_PARTIAL = 1
+_MATCH = 2
+
+
+class TagTrie:
+    """Prefix trie over registered XML tag names."""
+
+    __slots__ = ("root", "tags")
+
+    def __init__(self, tag_names: Iterable[str]):
+        self.tags: Tuple[str, ...] = tuple(tag_names)
+        self.root: Dict[str, dict] = {}
+        for tag in self.tags:
+            node = self.root
+            for char in tag:
+                node = node.setdefault(char, {})
+            # None is never a character key, so it marks the end of a tag name
+            node[None] = tag
+
+    def match(self, text: str, pos: int) -> Tuple[int, Optional[str], int]:
+        """Match a tag name starting at text[pos] (just after '<').
+
+        Returns (status, tag, end): _MATCH with the longest registered tag
+        that ends on a tag-name boundary, _PARTIAL when the text ends before
+        that can be decided, or _NO_MATCH.
+        """
+        node = self.root
+        best: Optional[Tuple[str, int]] = None
+        i = pos
+        length = len(text)
+        while True:
+            tag = node.get(None)
+            if tag is not None:
+                if i == length:
+                    return _PARTIAL, None, i
+                if text[i] in _TAG_NAME_TERMINATORS:
+                    best = (tag, i)
+            if i == length:
+                return (_MATCH, best[0], best[1]) if best else (_PARTIAL, None, i)
+            node = node.get(text[i])
+            if node is None:
+                break
+            i += 1
+        return (_MATCH, best[0], best[1]) if best else (_NO_MATCH, None, i)
+
+
+class StreamingXMLParser:
+    """Emits complete '<tag ...>...</tag>' chunks from text fed in pieces.
+
+    A tool call may contain nested tags of the same name; the chunk ends at
+    the closing tag that balances its opening tag.
+    """
+
+    def __init__(self, trie: TagTrie):
+        self.trie = trie
+        self._buffer = ""
+        self._scan = 0
+        self._tag: Optional[str] = None
+        self._close = ""
+        self._depth = 0
+
+    @classmethod
+    def for_tags(cls, tag_names: Iterable[str]) -> "StreamingXMLParser":
+        return cls(TagTrie(tag_names))
+
+    @property
+    def pending(self) -> str:
+        """Unconsumed text: an incomplete tool call or a possible tag prefix."""
+        return self._buffer
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text and return tool-call chunks completed by it."""
+        if not self.trie.tags:
+            return []
+        self._buffer += text
+        chunks: List[str] = []
+        while True:
+            if self._tag is None:
+                if not self._scan_for_open():
+                    break
+            else:
+                chunk = self._scan_for_close()
+                if chunk is None:
+                    break
+                chunks.append(chunk)
+        return chunks
+
+    def _scan_for_open(self) -> bool:
+        """Find the next registered opening tag; False when more input is needed."""
+        buffer = self._buffer
+        pos = self._scan
+        while True:
+            lt = buffer.find("<", pos)
+            if lt == -1:
+                # Nothing here can start a tool call
+                self._buffer = ""
+                self._scan = 0
+                return False
+            status, tag, end = self.trie.match(buffer, lt + 1)
+            if status == _MATCH:
+                self._buffer = buffer[lt:]
+                self._scan = end - lt
+                self._tag = tag
+                self._close = f"</{tag}>"
+                self._depth = 1
+                return True
+            if status == _PARTIAL:
+                self._buffer = buffer[lt:]
+                self._scan = 0
+                return False
+            pos = lt + 1
+
+    def _scan_for_close(self) -> Optional[str]:
+        """Advance inside the open tool call; returns the chunk once it is balanced."""
+        buffer = self._buffer
+        tag = self._tag
+        close = self._close
+        pos = self._scan
+        length = len(buffer)
+        while True:
+            lt = buffer.find("<", pos)
+            if lt == -1:
+                self._scan = length
+                return None
+
+            if buffer.startswith(close, lt):
+                self._depth -= 1
+                end = lt + len(close)
+                if self._depth == 0:
+                    chunk = buffer[:end]
+                    self._buffer = buffer[end:]
+                    self._scan = 0
+                    self._tag = None
+                    return chunk
+                pos = end
+                continue
+
+            if buffer.startswith(tag, lt + 1):
+                after = lt + 1 + len(tag)
+                if after == length:
+                    self._scan = lt
+                    return None
+                if buffer[after] in _TAG_NAME_TERMINATORS:
+                    self._depth += 1
+                    pos = after
+                    continue
+            else:
+                rest = buffer[lt:lt + len(close)]
+                if len(rest) < len(close) and (close.startswith(rest) or tag.startswith(rest[1:])):
+                    # Possibly the start of a closing or nested opening tag
+                    self._scan = lt
+                    return None
+
+            pos = lt + 1
+
+
+def extract_xml_chunks(content: str, trie: TagTrie) -> List[str]:
+    """Complete tool-call chunks in a finished piece of text."""
+    return StreamingXMLParser(trie).feed(content)
@@ -62,9 +62,13 @@ async def lifespan(app: FastAPI):
         
         # Start background tasks
         # asyncio.create_task(agent_api.restore_running_agent_runs())
+        from services import usage
+        usage_reconciler = asyncio.create_task(usage.run_reconciliation(db))
         
         yield
         
+        usage_reconciler.cancel()
+        
         # Clean up agent resources
         logger.info("Cleaning up agent resources")
         await agent_api.cleanup()
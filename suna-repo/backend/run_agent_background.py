@@ -1,5 +1,16 @@
+import os
+import tempfile
+
+# dramatiq's Prometheus middleware serves every worker process's metrics from
+# files in this directory on :9191 (dramatiq_prom_host/dramatiq_prom_port),
+# including response_stream's flush histograms. prometheus_client picks
+# multiprocess mode when it is first imported, so the directory is set before
+# any import that pulls it in, to the same path the middleware uses.
+PROMETHEUS_DB = os.getenv("dramatiq_prom_db", "%s/dramatiq-prometheus" % tempfile.gettempdir())
+os.environ["PROMETHEUS_MULTIPROC_DIR"] = PROMETHEUS_DB
+os.makedirs(PROMETHEUS_DB, exist_ok=True)
+
 import asyncio
-import json
 import traceback
 from datetime import datetime, timezone
 from typing import Optional
@@ -11,12 +22,17 @@ import uuid
 from agentpress.thread_manager import ThreadManager
 from services.supabase import DBConnection
 from services import redis
+from services import response_stream
+from services import usage
 from dramatiq.brokers.rabbitmq import RabbitmqBroker
-import os
 
 rabbitmq_host = os.getenv('RABBITMQ_HOST', 'rabbitmq')
 rabbitmq_port = int(os.getenv('RABBITMQ_PORT', 5672))
-rabbitmq_broker = RabbitmqBroker(host=rabbitmq_host, port=rabbitmq_port, middleware=[dramatiq.middleware.AsyncIO()])
+rabbitmq_broker = RabbitmqBroker(
+    host=rabbitmq_host,
+    port=rabbitmq_port,
+    middleware=[dramatiq.middleware.Prometheus(), dramatiq.middleware.AsyncIO()]
+)
 dramatiq.set_broker(rabbitmq_broker)
 
 _initialized = False
@@ -63,13 +79,14 @@ async def run_agent_background(
     client = await db.client
     start_time = datetime.now(timezone.utc)
     total_responses = 0
+    all_responses = []
+    response_writer = response_stream.ResponseWriter(agent_run_id)
     pubsub = None
     stop_checker = None
+    agent_gen = None
     stop_signal_received = False
 
     # Define Redis keys and channels
-    response_list_key = f"agent_run:{agent_run_id}:responses"
-    response_channel = f"agent_run:{agent_run_id}:new_response"
     instance_control_channel = f"agent_run:{agent_run_id}:control:{instance_id}"
     global_control_channel = f"agent_run:{agent_run_id}:control"
     instance_active_key = f"active_run:{instance_id}:{agent_run_id}"
@@ -125,10 +142,9 @@ async def run_agent_background(
                 final_status = "stopped"
                 break
 
-            # Store response in Redis list and publish notification
-            response_json = json.dumps(response)
-            asyncio.create_task(redis.rpush(response_list_key, response_json))
-            asyncio.create_task(redis.publish(response_channel, "new"))
+            # Buffer response for the run's Redis stream; written in ordered batches
+            await response_writer.append(response)
+            all_responses.append(response)
             total_responses += 1
 
             # Check for agent-signaled completion or error
@@ -147,24 +163,20 @@ async def run_agent_background(
              duration = (datetime.now(timezone.utc) - start_time).total_seconds()
              logger.info(f"Agent run {agent_run_id} completed normally (duration: {duration:.2f}s, responses: {total_responses})")
              completion_message = {"type": "status", "status": "completed", "message": "Agent run completed successfully"}
-             await redis.rpush(response_list_key, json.dumps(completion_message))
-             await redis.publish(response_channel, "new") # Notify about the completion message
-
-        # Fetch final responses from Redis for DB update
-        all_responses_json = await redis.lrange(response_list_key, 0, -1)
-        all_responses = [json.loads(r) for r in all_responses_json]
+             await response_writer.append(completion_message)
+             all_responses.append(completion_message)
 
-        # Update DB status
+        # Update DB status with the responses kept during the run
         await update_agent_run_status(client, agent_run_id, final_status, error=error_message, responses=all_responses)
 
-        # Publish final control signal (END_STREAM or ERROR)
+        # Append final control signal (END_STREAM or ERROR) for stream readers
         control_signal = "END_STREAM" if final_status == "completed" else "ERROR" if final_status == "failed" else "STOP"
         try:
-            await redis.publish(global_control_channel, control_signal)
-            # No need to publish to instance channel as the run is ending on this instance
-            logger.debug(f"Published final control signal '{control_signal}' to {global_control_channel}")
+            await response_writer.append_control(control_signal)
+            await response_writer.close()
+            logger.debug(f"Appended final control signal '{control_signal}' to response stream of {agent_run_id}")
         except Exception as e:
-            logger.warning(f"Failed to publish final control signal {control_signal}: {str(e)}")
+            logger.warning(f"Failed to append final control signal {control_signal}: {str(e)}")
 
     except Exception as e:
         error_message = str(e)
@@ -173,34 +185,37 @@ async def run_agent_background(
         logger.error(f"Error in agent run {agent_run_id} after {duration:.2f}s: {error_message}\n{traceback_str} (Instance: {instance_id})")
         final_status = "failed"
 
-        # Push error message to Redis list
+        # Flush buffered responses, then append the error message to the response stream
         error_response = {"type": "status", "status": "error", "message": error_message}
+        all_responses.append(error_response)
         try:
-            await redis.rpush(response_list_key, json.dumps(error_response))
-            await redis.publish(response_channel, "new")
+            await response_writer.close()
         except Exception as redis_err:
-             logger.error(f"Failed to push error response to Redis for {agent_run_id}: {redis_err}")
-
-        # Fetch final responses (including the error)
-        all_responses = []
+             logger.error(f"Failed to flush buffered responses to Redis for {agent_run_id}: {redis_err}")
         try:
-             all_responses_json = await redis.lrange(response_list_key, 0, -1)
-             all_responses = [json.loads(r) for r in all_responses_json]
-        except Exception as fetch_err:
-             logger.error(f"Failed to fetch responses from Redis after error for {agent_run_id}: {fetch_err}")
-             all_responses = [error_response] # Use the error message we tried to push
+            await response_stream.append_response(agent_run_id, error_response)
+        except Exception as redis_err:
+             logger.error(f"Failed to push error response to Redis for {agent_run_id}: {redis_err}")
 
         # Update DB status
         await update_agent_run_status(client, agent_run_id, "failed", error=f"{error_message}\n{traceback_str}", responses=all_responses)
 
-        # Publish ERROR signal
+        # Append ERROR signal for stream readers
         try:
-            await redis.publish(global_control_channel, "ERROR")
-            logger.debug(f"Published ERROR signal to {global_control_channel}")
+            await response_stream.append_control(agent_run_id, "ERROR")
+            logger.debug(f"Appended ERROR signal to response stream of {agent_run_id}")
         except Exception as e:
-            logger.warning(f"Failed to publish ERROR signal: {str(e)}")
+            logger.warning(f"Failed to append ERROR signal: {str(e)}")
 
     finally:
+        # Close the agent generator now rather than at garbage collection, so
+        # its cleanup (e.g. the run's timing summary) runs when the loop stops early
+        if agent_gen is not None:
+            try:
+                await agent_gen.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing agent generator for {agent_run_id}: {str(e)}")
+
         # Cleanup stop checker task
         if stop_checker and not stop_checker.done():
             stop_checker.cancel()
@@ -217,7 +232,13 @@ async def run_agent_background(
             except Exception as e:
                 logger.warning(f"Error closing pubsub for {agent_run_id}: {str(e)}")
 
-        # Set TTL on the response list in Redis
+        # Make sure the response writer's flusher is not left running
+        try:
+            await response_writer.close()
+        except Exception as e:
+            logger.debug(f"Response writer for {agent_run_id} ended with: {e}")
+
+        # Set TTL on the response stream in Redis
         await _cleanup_redis_response_list(agent_run_id)
 
         # Remove the instance-specific active run key
@@ -238,17 +259,9 @@ async def _cleanup_redis_instance_key(agent_run_id: str):
     except Exception as e:
         logger.warning(f"Failed to clean up Redis key {key}: {str(e)}")
 
-# TTL for Redis response lists (24 hours)
-REDIS_RESPONSE_LIST_TTL = 3600 * 24
-
 async def _cleanup_redis_response_list(agent_run_id: str):
-    """Set TTL on the Redis response list."""
-    response_list_key = f"agent_run:{agent_run_id}:responses"
-    try:
-        await redis.expire(response_list_key, REDIS_RESPONSE_LIST_TTL)
-        logger.debug(f"Set TTL ({REDIS_RESPONSE_LIST_TTL}s) on response list: {response_list_key}")
-    except Exception as e:
-        logger.warning(f"Failed to set TTL on response list {response_list_key}: {str(e)}")
+    """Set TTL on the Redis response stream."""
+    await response_stream.expire_response_stream(agent_run_id)
 
 async def update_agent_run_status(
     client,
@@ -262,9 +275,10 @@ async def update_agent_run_status(
     Returns True if update was successful.
     """
     try:
+        completed_at = datetime.now(timezone.utc)
         update_data = {
             "status": status,
-            "completed_at": datetime.now(timezone.utc).isoformat()
+            "completed_at": completed_at.isoformat()
         }
 
         if error:
@@ -282,6 +296,12 @@ async def update_agent_run_status(
                 if hasattr(update_result, 'data') and update_result.data:
                     logger.info(f"Successfully updated agent run {agent_run_id} status to '{status}' (retry {retry})")
 
+                    # Charge the run's minutes to its account's usage counter
+                    try:
+                        await usage.record_run_end(agent_run_id, completed_at)
+                    except Exception as usage_error:
+                        logger.warning(f"Failed to record usage end for agent run {agent_run_id}: {str(usage_error)}")
+
                     # Verify the update
                     verify_result = await client.table('agent_runs').select('status', 'completed_at').eq("id", agent_run_id).execute()
                     if verify_result.data:
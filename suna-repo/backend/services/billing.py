@@ -7,6 +7,7 @@ stripe listen --forward-to localhost:8000/api/billing/webhook
 from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import Optional, Dict, Tuple
 import stripe
+import time
 from datetime import datetime, timezone
 from utils.logger import logger
 from utils.config import config, EnvMode
@@ -14,6 +15,7 @@ from services.supabase import DBConnection
 from utils.auth_utils import get_current_user_id_from_jwt
 from pydantic import BaseModel
 from utils.constants import MODEL_ACCESS_TIERS
+from services import usage
 # Initialize Stripe
 stripe.api_key = config.STRIPE_SECRET_KEY
 
@@ -62,6 +64,12 @@ SUBSCRIPTION_TIERS = {
     config.STRIPE_TIER_200_1000_ID: {'name': 'tier_200_1000', 'minutes': 12000},  # 200 hours
 }
 
+# Seconds billing checks may reuse a user's Stripe subscription
+SUBSCRIPTION_CACHE_TTL = 60
+
+# user_id -> (expires_at, subscription)
+_subscription_cache: Dict[str, Tuple[float, Optional[Dict]]] = {}
+
 # Pydantic models for request/response validation
 class CreateCheckoutSessionRequest(BaseModel):
     price_id: str
@@ -186,47 +194,33 @@ async def get_user_subscription(user_id: str) -> Optional[Dict]:
         logger.error(f"Error getting subscription from Stripe: {str(e)}")
         return None
 
+async def get_cached_user_subscription(user_id: str) -> Optional[Dict]:
+    """Get the user's subscription, reusing it for SUBSCRIPTION_CACHE_TTL seconds.
+
+    Used by the checks that run on every agent iteration; endpoints that show
+    or change the subscription call get_user_subscription directly.
+    """
+    cached = _subscription_cache.get(user_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    subscription = await get_user_subscription(user_id)
+    _subscription_cache[user_id] = (time.monotonic() + SUBSCRIPTION_CACHE_TTL, subscription)
+    return subscription
+
+def invalidate_billing_cache(user_id: Optional[str] = None):
+    """Forget cached subscription and usage for one user, or for everyone."""
+    if user_id is None:
+        _subscription_cache.clear()
+    else:
+        _subscription_cache.pop(user_id, None)
+    usage.invalidate(user_id)
+
 async def calculate_monthly_usage(client, user_id: str) -> float:
-    """Calculate total agent run minutes for the current month for a user."""
-    # Get start of current month in UTC
-    now = datetime.now(timezone.utc)
-    start_of_month = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
-    
-    # First get all threads for this user
-    threads_result = await client.table('threads') \
-        .select('thread_id') \
-        .eq('account_id', user_id) \
-        .execute()
-    
-    if not threads_result.data:
-        return 0.0
-    
-    thread_ids = [t['thread_id'] for t in threads_result.data]
-    
-    # Then get all agent runs for these threads in current month
-    runs_result = await client.table('agent_runs') \
-        .select('started_at, completed_at') \
-        .in_('thread_id', thread_ids) \
-        .gte('started_at', start_of_month.isoformat()) \
-        .execute()
-    
-    if not runs_result.data:
-        return 0.0
-    
-    # Calculate total minutes
-    total_seconds = 0
-    now_ts = now.timestamp()
-    
-    for run in runs_result.data:
-        start_time = datetime.fromisoformat(run['started_at'].replace('Z', '+00:00')).timestamp()
-        if run['completed_at']:
-            end_time = datetime.fromisoformat(run['completed_at'].replace('Z', '+00:00')).timestamp()
-        else:
-            # For running jobs, use current time
-            end_time = now_ts
-        
-        total_seconds += (end_time - start_time)
-    
+    """Calculate total agent run minutes for the current month for a user from the database."""
+    completed_seconds, running = await usage.load_usage_from_db(client, user_id)
+    # For running jobs, use current time
+    now_ts = datetime.now(timezone.utc).timestamp()
+    total_seconds = completed_seconds + sum(now_ts - started for started in running.values())
     return total_seconds / 60  # Convert to minutes
 
 async def get_allowed_models_for_user(client, user_id: str):
@@ -237,7 +231,7 @@ async def get_allowed_models_for_user(client, user_id: str):
         List of model names allowed for the user's subscription tier.
     """
 
-    subscription = await get_user_subscription(user_id)
+    subscription = await get_cached_user_subscription(user_id)
     tier_name = 'free'
     
     if subscription:
@@ -288,7 +282,7 @@ async def check_billing_status(client, user_id: str) -> Tuple[bool, str, Optiona
         }
     
     # Get current subscription
-    subscription = await get_user_subscription(user_id)
+    subscription = await get_cached_user_subscription(user_id)
     # print("Current subscription:", subscription)
     
     # If no subscription, they can use free tier
@@ -311,8 +305,8 @@ async def check_billing_status(client, user_id: str) -> Tuple[bool, str, Optiona
         logger.warning(f"Unknown subscription tier: {price_id}, defaulting to free tier")
         tier_info = SUBSCRIPTION_TIERS[config.STRIPE_FREE_TIER_ID]
     
-    # Calculate current month's usage
-    current_usage = await calculate_monthly_usage(client, user_id)
+    # Current month's usage from the running usage counter
+    current_usage = await usage.get_monthly_usage(client, user_id)
     
     # Check if within limits
     if current_usage >= tier_info['minutes']:
@@ -883,6 +877,14 @@ async def stripe_webhook(request: Request):
                     ).eq('id', customer_id).execute()
                     logger.info(f"Webhook: Updated customer {customer_id} active status to FALSE after subscription deletion")
             
+            # Billing checks reuse subscriptions for a minute; drop this account's copy
+            customer_result = await client.schema('basejump').from_('billing_customers') \
+                .select('account_id') \
+                .eq('id', customer_id) \
+                .execute()
+            if customer_result.data:
+                invalidate_billing_cache(customer_result.data[0]['account_id'])
+            
             logger.info(f"Processed {event.type} event for customer {customer_id}")
         
         return {"status": "success"}
@@ -3,7 +3,7 @@ import os
 from dotenv import load_dotenv
 import asyncio
 from utils.logger import logger
-from typing import List, Any
+from typing import Dict, List, Any, Optional
 
 # Redis client
 client = None
@@ -138,6 +138,25 @@ async def llen(key: str) -> int:
     return await redis_client.llen(key)
 
 
+# Stream operations
+async def xadd(key: str, fields: Dict[str, str], maxlen: Optional[int] = None):
+    """Append an entry to a stream, trimming it to about maxlen entries."""
+    redis_client = await get_client()
+    return await redis_client.xadd(key, fields, maxlen=maxlen, approximate=True)
+
+
+async def xread(streams: Dict[str, str], count: Optional[int] = None, block: Optional[int] = None):
+    """Read entries after the given IDs, waiting up to block milliseconds for new ones."""
+    redis_client = await get_client()
+    return await redis_client.xread(streams, count=count, block=block)
+
+
+async def xrange(key: str, min: str = "-", max: str = "+", count: Optional[int] = None):
+    """Get a range of entries from a stream."""
+    redis_client = await get_client()
+    return await redis_client.xrange(key, min=min, max=max, count=count)
+
+
 # Key management
 async def expire(key: str, time: int):
     """Set a key's time to live in seconds."""
@@ -0,0 +1,235 @@
+"""
+In-process fan-out of agent run response streams.
+
+Every client of /agent-run/{id}/stream used to follow the run's Redis stream
+on its own connection and decode every entry itself. The hub keeps one feed
+per active agent run in this process instead:
+- A single XREAD BLOCK loop per run reads the stream and decodes each entry
+  once; the decoded entries (and their rendered SSE events) are shared
+- Subscribers joining late, or resuming from a Last-Event-ID, are replayed
+  from the feed's cache without touching Redis
+- Live entries go to each subscriber through a bounded queue; a subscriber
+  whose queue fills up is evicted and can reconnect to resume where it was
+- A feed stays alive for a short linger after its last subscriber leaves, so
+  reconnecting clients are served from the cache
+"""
+
+import asyncio
+import bisect
+from typing import Dict, List, Optional, Set
+
+from services import response_stream
+from services.response_stream import StreamEntry
+from utils.logger import logger
+
+# Live entries a subscriber may fall behind by before it is evicted
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+# Seconds a feed with no subscribers is kept before it is closed
+FEED_LINGER_SECONDS = 30.0
+
+# Queue marker: the feed failed and the subscriber should stop
+_FEED_FAILED = object()
+
+
+class SlowConsumerError(Exception):
+    """A subscriber fell too far behind and was dropped from its feed."""
+
+
+class FeedError(Exception):
+    """The feed stopped reading its Redis stream."""
+
+
+class Subscription:
+    """One local reader of a run's feed.
+
+    Iterate replay() first for the entries that were already cached when the
+    subscription started, then iterate the subscription itself for live ones.
+    """
+
+    def __init__(self, feed: "RunFeed", replay: List[StreamEntry]):
+        self.feed = feed
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.evicted = False
+        self.done = False
+        self._replay = replay
+
+    def replay(self) -> List[StreamEntry]:
+        replay, self._replay = self._replay, []
+        return replay
+
+    def deliver(self, item) -> bool:
+        """Queue an entry; False when the subscriber is too slow to keep."""
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.evicted = True
+            return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> StreamEntry:
+        if self.done and self.queue.empty():
+            raise StopAsyncIteration
+        if self.evicted and self.queue.empty():
+            raise SlowConsumerError(f"Subscriber of agent run {self.feed.agent_run_id} fell behind")
+        item = await self.queue.get()
+        if item is _FEED_FAILED:
+            raise FeedError(f"Response feed of agent run {self.feed.agent_run_id} failed: {self.feed.error}")
+        return item
+
+    def close(self):
+        self.feed.unsubscribe(self)
+
+
+class RunFeed:
+    """One run's stream reader, entry cache and local subscribers."""
+
+    def __init__(self, hub: "ResponseStreamHub", agent_run_id: str):
+        self.hub = hub
+        self.agent_run_id = agent_run_id
+        self.entries: List[StreamEntry] = []
+        self.subscribers: Set[Subscription] = set()
+        self.last_id = response_stream.STREAM_START
+        self.finished = False
+        self.error: Optional[Exception] = None
+        self.ready = asyncio.Event()
+        self.task = asyncio.create_task(self._read())
+        self._linger: Optional[asyncio.TimerHandle] = None
+
+    async def _read(self):
+        """Read the stream once for every subscriber in this process."""
+        try:
+            while not self.finished:
+                caught_up = self.ready.is_set()
+                entries = await response_stream.read_responses(
+                    self.agent_run_id,
+                    self.last_id,
+                    block_ms=response_stream.READ_BLOCK_MS if caught_up else None
+                )
+                for entry in entries:
+                    self._publish(entry)
+                    if entry.is_final:
+                        self.finished = True
+                        break
+                if not caught_up and len(entries) < response_stream.READ_COUNT:
+                    # The backlog is cached; subscribers can now join without gaps
+                    self.ready.set()
+            for subscription in self.subscribers:
+                # Nothing follows the final entry
+                subscription.done = True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Response feed for agent run {self.agent_run_id} failed: {e}", exc_info=True)
+            self.error = e
+            for subscription in list(self.subscribers):
+                if not subscription.deliver(_FEED_FAILED):
+                    self.hub.stats["evictions"] += 1
+            self.hub.discard(self)
+        finally:
+            self.ready.set()
+
+    def _publish(self, entry: StreamEntry):
+        self.last_id = entry.id
+        self.entries.append(entry)
+        if len(self.entries) > response_stream.RESPONSE_STREAM_MAXLEN:
+            del self.entries[:len(self.entries) - response_stream.RESPONSE_STREAM_MAXLEN]
+        self.hub.stats["entries"] += 1
+        for subscription in list(self.subscribers):
+            if not subscription.deliver(entry):
+                logger.warning(f"Evicting slow subscriber of agent run {self.agent_run_id}")
+                self.hub.stats["evictions"] += 1
+                self.subscribers.discard(subscription)
+                self._schedule_linger()
+
+    def subscribe(self, after: str) -> Subscription:
+        """Attach a subscriber that gets every entry after the given ID.
+
+        Must be called once the feed is ready; replay and registration happen
+        without awaiting, so no live entry can slip between them.
+        """
+        start = 0
+        if after != response_stream.STREAM_START:
+            start = bisect.bisect_right(self.entries, response_stream.entry_id_key(after), key=lambda e: e.sort_key)
+        subscription = Subscription(self, self.entries[start:])
+        if self.error is not None:
+            subscription.deliver(_FEED_FAILED)
+        elif self.finished:
+            subscription.done = True
+        else:
+            self.subscribers.add(subscription)
+        self._cancel_linger()
+        self._schedule_linger()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+        self._schedule_linger()
+
+    def _schedule_linger(self):
+        if self.subscribers or self._linger is not None:
+            return
+        self._linger = asyncio.get_running_loop().call_later(FEED_LINGER_SECONDS, self._expire)
+
+    def _cancel_linger(self):
+        if self._linger is not None:
+            self._linger.cancel()
+            self._linger = None
+
+    def _expire(self):
+        self._linger = None
+        if not self.subscribers:
+            self.hub.discard(self)
+
+    def close(self):
+        self._cancel_linger()
+        if not self.task.done() and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+
+class ResponseStreamHub:
+    """Per-process registry of run feeds."""
+
+    def __init__(self):
+        self.feeds: Dict[str, RunFeed] = {}
+        self.stats = {"feeds_opened": 0, "subscriptions": 0, "entries": 0, "evictions": 0}
+
+    async def subscribe(self, agent_run_id: str, after: str = response_stream.STREAM_START) -> Subscription:
+        """Subscribe to a run's responses after the given entry ID."""
+        feed = self.feeds.get(agent_run_id)
+        if feed is None or feed.error is not None:
+            feed = RunFeed(self, agent_run_id)
+            self.feeds[agent_run_id] = feed
+            self.stats["feeds_opened"] += 1
+            logger.debug(f"Opened response feed for agent run {agent_run_id}")
+        await feed.ready.wait()
+        self.stats["subscriptions"] += 1
+        return feed.subscribe(after)
+
+    def discard(self, feed: RunFeed):
+        if self.feeds.get(feed.agent_run_id) is feed:
+            del self.feeds[feed.agent_run_id]
+            logger.debug(f"Closed response feed for agent run {feed.agent_run_id}")
+        feed.close()
+
+    async def close(self):
+        """Stop every feed; used on shutdown."""
+        feeds = list(self.feeds.values())
+        self.feeds.clear()
+        for feed in feeds:
+            feed.close()
+        await asyncio.gather(*(feed.task for feed in feeds), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "active_feeds": len(self.feeds),
+            "subscribers": sum(len(feed.subscribers) for feed in self.feeds.values()),
+        }
+
+
+# Hub shared by all stream requests served by this process
+hub = ResponseStreamHub()
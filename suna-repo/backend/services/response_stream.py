@@ -0,0 +1,301 @@
+"""
+Agent run response streams on Redis.
+
+Each agent run appends its responses to a Redis Stream, and readers follow it
+with XREAD BLOCK from the last entry ID they have seen:
+- A reader needs one connection and no pub/sub subscriptions
+- Entry IDs double as SSE event IDs, so a client can resume from any offset
+- Streams are trimmed with MAXLEN on append
+- Control signals (END_STREAM, ERROR, STOP) are appended to the same stream,
+  so readers see them in order with the responses
+- A running agent writes through ResponseWriter, which coalesces streamed
+  chunks into pipelined MULTI/EXEC batches numbered in order
+"""
+
+import asyncio
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from prometheus_client import Histogram
+
+from services import redis
+from utils.logger import logger
+
+# Approximate cap on entries kept per run (responses are streamed chunks)
+RESPONSE_STREAM_MAXLEN = 50000
+
+# TTL for finished response streams (24 hours)
+RESPONSE_STREAM_TTL = 3600 * 24
+
+# XREAD BLOCK timeout; stays below the Redis client's 5s socket timeout
+READ_BLOCK_MS = 2000
+READ_COUNT = 500
+
+# Entry ID that reads a stream from the beginning
+STREAM_START = "0"
+
+# ResponseWriter batching: flush after this many responses or this long
+FLUSH_MAX_BATCH = 64
+FLUSH_MAX_DELAY = 0.005
+# Buffered responses at which appends wait for Redis to catch up
+MAX_PENDING_RESPONSES = 2000
+
+CONTROL_SIGNALS = ("STOP", "END_STREAM", "ERROR")
+TERMINAL_STATUSES = ("completed", "failed", "stopped")
+
+_ENTRY_ID = re.compile(r"^\d+-\d+$")
+
+RESPONSE_FLUSH_SECONDS = Histogram(
+    'agent_run_response_flush_seconds',
+    'Time to write one batch of agent run responses to Redis',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+RESPONSE_BATCH_SIZE = Histogram(
+    'agent_run_response_batch_size',
+    'Agent run responses written per Redis batch',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+)
+
+
+class StreamEntry:
+    """One decoded stream entry: a response, or a control signal."""
+
+    __slots__ = ("id", "response", "control", "seq", "_sse")
+
+    def __init__(
+        self,
+        entry_id: str,
+        response: Optional[Dict[str, Any]],
+        control: Optional[str],
+        seq: Optional[int] = None
+    ):
+        self.id = entry_id
+        self.response = response
+        self.control = control
+        self.seq = seq
+        self._sse: Optional[str] = None
+
+    @property
+    def sort_key(self) -> Tuple[int, int]:
+        return entry_id_key(self.id)
+
+    @property
+    def is_final(self) -> bool:
+        """Whether readers should stop after this entry."""
+        if self.control:
+            return True
+        return (
+            self.response.get('type') == 'status'
+            and self.response.get('status') in TERMINAL_STATUSES
+        )
+
+    def to_sse(self) -> str:
+        """The entry as an SSE event, rendered once however many clients get it."""
+        if self._sse is None:
+            payload = {'type': 'status', 'status': self.control} if self.control else self.response
+            self._sse = f"id: {self.id}\ndata: {json.dumps(payload)}\n\n"
+        return self._sse
+
+
+def response_stream_key(agent_run_id: str) -> str:
+    return f"agent_run:{agent_run_id}:response_stream"
+
+
+def is_entry_id(value: Optional[str]) -> bool:
+    return bool(value and _ENTRY_ID.match(value))
+
+
+def entry_id_key(entry_id: str) -> Tuple[int, int]:
+    """Sortable form of a '<ms>-<seq>' entry ID."""
+    ms, _, seq = entry_id.partition('-')
+    return int(ms), int(seq or 0)
+
+
+def _entry(entry_id: str, fields: Dict[str, str]) -> StreamEntry:
+    seq = int(fields['seq']) if 'seq' in fields else None
+    if 'control' in fields:
+        return StreamEntry(entry_id, None, fields['control'], seq)
+    return StreamEntry(entry_id, json.loads(fields['data']), None, seq)
+
+
+async def append_response(agent_run_id: str, response: Dict[str, Any]) -> str:
+    """Append a response; returns its entry ID."""
+    return await redis.xadd(
+        response_stream_key(agent_run_id),
+        {'data': json.dumps(response)},
+        maxlen=RESPONSE_STREAM_MAXLEN
+    )
+
+
+async def append_control(agent_run_id: str, signal: str) -> str:
+    """Append a control signal that ends the stream for readers."""
+    return await redis.xadd(
+        response_stream_key(agent_run_id),
+        {'control': signal},
+        maxlen=RESPONSE_STREAM_MAXLEN
+    )
+
+
+class ResponseWriter:
+    """Writes one run's responses to its stream in ordered, pipelined batches.
+
+    append() only buffers; a single flusher task sends whatever has built up
+    after FLUSH_MAX_DELAY (or at once when FLUSH_MAX_BATCH responses are
+    waiting) as one MULTI/EXEC, so entries keep the order of their sequence
+    numbers. When Redis falls behind and MAX_PENDING_RESPONSES are buffered,
+    append() waits. A failed flush is raised from the next append() or close().
+    """
+
+    def __init__(
+        self,
+        agent_run_id: str,
+        max_batch: int = FLUSH_MAX_BATCH,
+        max_delay: float = FLUSH_MAX_DELAY,
+        max_pending: int = MAX_PENDING_RESPONSES
+    ):
+        self.agent_run_id = agent_run_id
+        self.key = response_stream_key(agent_run_id)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.stats = {"responses": 0, "batches": 0, "largest_batch": 0, "backpressure_waits": 0}
+        self._buffer: List[Dict[str, str]] = []
+        self._seq = 0
+        self._pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._closed = False
+        self._error: Optional[Exception] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def append(self, response: Dict[str, Any]):
+        await self._add({'data': json.dumps(response)})
+
+    async def append_control(self, signal: str):
+        await self._add({'control': signal})
+
+    async def _add(self, fields: Dict[str, str]):
+        if self._closed:
+            raise RuntimeError(f"Response writer for {self.agent_run_id} is closed")
+        while len(self._buffer) >= self.max_pending and self._error is None:
+            self.stats["backpressure_waits"] += 1
+            self._space.clear()
+            await self._space.wait()
+        if self._error is not None:
+            raise self._error
+
+        fields['seq'] = str(self._seq)
+        self._seq += 1
+        self._buffer.append(fields)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self._pending.set()
+        if len(self._buffer) >= self.max_batch:
+            self._full.set()
+
+    async def _run(self):
+        try:
+            while True:
+                await self._pending.wait()
+                if not self._buffer:
+                    if self._closed:
+                        return
+                    self._pending.clear()
+                    continue
+                if len(self._buffer) < self.max_batch and not self._closed:
+                    # Give chunks arriving within max_delay the same round trip
+                    try:
+                        await asyncio.wait_for(self._full.wait(), self.max_delay)
+                    except asyncio.TimeoutError:
+                        pass
+                batch, self._buffer = self._buffer, []
+                self._full.clear()
+                self._space.set()
+                await self._flush(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to write responses for agent run {self.agent_run_id}: {e}")
+            self._error = e
+            self._space.set()
+
+    async def _flush(self, batch: List[Dict[str, str]]):
+        started = time.monotonic()
+        client = await redis.get_client()
+        async with client.pipeline(transaction=True) as pipe:
+            for fields in batch:
+                pipe.xadd(self.key, fields, maxlen=RESPONSE_STREAM_MAXLEN, approximate=True)
+            await pipe.execute()
+        RESPONSE_FLUSH_SECONDS.observe(time.monotonic() - started)
+        RESPONSE_BATCH_SIZE.observe(len(batch))
+        self.stats["responses"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+
+    async def close(self):
+        """Flush everything appended so far and stop the flusher."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is not None:
+            self._pending.set()
+            self._full.set()
+            await self._task
+        logger.debug(f"Response writer for {self.agent_run_id} closed: {self.stats}")
+        if self._error is not None:
+            raise self._error
+
+
+async def read_responses(
+    agent_run_id: str,
+    after: str = STREAM_START,
+    block_ms: Optional[int] = None,
+    count: int = READ_COUNT
+) -> List[StreamEntry]:
+    """Entries after the given ID; waits up to block_ms for new ones if set."""
+    result = await redis.xread({response_stream_key(agent_run_id): after}, count=count, block=block_ms)
+    if not result:
+        return []
+    _, entries = result[0]
+    return [_entry(entry_id, fields) for entry_id, fields in entries]
+
+
+async def follow_responses(
+    agent_run_id: str,
+    after: str = STREAM_START,
+    block_ms: int = READ_BLOCK_MS
+) -> AsyncIterator[StreamEntry]:
+    """Yield entries after the given ID as they are appended, forever."""
+    while True:
+        for entry in await read_responses(agent_run_id, after, block_ms=block_ms):
+            after = entry.id
+            yield entry
+
+
+async def get_all_responses(agent_run_id: str) -> List[Dict[str, Any]]:
+    """Every response in the stream, without control entries."""
+    key = response_stream_key(agent_run_id)
+    responses = []
+    start = "-"
+    while True:
+        entries = await redis.xrange(key, min=start, count=READ_COUNT)
+        for entry_id, fields in entries:
+            entry = _entry(entry_id, fields)
+            if entry.response is not None:
+                responses.append(entry.response)
+        if len(entries) < READ_COUNT:
+            return responses
+        start = f"({entries[-1][0]}"
+
+
+async def expire_response_stream(agent_run_id: str):
+    """Set the TTL on a finished run's response stream."""
+    key = response_stream_key(agent_run_id)
+    try:
+        await redis.expire(key, RESPONSE_STREAM_TTL)
+        logger.debug(f"Set TTL ({RESPONSE_STREAM_TTL}s) on response stream: {key}")
+    except Exception as e:
+        logger.warning(f"Failed to set TTL on response stream {key}: {str(e)}")
@@ -0,0 +1,239 @@
+"""
+Agent run usage accounting for billing.
+
+Monthly agent minutes used to be recomputed on every billing check from all of
+an account's threads and this month's agent runs. This module keeps a running
+counter per account and month in Redis instead:
+- usage:{account_id}:{YYYY-MM} holds the seconds of finished runs
+- usage:{account_id}:{YYYY-MM}:running maps running agent runs to their start
+- usage_run:{agent_run_id} records which account and month a run is charged to
+Runs are recorded when they start and when their final status is written, and
+are charged to the month they started in, as before. Reads are one pipelined
+round trip, cached in-process for a few seconds. A missing counter (a new
+month, a Redis flush) is rebuilt from the database, and the reconciliation
+job rebuilds active counters periodically to correct drift.
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from services import redis
+from services.supabase import DBConnection
+from utils.logger import logger
+
+# Seconds a billing check may reuse an account's usage figure
+USAGE_CACHE_TTL = 15
+
+# Counters outlive their month so late run ends are still charged
+USAGE_KEY_TTL = 3600 * 24 * 40
+
+# Seconds between reconciliation passes; one API instance runs each pass
+RECONCILE_INTERVAL = 3600
+
+_RECONCILE_LOCK_KEY = "usage:reconcile_lock"
+
+# account_id -> (expires_at, minutes)
+_usage_cache: Dict[str, Tuple[float, float]] = {}
+
+
+def _month(ts: datetime) -> str:
+    return ts.strftime('%Y-%m')
+
+
+def _usage_key(account_id: str, month: str) -> str:
+    return f"usage:{account_id}:{month}"
+
+
+def _running_key(account_id: str, month: str) -> str:
+    return f"usage:{account_id}:{month}:running"
+
+
+def _run_key(agent_run_id: str) -> str:
+    return f"usage_run:{agent_run_id}"
+
+
+def _parse_timestamp(value: str) -> float:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def invalidate(account_id: Optional[str] = None):
+    """Drop cached usage for one account, or for every account."""
+    if account_id is None:
+        _usage_cache.clear()
+    else:
+        _usage_cache.pop(account_id, None)
+
+
+async def load_usage_from_db(client, account_id: str) -> Tuple[float, Dict[str, float]]:
+    """This month's usage from the database.
+
+    Returns the seconds of finished runs and the start timestamps of runs
+    that are still going, keyed by agent run ID.
+    """
+    now = datetime.now(timezone.utc)
+    start_of_month = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+
+    # First get all threads for this user
+    threads_result = await client.table('threads') \
+        .select('thread_id') \
+        .eq('account_id', account_id) \
+        .execute()
+
+    if not threads_result.data:
+        return 0.0, {}
+
+    thread_ids = [t['thread_id'] for t in threads_result.data]
+
+    # Then get all agent runs for these threads in current month
+    runs_result = await client.table('agent_runs') \
+        .select('id, started_at, completed_at') \
+        .in_('thread_id', thread_ids) \
+        .gte('started_at', start_of_month.isoformat()) \
+        .execute()
+
+    completed_seconds = 0.0
+    running: Dict[str, float] = {}
+    for run in runs_result.data or []:
+        start_time = _parse_timestamp(run['started_at'])
+        if run['completed_at']:
+            completed_seconds += _parse_timestamp(run['completed_at']) - start_time
+        else:
+            running[run['id']] = start_time
+    return completed_seconds, running
+
+
+def _minutes(completed_seconds: float, running: Dict[str, float], now: float) -> float:
+    return (completed_seconds + sum(now - started for started in running.values())) / 60
+
+
+async def record_run_start(account_id: str, agent_run_id: str, started_at: datetime):
+    """Start charging a run to its account."""
+    month = _month(started_at)
+    running_key = _running_key(account_id, month)
+    redis_client = await redis.get_client()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(running_key, agent_run_id, started_at.timestamp())
+        pipe.expire(running_key, USAGE_KEY_TTL)
+        pipe.set(
+            _run_key(agent_run_id),
+            json.dumps({"account_id": account_id, "month": month}),
+            ex=USAGE_KEY_TTL
+        )
+        await pipe.execute()
+    invalidate(account_id)
+
+
+async def record_run_end(agent_run_id: str, completed_at: datetime):
+    """Move a finished run's duration into its account's counter.
+
+    Safe to call more than once per run; only the first call is counted.
+    """
+    redis_client = await redis.get_client()
+    raw = await redis_client.get(_run_key(agent_run_id))
+    if not raw:
+        # Not recorded at start; the next reconciliation picks it up
+        return
+    run = json.loads(raw)
+    account_id, month = run['account_id'], run['month']
+    running_key = _running_key(account_id, month)
+
+    started_at = await redis_client.hget(running_key, agent_run_id)
+    if started_at is not None and await redis_client.hdel(running_key, agent_run_id):
+        usage_key = _usage_key(account_id, month)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hincrbyfloat(usage_key, 'seconds', max(completed_at.timestamp() - float(started_at), 0.0))
+            pipe.expire(usage_key, USAGE_KEY_TTL)
+            pipe.delete(_run_key(agent_run_id))
+            await pipe.execute()
+    invalidate(account_id)
+
+
+async def reconcile_usage(client, account_id: str) -> float:
+    """Rebuild an account's counter for this month from the database; returns minutes."""
+    completed_seconds, running = await load_usage_from_db(client, account_id)
+    month = _month(datetime.now(timezone.utc))
+    usage_key = _usage_key(account_id, month)
+    running_key = _running_key(account_id, month)
+
+    redis_client = await redis.get_client()
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(usage_key, 'seconds', completed_seconds)
+        pipe.expire(usage_key, USAGE_KEY_TTL)
+        pipe.delete(running_key)
+        if running:
+            pipe.hset(running_key, mapping=running)
+            pipe.expire(running_key, USAGE_KEY_TTL)
+            for agent_run_id in running:
+                pipe.set(
+                    _run_key(agent_run_id),
+                    json.dumps({"account_id": account_id, "month": month}),
+                    ex=USAGE_KEY_TTL
+                )
+        await pipe.execute()
+    invalidate(account_id)
+    return _minutes(completed_seconds, running, time.time())
+
+
+async def get_monthly_usage(client, account_id: str) -> float:
+    """Agent minutes used this month, from the running counter."""
+    cached = _usage_cache.get(account_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    month = _month(datetime.now(timezone.utc))
+    try:
+        redis_client = await redis.get_client()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hget(_usage_key(account_id, month), 'seconds')
+            pipe.hgetall(_running_key(account_id, month))
+            seconds, running = await pipe.execute()
+        if seconds is None:
+            logger.debug(f"No usage counter for account {account_id} in {month}, rebuilding from database")
+            minutes = await reconcile_usage(client, account_id)
+        else:
+            running = {run_id: float(started) for run_id, started in running.items()}
+            minutes = _minutes(float(seconds), running, time.time())
+    except Exception as e:
+        logger.warning(f"Usage counter unavailable for account {account_id}, computing from database: {e}")
+        completed_seconds, running = await load_usage_from_db(client, account_id)
+        minutes = _minutes(completed_seconds, running, time.time())
+
+    _usage_cache[account_id] = (time.monotonic() + USAGE_CACHE_TTL, minutes)
+    return minutes
+
+
+async def reconcile_active_accounts(client) -> int:
+    """Rebuild every counter of the current month; returns the number of accounts."""
+    month = _month(datetime.now(timezone.utc))
+    redis_client = await redis.get_client()
+    reconciled = 0
+    async for key in redis_client.scan_iter(match=f"usage:*:{month}", count=500):
+        account_id = key[len("usage:"):-len(f":{month}")]
+        try:
+            await reconcile_usage(client, account_id)
+            reconciled += 1
+        except Exception as e:
+            logger.error(f"Failed to reconcile usage for account {account_id}: {e}")
+    return reconciled
+
+
+async def run_reconciliation(db: Optional[DBConnection] = None, interval: int = RECONCILE_INTERVAL):
+    """Reconcile usage counters every interval seconds, on one instance at a time."""
+    db = db or DBConnection()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            redis_client = await redis.get_client()
+            if not await redis_client.set(_RECONCILE_LOCK_KEY, "1", nx=True, ex=max(interval - 60, 60)):
+                continue
+            client = await db.client
+            started = time.monotonic()
+            reconciled = await reconcile_active_accounts(client)
+            logger.info(f"Reconciled usage counters for {reconciled} accounts in {time.monotonic() - started:.1f}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Usage reconciliation failed: {e}", exc_info=True)
@@ -0,0 +1,28 @@
+-- Everything verify_thread_access needs in one round trip: the thread's
+-- account and project, whether the project is public and whether the user is
+-- a member of the thread's account. Returns NULL when the thread doesn't exist.
+CREATE OR REPLACE FUNCTION get_thread_access(p_thread_id UUID, p_user_id UUID)
+RETURNS JSONB
+SECURITY DEFINER
+STABLE
+LANGUAGE sql
+SET search_path = public
+AS $$
+    SELECT jsonb_build_object(
+        'account_id', t.account_id,
+        'project_id', t.project_id,
+        'is_public', COALESCE(p.is_public, FALSE),
+        'is_member', EXISTS (
+            SELECT 1 FROM basejump.account_user au
+            WHERE au.account_id = t.account_id
+            AND au.user_id = p_user_id
+        )
+    )
+    FROM threads t
+    LEFT JOIN projects p ON t.project_id = p.project_id
+    WHERE t.thread_id = p_thread_id;
+$$;
+
+-- Reveals account membership of any user, so only the backend may call it
+REVOKE EXECUTE ON FUNCTION get_thread_access(UUID, UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_thread_access(UUID, UUID) TO service_role;
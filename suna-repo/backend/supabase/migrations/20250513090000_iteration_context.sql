@@ -0,0 +1,56 @@
+-- Lookups of the latest message of a type in a thread
+CREATE INDEX IF NOT EXISTS idx_messages_thread_type_created_at ON messages(thread_id, type, created_at DESC);
+
+-- What run_agent needs at the start of an iteration, in one round trip: the
+-- type of the latest conversation message and the latest browser_state and
+-- image_context messages. Those temporary messages are consumed, so they are
+-- deleted in the same transaction. Nothing is deleted when the latest message
+-- is from the assistant, as the run stops there.
+CREATE OR REPLACE FUNCTION get_iteration_context(p_thread_id UUID)
+RETURNS JSONB
+SECURITY DEFINER
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+    latest_message_type TEXT;
+    browser_state JSONB;
+    image_context JSONB;
+BEGIN
+    SELECT m.type INTO latest_message_type
+    FROM messages m
+    WHERE m.thread_id = p_thread_id
+    AND m.type IN ('assistant', 'tool', 'user')
+    ORDER BY m.created_at DESC
+    LIMIT 1;
+
+    IF latest_message_type IS DISTINCT FROM 'assistant' THEN
+        DELETE FROM messages
+        WHERE message_id = (
+            SELECT m.message_id FROM messages m
+            WHERE m.thread_id = p_thread_id AND m.type = 'browser_state'
+            ORDER BY m.created_at DESC
+            LIMIT 1
+        )
+        RETURNING content INTO browser_state;
+
+        DELETE FROM messages
+        WHERE message_id = (
+            SELECT m.message_id FROM messages m
+            WHERE m.thread_id = p_thread_id AND m.type = 'image_context'
+            ORDER BY m.created_at DESC
+            LIMIT 1
+        )
+        RETURNING content INTO image_context;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'latest_message_type', latest_message_type,
+        'browser_state', browser_state,
+        'image_context', image_context
+    );
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION get_iteration_context(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_iteration_context(UUID) TO service_role;
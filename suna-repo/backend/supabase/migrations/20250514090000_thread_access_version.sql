@@ -0,0 +1,84 @@
+-- A counter bumped by every change that can grant or revoke thread access:
+-- account membership, a project's visibility or account, and a thread's
+-- project or account. The backend caches access decisions with the version
+-- they were made at and drops them once it sees a newer one.
+CREATE TABLE IF NOT EXISTS thread_access_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO thread_access_version (id, version) VALUES (TRUE, 0) ON CONFLICT (id) DO NOTHING;
+
+-- Only the backend reads it, through the functions below
+ALTER TABLE thread_access_version ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION bump_thread_access_version()
+RETURNS TRIGGER
+SECURITY DEFINER
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+    UPDATE thread_access_version SET version = version + 1 WHERE id;
+    RETURN NULL;
+END;
+$$;
+
+-- Statement-level, so a bulk change bumps the version once
+DROP TRIGGER IF EXISTS thread_access_version_account_user ON basejump.account_user;
+CREATE TRIGGER thread_access_version_account_user
+    AFTER INSERT OR UPDATE OR DELETE ON basejump.account_user
+    FOR EACH STATEMENT
+EXECUTE FUNCTION bump_thread_access_version();
+
+DROP TRIGGER IF EXISTS thread_access_version_projects ON projects;
+CREATE TRIGGER thread_access_version_projects
+    AFTER UPDATE OF is_public, account_id OR DELETE ON projects
+    FOR EACH STATEMENT
+EXECUTE FUNCTION bump_thread_access_version();
+
+DROP TRIGGER IF EXISTS thread_access_version_threads ON threads;
+CREATE TRIGGER thread_access_version_threads
+    AFTER UPDATE OF project_id, account_id OR DELETE ON threads
+    FOR EACH STATEMENT
+EXECUTE FUNCTION bump_thread_access_version();
+
+CREATE OR REPLACE FUNCTION get_thread_access_version()
+RETURNS BIGINT
+SECURITY DEFINER
+STABLE
+LANGUAGE sql
+SET search_path = public
+AS $$
+    SELECT version FROM thread_access_version WHERE id;
+$$;
+
+-- Same as before, plus the version the decision was read at
+CREATE OR REPLACE FUNCTION get_thread_access(p_thread_id UUID, p_user_id UUID)
+RETURNS JSONB
+SECURITY DEFINER
+STABLE
+LANGUAGE sql
+SET search_path = public
+AS $$
+    SELECT jsonb_build_object(
+        'account_id', t.account_id,
+        'project_id', t.project_id,
+        'is_public', COALESCE(p.is_public, FALSE),
+        'is_member', EXISTS (
+            SELECT 1 FROM basejump.account_user au
+            WHERE au.account_id = t.account_id
+            AND au.user_id = p_user_id
+        ),
+        'access_version', (SELECT v.version FROM thread_access_version v WHERE v.id)
+    )
+    FROM threads t
+    LEFT JOIN projects p ON t.project_id = p.project_id
+    WHERE t.thread_id = p_thread_id;
+$$;
+
+REVOKE EXECUTE ON FUNCTION bump_thread_access_version() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION get_thread_access_version() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_thread_access_version() TO service_role;
+REVOKE EXECUTE ON FUNCTION get_thread_access(UUID, UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_thread_access(UUID, UUID) TO service_role;
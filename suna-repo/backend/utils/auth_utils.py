@@ -1,14 +1,87 @@
 from fastapi import HTTPException, Request
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import jwt
 from jwt.exceptions import PyJWTError
 import os
+import time
+from utils.logger import logger
 
 # Get JWT secret from environment
 JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
 if not JWT_SECRET:
     raise ValueError("SUPABASE_JWT_SECRET environment variable is required")
 
+# Membership and sharing changes bump a version in the database
+# (get_thread_access_version). It is read at most this often, and cached
+# decisions made at an older version are dropped, so revoked access takes
+# effect within this many seconds
+THREAD_ACCESS_VERSION_POLL = 1
+# Seconds a thread access decision is reused at most. This bounds revocation
+# when the version can't be read
+THREAD_ACCESS_CACHE_TTL = 30
+# Denials and missing threads are kept for less time, so granted access
+# (a new member, a project made public) shows up quickly
+THREAD_ACCESS_DENIED_TTL = 5
+# A thread never moves to another account
+THREAD_ACCOUNT_CACHE_TTL = 300
+THREAD_ACCESS_CACHE_SIZE = 10000
+# Seconds to use the separate queries after the get_thread_access RPC failed
+THREAD_ACCESS_RPC_RETRY = 300
+
+# (user_id, thread_id) -> (expires_at, (status code, access version)); 200 means allowed
+_thread_access_cache: Dict[Tuple[str, str], Tuple[float, Tuple[int, int]]] = {}
+# thread_id -> (expires_at, account_id)
+_thread_account_cache: Dict[str, Tuple[float, str]] = {}
+_access_rpc_retry_at = 0.0
+_access_version = 0
+_access_version_checked_at = float('-inf')
+
+_ACCESS_DENIED_DETAILS = {
+    404: "Thread not found",
+    403: "Not authorized to access this thread",
+}
+
+def _cache_put(cache: Dict, key, value, ttl: float):
+    """Store a cache entry, making room by dropping expired then oldest entries."""
+    now = time.monotonic()
+    if len(cache) >= THREAD_ACCESS_CACHE_SIZE and key not in cache:
+        for expired in [k for k, (expires_at, _) in cache.items() if expires_at <= now]:
+            del cache[expired]
+        while len(cache) >= THREAD_ACCESS_CACHE_SIZE:
+            del cache[next(iter(cache))]
+    cache[key] = (now + ttl, value)
+
+def _cache_get(cache: Dict, key):
+    cached = cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+async def _current_access_version(client) -> int:
+    """
+    The database's thread access version, re-read at most every
+    THREAD_ACCESS_VERSION_POLL seconds.
+
+    Stays at its last value while get_thread_access_version is unavailable,
+    leaving THREAD_ACCESS_CACHE_TTL to bound cached decisions.
+    """
+    global _access_version, _access_version_checked_at
+    now = time.monotonic()
+    if now - _access_version_checked_at < THREAD_ACCESS_VERSION_POLL:
+        return _access_version
+
+    # Claim this poll before awaiting so concurrent requests don't repeat it
+    _access_version_checked_at = now
+    try:
+        result = await client.rpc('get_thread_access_version', {}).execute()
+        if result.data is not None:
+            _access_version = int(result.data)
+    except Exception as e:
+        logger.warning(f"get_thread_access_version RPC failed: {str(e)}")
+        # Not migrated yet or unavailable; back off like the access RPC
+        _access_version_checked_at = now + THREAD_ACCESS_RPC_RETRY
+    return _access_version
+
 # This function extracts the user ID from Supabase JWT
 async def get_current_user_id_from_jwt(request: Request) -> str:
     """
@@ -74,6 +147,10 @@ async def get_account_id_from_thread(client, thread_id: str) -> str:
     Raises:
         HTTPException: If the thread is not found or if there's an error
     """
+    account_id = _cache_get(_thread_account_cache, thread_id)
+    if account_id:
+        return account_id
+
     try:
         response = await client.table('threads').select('account_id').eq('thread_id', thread_id).execute()
         
@@ -91,6 +168,7 @@ async def get_account_id_from_thread(client, thread_id: str) -> str:
                 detail="Thread has no associated account"
             )
         
+        _cache_put(_thread_account_cache, thread_id, account_id, THREAD_ACCOUNT_CACHE_TTL)
         return account_id
     
     except Exception as e:
@@ -149,10 +227,60 @@ async def get_user_id_from_stream_auth(
         headers={"WWW-Authenticate": "Bearer"}
     )
 
+async def _fetch_thread_access(client, thread_id: str, user_id: str) -> Optional[Dict]:
+    """
+    Load the facts an access decision needs, in one round trip when possible.
+
+    Returns:
+        Optional[Dict]: account_id, project_id, is_public and is_member, or
+        None if the thread doesn't exist
+    """
+    global _access_rpc_retry_at
+    if time.monotonic() >= _access_rpc_retry_at:
+        try:
+            result = await client.rpc('get_thread_access', {
+                'p_thread_id': thread_id,
+                'p_user_id': user_id
+            }).execute()
+            return result.data or None
+        except Exception as e:
+            logger.warning(f"get_thread_access RPC failed, using separate queries: {str(e)}")
+            _access_rpc_retry_at = time.monotonic() + THREAD_ACCESS_RPC_RETRY
+
+    # Query the thread to get account information
+    thread_result = await client.table('threads').select('account_id,project_id').eq('thread_id', thread_id).execute()
+    if not thread_result.data or len(thread_result.data) == 0:
+        return None
+    
+    thread_data = thread_result.data[0]
+    access = {
+        'account_id': thread_data.get('account_id'),
+        'project_id': thread_data.get('project_id'),
+        'is_public': False,
+        'is_member': False
+    }
+    
+    # Check if project is public
+    if access['project_id']:
+        project_result = await client.table('projects').select('is_public').eq('project_id', access['project_id']).execute()
+        if project_result.data and len(project_result.data) > 0:
+            access['is_public'] = bool(project_result.data[0].get('is_public'))
+    
+    # When using service role, we need to manually check account membership instead of using current_user_account_role
+    if not access['is_public'] and access['account_id']:
+        account_user_result = await client.schema('basejump').from_('account_user').select('account_role').eq('user_id', user_id).eq('account_id', access['account_id']).execute()
+        access['is_member'] = bool(account_user_result.data)
+    return access
+
 async def verify_thread_access(client, thread_id: str, user_id: str):
     """
     Verify that a user has access to a specific thread based on account membership.
     
+    Decisions are cached per user and thread: grants for
+    THREAD_ACCESS_CACHE_TTL seconds, denials for THREAD_ACCESS_DENIED_TTL,
+    and either only until the database's access version moves past the one
+    they were made at.
+    
     Args:
         client: The Supabase client
         thread_id: The thread ID to check access for
@@ -164,29 +292,27 @@ async def verify_thread_access(client, thread_id: str, user_id: str):
     Raises:
         HTTPException: If the user doesn't have access to the thread
     """
-    # Query the thread to get account information
-    thread_result = await client.table('threads').select('*,project_id').eq('thread_id', thread_id).execute()
+    version = await _current_access_version(client)
+    cached = _cache_get(_thread_access_cache, (user_id, thread_id))
+    if cached is not None and cached[1] >= version:
+        status = cached[0]
+    else:
+        access = await _fetch_thread_access(client, thread_id, user_id)
+        if access is None:
+            status = 404
+        else:
+            if access.get('account_id'):
+                _cache_put(_thread_account_cache, thread_id, access['account_id'], THREAD_ACCOUNT_CACHE_TTL)
+            status = 200 if access.get('is_public') or access.get('is_member') else 403
+            # The RPC reports the version it read at; the separate queries
+            # read after the version polled above, so that one is safe
+            version = access.get('access_version') or version
+        ttl = THREAD_ACCESS_CACHE_TTL if status == 200 else THREAD_ACCESS_DENIED_TTL
+        _cache_put(_thread_access_cache, (user_id, thread_id), (status, version), ttl)
 
-    if not thread_result.data or len(thread_result.data) == 0:
-        raise HTTPException(status_code=404, detail="Thread not found")
-    
-    thread_data = thread_result.data[0]
-    
-    # Check if project is public
-    project_id = thread_data.get('project_id')
-    if project_id:
-        project_result = await client.table('projects').select('is_public').eq('project_id', project_id).execute()
-        if project_result.data and len(project_result.data) > 0:
-            if project_result.data[0].get('is_public'):
-                return True
-        
-    account_id = thread_data.get('account_id')
-    # When using service role, we need to manually check account membership instead of using current_user_account_role
-    if account_id:
-        account_user_result = await client.schema('basejump').from_('account_user').select('account_role').eq('user_id', user_id).eq('account_id', account_id).execute()
-        if account_user_result.data and len(account_user_result.data) > 0:
-            return True
-    raise HTTPException(status_code=403, detail="Not authorized to access this thread")
+    if status != 200:
+        raise HTTPException(status_code=status, detail=_ACCESS_DENIED_DETAILS[status])
+    return True
 
 async def get_optional_user_id(request: Request) -> Optional[str]:
     """
@@ -0,0 +1,132 @@
+"""
+Timing spans for agent runs.
+
+run_agent opens an iteration for every pass of its loop, and the code below it
+(ThreadManager, ResponseProcessor) records time into the current iteration
+with span(), without it being passed down:
+- db: Supabase round trips (iteration context, messages, inserts)
+- billing: the billing check
+- llm: the LLM call and waiting for its streamed chunks
+- tools: tool execution; tools started while streaming overlap llm time
+Each iteration is logged with its breakdown as structured fields of the log
+record, and the run's totals are logged when it ends.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, TypeVar
+
+from utils.logger import logger
+
+SPAN_NAMES = ('db', 'billing', 'llm', 'tools')
+
+T = TypeVar('T')
+
+_current_iteration: ContextVar[Optional["IterationSpans"]] = ContextVar('current_iteration', default=None)
+
+
+class IterationSpans:
+    """Time spent per span during one agent iteration."""
+
+    def __init__(self, thread_id: str, iteration: int):
+        self.thread_id = thread_id
+        self.iteration = iteration
+        self.seconds: Dict[str, float] = {name: 0.0 for name in SPAN_NAMES}
+        self.counts: Dict[str, int] = {name: 0 for name in SPAN_NAMES}
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def add(self, name: str, seconds: float):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+        if _current_iteration.get() is self:
+            _current_iteration.set(None)
+        logger.info(
+            f"Iteration {self.iteration} of thread {self.thread_id} took {self.duration:.2f}s: "
+            + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.seconds.items()),
+            extra={'thread_id': self.thread_id, 'extra': self.to_dict()}
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            'span': 'agent_iteration',
+            'iteration': self.iteration,
+            'duration': round(self.duration or 0.0, 4),
+            'seconds': {name: round(seconds, 4) for name, seconds in self.seconds.items()},
+            'counts': dict(self.counts),
+        }
+
+
+class RunSpans:
+    """The iterations of one agent run."""
+
+    def __init__(self, thread_id: str):
+        self.thread_id = thread_id
+        self.iterations: List[IterationSpans] = []
+        self.started = time.perf_counter()
+
+    def start_iteration(self) -> IterationSpans:
+        """End the current iteration, if any, and make a new one current."""
+        self._finish_current()
+        iteration = IterationSpans(self.thread_id, len(self.iterations) + 1)
+        self.iterations.append(iteration)
+        _current_iteration.set(iteration)
+        return iteration
+
+    def _finish_current(self):
+        if self.iterations and self.iterations[-1].duration is None:
+            self.iterations[-1].finish()
+
+    def finish(self):
+        """End the last iteration and log the totals of the run."""
+        self._finish_current()
+        duration = time.perf_counter() - self.started
+        seconds = {name: 0.0 for name in SPAN_NAMES}
+        counts = {name: 0 for name in SPAN_NAMES}
+        for iteration in self.iterations:
+            for name, value in iteration.seconds.items():
+                seconds[name] = seconds.get(name, 0.0) + value
+                counts[name] = counts.get(name, 0) + iteration.counts[name]
+        db_share = seconds['db'] / duration * 100 if duration else 0.0
+        logger.info(
+            f"Run of thread {self.thread_id}: {len(self.iterations)} iterations in {duration:.2f}s, "
+            f"db {seconds['db']:.2f}s ({db_share:.1f}%) over {counts['db']} calls, "
+            f"llm {seconds['llm']:.2f}s, tools {seconds['tools']:.2f}s",
+            extra={'thread_id': self.thread_id, 'extra': {
+                'span': 'agent_run',
+                'iterations': len(self.iterations),
+                'duration': round(duration, 4),
+                'seconds': {name: round(value, 4) for name, value in seconds.items()},
+                'counts': counts,
+            }}
+        )
+
+
+@contextmanager
+def span(name: str):
+    """Add the time spent in the block to the current iteration, if there is one."""
+    iteration = _current_iteration.get()
+    if iteration is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        iteration.add(name, time.perf_counter() - started)
+
+
+async def timed_iter(name: str, iterable: AsyncIterable[T]) -> AsyncIterator[T]:
+    """Yield from iterable, counting only the waits for its items towards a span."""
+    iterator = iterable.__aiter__()
+    while True:
+        with span(name):
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+        yield item
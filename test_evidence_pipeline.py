@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Evidence Pipeline Benchmark
+
+Compares the previous per-item relevance loop in BaseDomainAgent with the
+batched EvidenceBatch pipeline at 1k and 10k evidence items, and checks that
+both produce the same insights in the same order. The batch's term index is
+built once and timed separately from scoring each agent against it. Also
+checks that relevance masks match a plain substring check on edge cases
+(punctuation, phrases, repeated whitespace, non-ASCII text).
+"""
+
+import sys
+import time
+import random
+import asyncio
+
+sys.path.insert(0, 'deerflow_service')
+
+from domain_agents import (
+    FinancialAnalystAgent, TechnicalAnalystAgent, MarketAnalystAgent, RiskAnalystAgent, EvidenceBatch
+)
+from reasoning_engine import Evidence, EvidenceType
+
+WORDS = [
+    "market", "revenue", "growth", "latency", "deployment", "architecture", "weather",
+    "football", "recipe", "profit", "api", "database", "holiday", "music", "stock",
+    "investment", "kubernetes", "garden", "earnings", "scalability"
+]
+
+
+def make_evidence(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    evidence = []
+    for i in range(count):
+        length = rng.choice([20, 60, 250])
+        content = " ".join(rng.choice(WORDS) for _ in range(length))
+        if rng.random() < 0.3:
+            content = content.upper()
+        evidence.append(Evidence(
+            content=content,
+            source=f"source-{i}",
+            type=EvidenceType.EMPIRICAL,
+            credibility_score=rng.random(),
+            relevance_score=rng.random(),
+            timestamp="2026-01-01T00:00:00",
+            supporting_claims=[],
+            contradicting_claims=[]
+        ))
+    return evidence
+
+
+def legacy_is_relevant(agent, ev) -> bool:
+    """Relevance check as it was before the batched pipeline"""
+    all_keywords = []
+    for category_keywords in agent._keyword_categories.values():
+        all_keywords.extend(category_keywords)
+    if not all_keywords:
+        all_keywords = agent.specialized_keywords
+    return any(keyword in ev.content.lower() for keyword in all_keywords)
+
+
+async def legacy_pipeline(agent, evidence):
+    insights = []
+    for ev in evidence:
+        if legacy_is_relevant(agent, ev):
+            insight = await agent._generate_insight_async(ev)
+            if insight:
+                insights.append(insight)
+    return insights
+
+
+def comparable(insights):
+    return [(i["content"], i["source"], i["confidence"]) for i in insights]
+
+
+async def run_benchmark(size: int, agents) -> bool:
+    evidence = make_evidence(size)
+    ok = True
+
+    start = time.perf_counter()
+    legacy_results = [await legacy_pipeline(agent, evidence) for agent in agents]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = EvidenceBatch(evidence)
+    batched_results = await asyncio.gather(*(agent.process_evidence(batch) for agent in agents))
+    batched_time = time.perf_counter() - start
+
+    # Relevance alone, without insight generation
+    start = time.perf_counter()
+    legacy_masks = [[legacy_is_relevant(agent, ev) for ev in evidence] for agent in agents]
+    legacy_scoring = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = EvidenceBatch(evidence)
+    batch._build_index()
+    indexing = time.perf_counter() - start
+    start = time.perf_counter()
+    masks = [(agent.score_evidence_relevance(batch) > 0).tolist() for agent in agents]
+    batched_scoring = time.perf_counter() - start
+
+    for agent, legacy, batched, legacy_mask, mask in zip(agents, legacy_results, batched_results, legacy_masks, masks):
+        if comparable(legacy) != comparable(batched) or legacy_mask != mask:
+            print(f"❌ {agent.domain_name}: batched results differ from the legacy pipeline")
+            ok = False
+
+    print(f"📊 {size} evidence items x {len(agents)} agents")
+    print(f"   relevance scoring: legacy {legacy_scoring * 1000:.1f}ms, batched {(indexing + batched_scoring) * 1000:.1f}ms "
+          f"({legacy_scoring / max(indexing + batched_scoring, 1e-9):.1f}x)")
+    print(f"   of which: term index {indexing * 1000:.1f}ms once, "
+          f"{batched_scoring / len(agents) * 1000:.2f}ms per agent "
+          f"(legacy {legacy_scoring / len(agents) * 1000:.1f}ms per agent)")
+    print(f"   full pipeline:     legacy {legacy_time * 1000:.1f}ms, batched {batched_time * 1000:.1f}ms "
+          f"({legacy_time / max(batched_time, 1e-9):.1f}x)")
+    print(f"   insights: {[len(r) for r in batched_results]}")
+    return ok
+
+
+def check_mask_equivalence() -> bool:
+    texts = [
+        "Interest rates rose; the FED held.",
+        "interest  rate with two spaces",
+        "the interest rate, again",
+        "bank of\njapan across a newline",
+        "Thị trường chứng khoán (stock-market) tăng",
+        "moving-average crossover",
+        "",
+        "federal reserve",
+        "no match here",
+    ]
+    keyword_sets = [
+        ("fed", "interest rate", "bank of japan"),
+        ("stock", "market)", "chứng khoán"),
+        ("moving average", "crossover"),
+        ("Market", "rate,"),
+        ("nothing",),
+        ("japan", "bank of\njapan"),
+    ]
+    batch = EvidenceBatch([type("E", (), {"content": text})() for text in texts])
+    ok = True
+    for keywords in keyword_sets:
+        expected = [any(keyword in text.lower() for keyword in keywords) for text in texts]
+        if batch.relevance_mask(keywords).tolist() != expected:
+            print(f"❌ Mask for {keywords} differs from a substring check")
+            ok = False
+    return ok
+
+
+async def main():
+    agents = [FinancialAnalystAgent(), TechnicalAnalystAgent(), MarketAnalystAgent(), RiskAnalystAgent()]
+    print("🧪 Evidence pipeline benchmark")
+    results = [check_mask_equivalence()]
+    results += [await run_benchmark(size, agents) for size in (1000, 10000)]
+    if all(results):
+        print("✅ Batched pipeline matches legacy results")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
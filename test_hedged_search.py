@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Hedged Search Test
+
+Runs search_web against local stub providers with injected latency and
+failures, and checks that:
+- a fast primary answers without hedging
+- a slow primary is hedged once it passes its observed p95, and its
+  cancelled attempt still enters the latency window
+- a failing primary fails over immediately
+- hedge budgets cap backup traffic during a sustained brownout
+"""
+
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, 'deerflow_service')
+
+from aiohttp import web
+
+import server
+from hedging import HedgePolicy
+
+# Injected behaviour per provider: (latency seconds, HTTP status)
+behaviour = {
+    "intelligent": (0.01, 200),
+    "tavily": (0.01, 200),
+    "brave": (0.01, 200),
+}
+calls = {name: 0 for name in behaviour}
+
+
+def make_handler(name: str, payload):
+    async def handler(request):
+        calls[name] += 1
+        latency, status = behaviour[name]
+        await asyncio.sleep(latency)
+        if status != 200:
+            return web.json_response({"error": "injected"}, status=status)
+        return web.json_response(payload(name))
+    return handler
+
+
+def intelligent_payload(name):
+    return {"results": [{"title": "primary", "url": "https://primary.example/1", "content": "p"}],
+            "searchEnginesUsed": ["stub"]}
+
+
+def tavily_payload(name):
+    return {"results": [{"title": "tavily", "url": "https://tavily.example/1", "content": "t", "score": 0.9}]}
+
+
+def brave_payload(name):
+    return {"web": {"results": [{"title": "brave", "url": "https://brave.example/1", "description": "b"}]}}
+
+
+async def start_stubs():
+    app = web.Application()
+    app.router.add_post("/intelligent", make_handler("intelligent", intelligent_payload))
+    app.router.add_post("/tavily", make_handler("tavily", tavily_payload))
+    app.router.add_get("/brave", make_handler("brave", brave_payload))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    server.INTELLIGENT_SEARCH_URL = f"{base}/intelligent"
+    server.TAVILY_SEARCH_URL = f"{base}/tavily"
+    server.BRAVE_SEARCH_URL = f"{base}/brave"
+    server.TAVILY_API_KEY = "stub"
+    server.BRAVE_API_KEY = "stub"
+    return runner
+
+
+def reset(policy: HedgePolicy):
+    server.search_hedging = policy
+    server.resilience.guards.clear()
+    for name in calls:
+        calls[name] = 0
+
+
+async def timed_search():
+    start = time.perf_counter()
+    results = await server.search_web("hedging test", max_results=3)
+    return results, time.perf_counter() - start
+
+
+async def main():
+    runner = await start_stubs()
+    failures = []
+
+    def check(condition: bool, message: str):
+        print(("✅ " if condition else "❌ ") + message)
+        if not condition:
+            failures.append(message)
+
+    try:
+        print("🧪 Hedged search against local stub providers")
+
+        # 1. Fast primary: no hedging
+        reset(HedgePolicy(default_delay=0.5))
+        for _ in range(30):
+            results, _ = await timed_search()
+        check(results[0]["title"] == "primary" and calls["tavily"] == 0,
+              f"Fast primary answers alone (tavily calls: {calls['tavily']})")
+        learned = server.search_hedging.hedge_delay("intelligent_search")
+        print(f"   learned primary p95: {learned * 1000:.1f}ms")
+
+        # 2. Slow primary: hedge after the learned p95 instead of waiting it out
+        behaviour["intelligent"] = (2.0, 200)
+        results, elapsed = await timed_search()
+        check(results[0]["title"] == "tavily" and elapsed < 0.5,
+              f"Slow primary hedged to tavily in {elapsed * 1000:.0f}ms (primary takes 2000ms)")
+        censored = server.search_hedging.latencies["intelligent_search"][-1]
+        check(censored >= learned,
+              f"Cancelled primary recorded as a censored {censored * 1000:.0f}ms sample")
+
+        # 3. Failing primary: immediate failover, no hedge delay
+        behaviour["intelligent"] = (0.01, 503)
+        reset(HedgePolicy(default_delay=5.0))
+        results, elapsed = await timed_search()
+        check(results[0]["title"] == "tavily" and elapsed < 0.5,
+              f"Failing primary failed over in {elapsed * 1000:.0f}ms")
+
+        # 4. Sustained brownout: hedges to each backup stay within the budget
+        behaviour["intelligent"] = (0.3, 200)
+        reset(HedgePolicy(default_delay=0.02, budget_ratio=0.1, budget_burst=2.0))
+        requests = 40
+        for _ in range(requests):
+            await timed_search()
+        hedges = server.search_hedging.stats["hedges"]
+        allowed = 2 + 0.1 * requests
+        check(calls["tavily"] <= allowed,
+              f"Brownout: {hedges} hedges over {requests} requests, tavily calls {calls['tavily']} <= {allowed:.0f}")
+        print(f"   hedging stats: {server.search_hedging.get_stats()}")
+    finally:
+        await runner.cleanup()
+        session = server.http_session
+        if session and not session.closed:
+            await session.close()
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        return 1
+    print("\n🎉 Hedged search behaves as expected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Event Loop Monitor Test
+
+Blocks the event loop with time.sleep at different offsets within the
+heartbeat interval and checks that LoopMonitor:
+- flags every block just over the slow callback threshold
+- reports at least the time the loop was blocked, within one sample interval
+- captures the blocking call's stack
+- ignores blocks well under the threshold
+"""
+
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, 'deerflow_service')
+
+from loop_monitor import LoopMonitor
+
+THRESHOLD = 0.1
+INTERVAL = 0.1
+OFFSETS = (0.0, 0.02, 0.05, 0.08, 0.095)
+
+
+def block(seconds: float):
+    time.sleep(seconds)
+
+
+async def main():
+    failures = []
+
+    def check(condition: bool, message: str):
+        print(("✅ " if condition else "❌ ") + message)
+        if not condition:
+            failures.append(message)
+
+    print("🧪 Loop monitor stall detection")
+    monitor = LoopMonitor(interval=INTERVAL, slow_callback_threshold=THRESHOLD)
+    await monitor.start()
+    try:
+        blocked = THRESHOLD * 1.1
+        for offset in OFFSETS:
+            await asyncio.sleep(INTERVAL * 3 + offset)
+            block(blocked)
+        await asyncio.sleep(INTERVAL * 3)
+
+        durations = [stall.duration for stall in monitor.recent_stalls]
+        check(monitor.stall_count == len(OFFSETS),
+              f"{len(OFFSETS)} blocks of {blocked * 1000:.0f}ms detected at every offset: {monitor.stall_count}")
+        check(all(blocked <= d <= blocked + monitor.sample_interval + 0.02 for d in durations),
+              "Reported durations: " + ", ".join(f"{d * 1000:.0f}ms" for d in durations))
+        check(all(any("in block" in frame for frame in stall.stack) for stall in monitor.recent_stalls),
+              "Stack of the blocking call captured")
+
+        before = monitor.stall_count
+        for offset in OFFSETS:
+            await asyncio.sleep(INTERVAL * 3 + offset)
+            block(THRESHOLD / 3)
+        await asyncio.sleep(INTERVAL * 3)
+        check(monitor.stall_count == before, f"Blocks of {THRESHOLD / 3 * 1000:.0f}ms are not reported")
+    finally:
+        await monitor.stop()
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        return 1
+    print("\n🎉 Loop monitor behaves as expected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Metrics Exposition Test
+
+Starts the DeerFlow app in-process, drives the domain analysis and tool result
+caches, and checks that /metrics reports their hit ratios:
+- cache_hit_ratio is emitted for both caches when a scraper asks for text
+- the ratios reflect the lookups made against caches created after startup
+Then renders a collector directly and checks that a scrape does not redo work:
+- local sketches are rendered without serializing them
+- gauge callbacks are read at most once per READINGS_MAX_AGE
+- other workers' snapshot files are parsed only when they change, and merged
+  without touching the local sketches
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+sys.path.insert(0, 'deerflow_service')
+
+from fastapi.testclient import TestClient
+
+import server
+import openmetrics
+from domain_agents import CachedAnalysisManager
+from enhanced_tools import CacheManager
+from metrics import MetricsCollector
+from quantile_sketch import LogHistogram
+
+failures = []
+
+
+def check(condition: bool, message: str):
+    print(f"{'✅' if condition else '❌'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+async def drive_caches(analysis_cache: CachedAnalysisManager, tool_cache: CacheManager):
+    async def compute():
+        return {"answer": 42}
+
+    # One miss then one hit per cache
+    await analysis_cache.get_or_compute("query", compute)
+    await analysis_cache.get_or_compute("query", compute)
+    await tool_cache.get("financial:AAPL")
+    await tool_cache.set("financial:AAPL", {"price": 1.0})
+    await tool_cache.get("financial:AAPL")
+    await tool_cache.close()
+
+
+def sample(body: str, name: str, cache: str) -> float:
+    prefix = f'{name}{{cache="{cache}"}} '
+    for line in body.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return float("nan")
+
+
+def check_scrape_reuse():
+    print("\n📊 Testing per-scrape work")
+    collector = MetricsCollector()
+    for duration in (0.1, 0.2, 0.3):
+        collector.record_operation_time("search", duration)
+    callback_calls = []
+    collector.register_gauge_callback("queue_depth", lambda: callback_calls.append(1) or {"interactive": 2})
+
+    serialized = []
+    real_to_dict, real_from_dict = LogHistogram.to_dict, LogHistogram.from_dict
+    LogHistogram.to_dict = lambda self: serialized.append("to") or real_to_dict(self)
+    LogHistogram.from_dict = classmethod(lambda cls, data: serialized.append("from") or real_from_dict.__func__(cls, data))
+    try:
+        body = openmetrics.render_collector(collector)
+        openmetrics.render_collector(collector)
+        check(not serialized, f"Single-process scrapes serialize no sketches: {len(serialized)} conversions")
+        check(len(callback_calls) == 1, f"Back-to-back scrapes read gauge callbacks once: {len(callback_calls)}")
+        check('deerflow_operation_duration_seconds_count{operation="search"} 3' in body, "Local sketch rendered")
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = openmetrics.MultiprocessSnapshotStore(directory)
+            other = MetricsCollector()
+            other.record_operation_time("search", 0.4)
+            # The parent process stands in for another live worker
+            store.write({**openmetrics.collector_snapshot(other), "pid": os.getppid()})
+            serialized.clear()
+
+            body = openmetrics.render_collector(collector, store)
+            openmetrics.render_collector(collector, store)
+            check(store.stats == {"reads": 1, "reused": 1} and serialized.count("from") == 1,
+                  f"Unchanged worker snapshot parsed once across scrapes: {store.stats}")
+            check('deerflow_operation_duration_seconds_count{operation="search"} 4' in body,
+                  "Other worker's sketch merged into the local one")
+            check(collector.operation_times["search"].count == 3 and "to" not in serialized,
+                  "Local sketch left untouched by the merge")
+
+            other.record_operation_time("search", 0.5)
+            other.counters["scrapes_seen"] += 1
+            store.write({**openmetrics.collector_snapshot(other), "pid": os.getppid()})
+            body = openmetrics.render_collector(collector, store)
+            check(store.stats["reads"] == 2 and 'deerflow_operation_duration_seconds_count{operation="search"} 5' in body,
+                  f"Changed worker snapshot re-read: {store.stats}")
+    finally:
+        LogHistogram.to_dict, LogHistogram.from_dict = real_to_dict, real_from_dict
+
+
+def main() -> int:
+    print("📊 Testing cache metrics on /metrics")
+    analysis_cache = CachedAnalysisManager()
+    tool_cache = CacheManager({"ttl": 60})
+
+    with TestClient(server.app) as client:
+        asyncio.run(drive_caches(analysis_cache, tool_cache))
+
+        body = client.get("/metrics", headers={"Accept": "application/openmetrics-text"}).text
+        check("cache_hit_ratio" in body, "/metrics output contains cache_hit_ratio")
+        check(sample(body, "deerflow_cache_hit_ratio", "domain_analysis") == 0.5,
+              f"domain_analysis hit ratio {sample(body, 'deerflow_cache_hit_ratio', 'domain_analysis')}")
+        check(sample(body, "deerflow_cache_hit_ratio", "tool_results") == 0.5,
+              f"tool_results hit ratio {sample(body, 'deerflow_cache_hit_ratio', 'tool_results')}")
+
+    check_scrape_reuse()
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        return 1
+    print("\n🎉 Cache hit ratios are exposed and scrapes reuse prior work")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Request Deadline Test
+
+Checks that request deadlines reach the work they bound:
+- a domain analysis that runs out of time is not cached, so the next call
+  recomputes instead of serving the partial result
+- POST /research stops at its timeout, caps outbound search timeouts by the
+  time left, and reports the deadline
+"""
+
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, 'deerflow_service')
+
+from fastapi.testclient import TestClient
+
+import server
+from deadline import Deadline, remaining_timeout
+from domain_agents import DomainAgentOrchestrator
+
+failures = []
+
+
+def check(condition: bool, message: str):
+    print(f"{'✅' if condition else '❌'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+async def check_orchestrator_cache():
+    print("🧪 Domain analysis after a deadline")
+    orchestrator = DomainAgentOrchestrator()
+    calls = []
+
+    async def analysis(query, evidence=None):
+        calls.append(query)
+        if len(calls) == 1:
+            # Outlives the caller's deadline; the shielded computation finishes later
+            await asyncio.sleep(0.3)
+        return {"complete": True, "analysis": f"run {len(calls)}", "metadata": {}}
+
+    orchestrator._perform_domain_analysis = analysis
+
+    first = await orchestrator.process_with_domain_expertise("AAPL outlook", deadline=Deadline(0.1))
+    check(first.get("complete") is False and first["deadline"]["exhausted_by"] == "domain_orchestration",
+          f"First call times out: complete={first.get('complete')}")
+
+    # Let the orphaned computation finish; it must not land in the cache
+    await asyncio.sleep(0.4)
+    second = await orchestrator.process_with_domain_expertise("AAPL outlook", deadline=Deadline(5))
+    check(len(calls) == 2, f"Second call recomputes: {len(calls)} computations")
+    check(second.get("analysis") == "run 2" and second["metadata"]["cache_used"] is False,
+          f"Second call returns its own complete result: {second.get('analysis')}")
+
+    third = await orchestrator.process_with_domain_expertise("AAPL outlook", deadline=Deadline(5))
+    check(len(calls) == 2 and third["metadata"]["cache_used"] is True, "Complete result is cached")
+
+    async def partial():
+        return {"complete": False}
+
+    cache = orchestrator.cache_manager
+    await cache.get_or_compute("partial", partial)
+    await cache.get_or_compute("partial", partial)
+    check(cache.get_stats()["misses"] >= 2 and cache.get_stats()["rejected"] >= 2,
+          "get_or_compute never stores results marked complete=False")
+
+
+def check_research_route():
+    print("\n🧪 POST /research under a deadline")
+    seen_timeouts = []
+    real_search_web = server.search_web
+
+    async def slow_search(query, max_results=5):
+        seen_timeouts.append(remaining_timeout(30))
+        await asyncio.sleep(0.2)
+        return []
+
+    server.search_web = slow_search
+    try:
+        with TestClient(server.app) as client:
+            started = time.perf_counter()
+            body = client.post("/research", json={"research_question": "solar panel efficiency", "timeout": 0.5}).json()
+            elapsed = time.perf_counter() - started
+    finally:
+        server.search_web = real_search_web
+
+    check(body["status"]["status"] == "timeout" and elapsed < 1.5,
+          f"Research stops at its 0.5s timeout: {body['status']['status']} after {elapsed:.2f}s")
+    check(bool(seen_timeouts) and max(seen_timeouts) <= 0.5,
+          f"Search HTTP timeouts capped by the deadline: {[round(t, 2) for t in seen_timeouts]}")
+    check(body.get("deadline", {}).get("exhausted_by") == "deep_research",
+          f"Response reports the stage that used the budget: {body.get('deadline', {}).get('exhausted_by')}")
+
+
+def main() -> int:
+    asyncio.run(check_orchestrator_cache())
+    check_research_route()
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        return 1
+    print("\n🎉 Request deadlines are enforced")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Agent Run Response Stream Load Test
+
+Needs a local Redis (REDIS_HOST / REDIS_PORT, default localhost:6379).
+
+One simulated agent run streams responses while 1,000 concurrent readers
+follow it, through:
+- services.response_hub: one XREAD BLOCK loop for the run in this process,
+  fanned out to every reader (what /agent-run/{id}/stream uses)
+- services.response_stream: XADD by the run, XREAD BLOCK from the last entry
+  ID by each reader (one connection per reader)
+- the previous response list: RPUSH + PUBLISH "new" by the run, two pub/sub
+  subscriptions per reader and LRANGE from the reader's index on every
+  notification
+Checks that every reader gets every response in order and reports delivery
+latency, duration and Redis client connections for both.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import uuid
+
+os.environ.setdefault('REDIS_HOST', 'localhost')
+os.environ.setdefault('REDIS_PORT', '6379')
+sys.path.insert(0, 'suna-repo/backend')
+
+from services import redis
+from services import response_stream
+from services.response_hub import hub
+
+READERS = int(os.getenv('STREAM_LOAD_READERS', '1000'))
+RESPONSES = int(os.getenv('STREAM_LOAD_RESPONSES', '200'))
+RESPONSE_INTERVAL = 0.005  # Seconds between streamed chunks
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def sample_connections(peak, stop):
+    """Track the peak number of Redis client connections"""
+    client = await redis.get_client()
+    while not stop.is_set():
+        try:
+            info = await client.info('clients')
+            peak[0] = max(peak[0], int(info.get('connected_clients', 0)))
+        except Exception:
+            return
+        await asyncio.sleep(0.2)
+
+
+def chunk(i):
+    return {"type": "assistant", "content": json.dumps({"content": f"chunk {i} " + "x" * 80}),
+            "sequence": i, "sent_at": time.perf_counter()}
+
+
+# Redis Streams
+
+async def streams_writer(run_id):
+    for i in range(RESPONSES):
+        await response_stream.append_response(run_id, chunk(i))
+        await asyncio.sleep(RESPONSE_INTERVAL)
+    await response_stream.append_response(run_id, {"type": "status", "status": "completed"})
+    await response_stream.append_control(run_id, "END_STREAM")
+
+
+async def streams_reader(run_id, latencies):
+    sequences = []
+    async for entry in response_stream.follow_responses(run_id):
+        if entry.is_final:
+            break
+        latencies.append(time.perf_counter() - entry.response["sent_at"])
+        sequences.append(entry.response["sequence"])
+    return sequences
+
+
+async def hub_reader(run_id, latencies):
+    sequences = []
+    subscription = await hub.subscribe(run_id)
+    try:
+        for entry in subscription.replay():
+            if entry.is_final:
+                return sequences
+            latencies.append(time.perf_counter() - entry.response["sent_at"])
+            sequences.append(entry.response["sequence"])
+        async for entry in subscription:
+            if entry.is_final:
+                break
+            latencies.append(time.perf_counter() - entry.response["sent_at"])
+            sequences.append(entry.response["sequence"])
+    finally:
+        subscription.close()
+    return sequences
+
+
+# Previous list + pub/sub log
+
+async def list_writer(run_id):
+    key, channel = f"load:{run_id}:responses", f"load:{run_id}:new_response"
+    for i in range(RESPONSES):
+        await redis.rpush(key, json.dumps(chunk(i)))
+        await redis.publish(channel, "new")
+        await asyncio.sleep(RESPONSE_INTERVAL)
+    await redis.rpush(key, json.dumps({"type": "status", "status": "completed"}))
+    await redis.publish(channel, "new")
+    await redis.publish(f"load:{run_id}:control", "END_STREAM")
+
+
+async def list_reader(run_id, latencies, subscribed):
+    key, channel = f"load:{run_id}:responses", f"load:{run_id}:new_response"
+    pubsub_response = await redis.create_pubsub()
+    pubsub_control = await redis.create_pubsub()
+    await pubsub_response.subscribe(channel)
+    await pubsub_control.subscribe(f"load:{run_id}:control")
+    subscribed.release()
+    sequences = []
+    try:
+        while True:
+            message = await pubsub_response.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if not message:
+                continue
+            for raw in await redis.lrange(key, len(sequences), -1):
+                response = json.loads(raw)
+                if response.get("type") == "status":
+                    return sequences
+                latencies.append(time.perf_counter() - response["sent_at"])
+                sequences.append(response["sequence"])
+    finally:
+        await pubsub_response.aclose()
+        await pubsub_control.aclose()
+
+
+async def start_hub_readers(run_id, latencies):
+    return [asyncio.create_task(hub_reader(run_id, latencies)) for _ in range(READERS)]
+
+
+async def start_stream_readers(run_id, latencies):
+    return [asyncio.create_task(streams_reader(run_id, latencies)) for _ in range(READERS)]
+
+
+async def start_list_readers(run_id, latencies):
+    subscribed = asyncio.Semaphore(0)
+    readers = [asyncio.create_task(list_reader(run_id, latencies, subscribed)) for _ in range(READERS)]
+    # Pub/sub drops notifications sent before a reader subscribes
+    for _ in range(READERS):
+        await subscribed.acquire()
+    return readers
+
+
+async def run_mode(name, writer, start_readers, run_id):
+    latencies = []
+    peak, stop = [0], asyncio.Event()
+    sampler = asyncio.create_task(sample_connections(peak, stop))
+    start = time.perf_counter()
+    readers = await start_readers(run_id, latencies)
+    await writer(run_id)
+    results = await asyncio.wait_for(asyncio.gather(*readers), timeout=300)
+    duration = time.perf_counter() - start
+    stop.set()
+    await sampler
+
+    complete = all(seq == list(range(RESPONSES)) for seq in results)
+    print(f"{'✅' if complete else '❌'} {name}: {len(results)} readers x {RESPONSES} responses in {duration:.2f}s")
+    print(f"   delivery latency p50 {percentile(latencies, 0.5) * 1000:7.1f}ms  "
+          f"p95 {percentile(latencies, 0.95) * 1000:7.1f}ms  p99 {percentile(latencies, 0.99) * 1000:7.1f}ms")
+    print(f"   peak Redis client connections: {peak[0]}")
+    return complete
+
+
+async def main():
+    await redis.initialize_async()
+    client = await redis.get_client()
+    print(f"🧪 Response stream load test: {READERS} readers, {RESPONSES} responses per run")
+
+    hub_run = f"load-{uuid.uuid4().hex[:8]}"
+    stream_run = f"load-{uuid.uuid4().hex[:8]}"
+    list_run = f"load-{uuid.uuid4().hex[:8]}"
+    failures = 0
+    try:
+        failures += not await run_mode("Response hub (one stream reader)", streams_writer, start_hub_readers, hub_run)
+        print(f"   hub stats: {hub.get_stats()}")
+        failures += not await run_mode("Redis Streams, reader per client", streams_writer, start_stream_readers, stream_run)
+        failures += not await run_mode("List + pub/sub (previous)", list_writer, start_list_readers, list_run)
+    finally:
+        await hub.close()
+        await client.delete(
+            response_stream.response_stream_key(hub_run),
+            response_stream.response_stream_key(stream_run),
+            f"load:{list_run}:responses"
+        )
+        await redis.close()
+
+    if failures:
+        print(f"\n❌ {failures} check(s) failed")
+        return 1
+    print("\n🎉 Every reader received every response in order")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
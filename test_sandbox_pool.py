@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Sandbox Pool Test and Benchmark
+
+Checks that CodeExecutionTool runs snippets in pooled worker processes:
+- results match the old in-process sandbox
+- CPU-heavy code times out without stalling the event loop
+- memory and result-size caps are enforced and the worker is replaced
+- timeouts include waiting for a worker, failed replacements are retried,
+  and a pool without workers fails fast
+Then measures executions per second for warm pooled workers against
+spawning a fresh interpreter per snippet and the old in-process exec.
+"""
+
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, 'deerflow_service')
+
+from enhanced_tools import CodeExecutionTool
+from sandbox_pool import SandboxError, SandboxPool, run_snippet
+
+SNIPPET = "values = [math.sqrt(i) for i in range(200)]\nresult = {'total': round(sum(values), 3), 'n': len(values)}"
+BENCH_RUNS = 200
+
+
+async def loop_lag_during(coro):
+    """Run coro while a ticker measures the worst event loop stall"""
+    worst = 0.0
+    stop = False
+
+    async def ticker():
+        nonlocal worst
+        while not stop:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            worst = max(worst, time.perf_counter() - start - 0.01)
+
+    task = asyncio.create_task(ticker())
+    try:
+        return await coro, worst
+    finally:
+        stop = True
+        await task
+
+
+async def main():
+    failures = []
+
+    def check(condition: bool, message: str):
+        print(("✅ " if condition else "❌ ") + message)
+        if not condition:
+            failures.append(message)
+
+    print("🧪 Sandbox pool behaviour")
+    tool = CodeExecutionTool({
+        "allowed_modules": ["math", "statistics", "json"],
+        "timeout": 2,
+        "workers": 2,
+        "memory_limit_mb": 128,
+        "max_result_bytes": 64 * 1024
+    })
+    try:
+        result = await tool.execute(code=SNIPPET, context={})
+        expected = run_snippet(SNIPPET, {}, ["math"])
+        check(result.success and result.data == expected, f"Pooled result matches in-process result: {result.data}")
+
+        result = await tool.execute(code="x * 2", context={"x": 21})
+        check(result.success and result.data == 42, "Context variables and last expression")
+
+        result, lag = await loop_lag_during(tool.execute(code="while True:\n    pass", context={}))
+        check(not result.success and lag < 0.2,
+              f"CPU hog stopped ({result.error}); worst loop stall {lag * 1000:.0f}ms")
+
+        result = await tool.execute(code="result = 'x' * (512 * 1024 * 1024)", context={})
+        check(not result.success and "Memory" in (result.error or ""), f"Memory cap: {result.error}")
+
+        result = await tool.execute(code="result = 'y' * 200000", context={})
+        check(not result.success and "byte limit" in (result.error or ""), f"Result size cap: {result.error}")
+
+        result = await tool.execute(code="1 + 1", context={})
+        check(result.success and result.data == 2, "Pool keeps serving after failures")
+        print(f"   pool stats: {tool.pool.get_stats()}")
+    finally:
+        await tool.close()
+
+    print("\n🧪 Replacement workers that fail to start")
+    pool = SandboxPool(size=1)
+    await pool.start()
+    real_spawn = pool._spawn
+    spawn_failures = 2
+
+    async def flaky_spawn():
+        nonlocal spawn_failures
+        if spawn_failures:
+            spawn_failures -= 1
+            raise OSError("injected spawn failure")
+        return await real_spawn()
+
+    pool._spawn = flaky_spawn
+    try:
+        check(await pool.execute("1 + 1", timeout=5) == 2, "Worker runs before its replacement fails")
+        pool._replace(pool._idle.get_nowait())
+        started = time.perf_counter()
+        value = await pool.execute("2 + 2", timeout=10)
+        check(value == 4, f"Replacement retried with backoff after 2 failures ({time.perf_counter() - started:.1f}s)")
+
+        busy = asyncio.create_task(pool.execute("sum(range(10 ** 8))", timeout=10))
+        await asyncio.sleep(0.1)
+        started = time.perf_counter()
+        try:
+            await pool.execute("1", timeout=0.5)
+            check(False, "Waiting for a busy worker should time out")
+        except asyncio.TimeoutError:
+            check(time.perf_counter() - started < 1, "Timeout covers waiting for a free worker")
+        await busy
+
+        spawn_failures = 100
+        pool._replace(pool._idle.get_nowait())
+        for task in list(pool._pending_spawns):
+            task.cancel()
+        await asyncio.sleep(0)
+        started = time.perf_counter()
+        try:
+            await pool.execute("3 + 3", timeout=5)
+            check(False, "Execute without workers should fail")
+        except SandboxError as e:
+            check(time.perf_counter() - started < 1, f"No live workers raises SandboxError at once: {e}")
+    finally:
+        pool._spawn = real_spawn
+        await pool.close()
+
+    print("\n📊 Executions per second")
+    pool = SandboxPool(size=4)
+    await pool.start()
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(pool.execute(SNIPPET, {}, ["math"]) for _ in range(BENCH_RUNS)))
+        pooled = BENCH_RUNS / (time.perf_counter() - start)
+    finally:
+        await pool.close()
+
+    cold_runs = 20
+    start = time.perf_counter()
+    for _ in range(cold_runs):
+        fresh = SandboxPool(size=1)
+        await fresh.execute(SNIPPET, {}, ["math"])
+        await fresh.close()
+    cold = cold_runs / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(BENCH_RUNS):
+        run_snippet(SNIPPET, {}, ["math"])
+    in_process = BENCH_RUNS / (time.perf_counter() - start)
+
+    print(f"   warm pool (4 workers):      {pooled:8.0f} exec/s")
+    print(f"   fresh process per snippet:  {cold:8.0f} exec/s")
+    print(f"   in-process exec (old, unsafe): {in_process:5.0f} exec/s")
+    check(pooled > cold * 3, f"Warm reuse is {pooled / cold:.1f}x faster than a fresh process per snippet")
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        return 1
+    print("\n🎉 Sandbox pool behaves as expected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Thread Access Cache Test
+
+Drives utils.auth_utils.verify_thread_access against an in-memory stand-in for
+the get_thread_access and get_thread_access_version RPCs, whose version moves
+on every membership or sharing change like the database triggers, and checks:
+- repeated checks within the cache lifetime make no access RPC
+- removing a member revokes access as soon as the version is next polled,
+  well within THREAD_ACCESS_CACHE_TTL
+- making a project private revokes access for non-members the same way
+- without the version RPC, decisions fall back to the TTL
+"""
+
+import os
+import sys
+import time
+import types
+import asyncio
+
+os.environ.setdefault("SUPABASE_JWT_SECRET", "test-secret")
+sys.path.insert(0, 'suna-repo/backend')
+
+from fastapi import HTTPException
+
+from utils import auth_utils
+
+failures = []
+
+
+def check(condition: bool, message: str):
+    print(f"{'✅' if condition else '❌'} {message}")
+    if not condition:
+        failures.append(message)
+
+
+class FakeAccessDB:
+    """Threads, projects and memberships; every change bumps the version like the triggers"""
+
+    def __init__(self, version_rpc: bool = True):
+        self.version_rpc = version_rpc
+        self.version = 0
+        self.members = {("acct", "alice"), ("acct", "bob")}
+        self.public = False
+        self.calls = {"get_thread_access": 0, "get_thread_access_version": 0}
+
+    def remove_member(self, user_id: str):
+        self.members.discard(("acct", user_id))
+        self.version += 1
+
+    def set_public(self, public: bool):
+        self.public = public
+        self.version += 1
+
+    def rpc(self, name: str, params: dict):
+        self.calls[name] += 1
+
+        async def execute():
+            if name == "get_thread_access_version":
+                if not self.version_rpc:
+                    raise RuntimeError("function get_thread_access_version() does not exist")
+                return types.SimpleNamespace(data=self.version)
+            access = {
+                "account_id": "acct",
+                "project_id": "proj",
+                "is_public": self.public,
+                "is_member": ("acct", params["p_user_id"]) in self.members,
+            }
+            if self.version_rpc:
+                access["access_version"] = self.version
+            return types.SimpleNamespace(data=access)
+
+        return types.SimpleNamespace(execute=execute)
+
+
+def reset_cache():
+    auth_utils._thread_access_cache.clear()
+    auth_utils._thread_account_cache.clear()
+    auth_utils._access_version = 0
+    auth_utils._access_version_checked_at = float('-inf')
+
+
+async def allowed(db: FakeAccessDB, user_id: str) -> bool:
+    try:
+        return await auth_utils.verify_thread_access(db, "thread", user_id)
+    except HTTPException as e:
+        return e.status_code == 200
+
+
+async def wait_for_revocation(db: FakeAccessDB, user_id: str, limit: float) -> float:
+    started = time.monotonic()
+    while time.monotonic() - started < limit:
+        if not await allowed(db, user_id):
+            return time.monotonic() - started
+        await asyncio.sleep(0.05)
+    return float("inf")
+
+
+async def main() -> int:
+    auth_utils.THREAD_ACCESS_VERSION_POLL = 0.2
+    auth_utils.THREAD_ACCESS_CACHE_TTL = 3
+
+    print("🧪 Revocation through the access version")
+    reset_cache()
+    db = FakeAccessDB()
+    check(await allowed(db, "alice") and await allowed(db, "bob"), "Members are allowed")
+    before = db.calls["get_thread_access"]
+    for _ in range(20):
+        await allowed(db, "alice")
+    check(db.calls["get_thread_access"] == before, "Repeated checks are served from the cache")
+
+    db.remove_member("alice")
+    took = await wait_for_revocation(db, "alice", auth_utils.THREAD_ACCESS_CACHE_TTL)
+    check(took <= auth_utils.THREAD_ACCESS_VERSION_POLL + 0.1,
+          f"Removed member loses access after {took:.2f}s (poll {auth_utils.THREAD_ACCESS_VERSION_POLL}s)")
+    check(await allowed(db, "bob"), "Other member keeps access")
+
+    db.set_public(True)
+    await asyncio.sleep(auth_utils.THREAD_ACCESS_VERSION_POLL)
+    check(await allowed(db, "carol"), "Non-member allowed once the project is public")
+    db.set_public(False)
+    took = await wait_for_revocation(db, "carol", auth_utils.THREAD_ACCESS_CACHE_TTL)
+    check(took <= auth_utils.THREAD_ACCESS_VERSION_POLL + 0.1,
+          f"Making the project private revokes access after {took:.2f}s")
+
+    print("\n🧪 Without the version RPC")
+    reset_cache()
+    db = FakeAccessDB(version_rpc=False)
+    check(await allowed(db, "alice"), "Member allowed")
+    db.remove_member("alice")
+    await asyncio.sleep(auth_utils.THREAD_ACCESS_VERSION_POLL * 2)
+    check(await allowed(db, "alice"), "Cached grant kept while the version can't be read")
+    took = await wait_for_revocation(db, "alice", auth_utils.THREAD_ACCESS_CACHE_TTL + 1)
+    check(took < auth_utils.THREAD_ACCESS_CACHE_TTL,
+          f"Access revoked by the TTL after {took:.2f}s more")
+    check(db.calls["get_thread_access_version"] == 1, "Failed version RPC is not retried on every request")
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        return 1
+    print("\n🎉 Thread access revocation behaves as expected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
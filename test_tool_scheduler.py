@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tool Scheduler Test
+
+Runs batches of tool calls through agentpress.tool_scheduler.ToolScheduler
+with a tool whose functions record when they start and finish, and checks that:
+- results come back in call order
+- max_concurrency caps concurrent calls of a function
+- a call waits for an earlier write to an overlapping sandbox path, while
+  calls on other paths run alongside it
+- "sandbox" conflicts with every path
+- functions without execution hints run alone, in call order
+- exclusive batches run one call at a time
+"""
+
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, 'suna-repo/backend')
+
+from agentpress.tool import Tool, ToolResult, openapi_schema, tool_execution
+from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_scheduler import ToolScheduler, normalize_sandbox_path
+
+CALL_SECONDS = 0.05
+
+events = []
+active = {}
+peak = {}
+
+
+class RecordingTool(Tool):
+    """Functions covering each kind of execution hint"""
+
+    async def _work(self, name: str, key) -> ToolResult:
+        active[name] = active.get(name, 0) + 1
+        peak[name] = max(peak.get(name, 0), active[name])
+        events.append(("start", name, key))
+        await asyncio.sleep(CALL_SECONDS)
+        events.append(("end", name, key))
+        active[name] -= 1
+        return ToolResult(success=True, output=f"{name}:{key}")
+
+    @openapi_schema({"name": "search"})
+    @tool_execution(read_only=True, max_concurrency=2)
+    async def search(self, query):
+        return await self._work("search", query)
+
+    @openapi_schema({"name": "write"})
+    @tool_execution(resources=["path:file_path"])
+    async def write(self, file_path):
+        return await self._work("write", file_path)
+
+    @openapi_schema({"name": "read"})
+    @tool_execution(read_only=True, resources=["path:file_path"])
+    async def read(self, file_path):
+        return await self._work("read", file_path)
+
+    @openapi_schema({"name": "shell"})
+    @tool_execution(resources=["sandbox"])
+    async def shell(self, command):
+        return await self._work("shell", command)
+
+    @openapi_schema({"name": "plain"})
+    async def plain(self, value):
+        return await self._work("plain", value)
+
+
+def call(function_name: str, **arguments):
+    return {"function_name": function_name, "arguments": arguments}
+
+
+async def timed_run(scheduler: ToolScheduler, tool_calls, exclusive: bool = False):
+    events.clear()
+    peak.clear()
+    start = time.perf_counter()
+    results = await scheduler.run(tool_calls, exclusive=exclusive)
+    return results, time.perf_counter() - start
+
+
+async def main():
+    failures = []
+
+    def check(condition: bool, message: str):
+        print(("✅ " if condition else "❌ ") + message)
+        if not condition:
+            failures.append(message)
+
+    registry = ToolRegistry()
+    registry.register_tool(RecordingTool)
+
+    async def execute(tool_call):
+        function_name = tool_call["function_name"]
+        instance = registry.tools[function_name]["instance"]
+        return await getattr(instance, function_name)(**tool_call["arguments"])
+
+    scheduler = ToolScheduler(registry, execute)
+    print("🧪 Tool scheduler behaviour")
+
+    results, elapsed = await timed_run(scheduler, [call("search", query=i) for i in range(4)])
+    check([result.output for _, result in results] == [f"search:{i}" for i in range(4)],
+          "Results come back in call order")
+    check(peak["search"] == 2 and elapsed >= 2 * CALL_SECONDS,
+          f"max_concurrency=2 ran 4 calls two at a time ({elapsed * 1000:.0f}ms)")
+
+    results, elapsed = await timed_run(scheduler, [
+        call("write", file_path="/workspace/a.txt"),
+        call("read", file_path="a.txt"),
+        call("write", file_path="b.txt"),
+        call("search", query="x"),
+    ])
+    check(events.index(("end", "write", "/workspace/a.txt")) < events.index(("start", "read", "a.txt")),
+          "Read of a.txt waits for the write to /workspace/a.txt")
+    check(elapsed < 3 * CALL_SECONDS,
+          f"Write to b.txt and search run alongside it ({elapsed * 1000:.0f}ms)")
+    check([result.output for _, result in results] == ["write:/workspace/a.txt", "read:a.txt", "write:b.txt", "search:x"],
+          "Results keep call order when calls finish out of order")
+
+    await timed_run(scheduler, [
+        call("read", file_path="src/x.py"),
+        call("shell", command="ls"),
+        call("write", file_path="src"),
+    ])
+    check(events[:3] == [("start", "read", "src/x.py"), ("end", "read", "src/x.py"), ("start", "shell", "ls")],
+          "Shell call on the whole sandbox waits for the read")
+    check(events.index(("end", "shell", "ls")) < events.index(("start", "write", "src")),
+          "Write to a parent directory waits for the shell call")
+
+    await timed_run(scheduler, [call("search", query=1), call("plain", value=1), call("search", query=2)])
+    check([event[:2] for event in events] == [
+        ("start", "search"), ("end", "search"),
+        ("start", "plain"), ("end", "plain"),
+        ("start", "search"), ("end", "search"),
+    ], "Function without hints runs alone, in call order")
+
+    _, elapsed = await timed_run(scheduler, [call("search", query=i) for i in range(3)], exclusive=True)
+    check(peak["search"] == 1 and elapsed >= 3 * CALL_SECONDS,
+          f"Exclusive batch runs one call at a time ({elapsed * 1000:.0f}ms)")
+
+    check(normalize_sandbox_path("/workspace/") == "" and normalize_sandbox_path("./a/../b/c") == "b/c",
+          "Sandbox paths are normalized relative to the workspace")
+
+    if failures:
+        print(f"\n❌ {len(failures)} check(s) failed")
+        return 1
+    print("\n🎉 Tool scheduler behaves as expected")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Streaming XML Tool-Call Parser Benchmark
+
+Replays long assistant turns chunk by chunk through:
+- the previous extractor (rescan the whole buffer with one str.find per tag,
+  then str.replace the found chunk out of it, on every chunk)
+- agentpress.xml_stream_parser.StreamingXMLParser (incremental, one trie)
+
+The streams are generated deterministically so they match the shape of Suna
+transcripts: prose, file writes whose content is full of '<', shell commands,
+nested same-name tags, and tags split across chunk boundaries. The test checks
+that both extractors emit the same tool calls and reports the time for each.
+"""
+
+import sys
+import time
+import random
+
+sys.path.insert(0, 'suna-repo/backend')
+
+from agentpress.xml_stream_parser import StreamingXMLParser, TagTrie
+
+TOOL_TAGS = [
+    "execute-command", "create-file", "str-replace", "full-file-rewrite", "delete-file",
+    "web-search", "crawl-webpage", "browser-navigate-to", "browser-click-element",
+    "browser-input-text", "see-image", "deploy", "expose-port", "ask", "complete",
+    "execute-data-provider-call", "get-data-provider-endpoints", "web-browser-takeover",
+]
+
+
+def legacy_extract(content, tags):
+    """The extractor ResponseProcessor used before the incremental parser"""
+    chunks = []
+    pos = 0
+    while pos < len(content):
+        next_tag_start = -1
+        current_tag = None
+        for tag_name in tags:
+            tag_pos = content.find(f'<{tag_name}', pos)
+            if tag_pos != -1 and (next_tag_start == -1 or tag_pos < next_tag_start):
+                next_tag_start = tag_pos
+                current_tag = tag_name
+        if next_tag_start == -1 or not current_tag:
+            break
+        end_pattern = f'</{current_tag}>'
+        tag_stack = []
+        chunk_start = next_tag_start
+        current_pos = next_tag_start
+        while current_pos < len(content):
+            next_start = content.find(f'<{current_tag}', current_pos + 1)
+            next_end = content.find(end_pattern, current_pos)
+            if next_end == -1:
+                break
+            if next_start != -1 and next_start < next_end:
+                tag_stack.append(next_start)
+                current_pos = next_start + 1
+            else:
+                if not tag_stack:
+                    chunk_end = next_end + len(end_pattern)
+                    chunks.append(content[chunk_start:chunk_end])
+                    pos = chunk_end
+                    break
+                tag_stack.pop()
+                current_pos = next_end + 1
+        if current_pos >= len(content):
+            break
+        pos = max(pos + 1, current_pos)
+    return chunks
+
+
+def legacy_stream(chunks, tags):
+    buffer = ""
+    found = []
+    for piece in chunks:
+        buffer += piece
+        for xml_chunk in legacy_extract(buffer, tags):
+            buffer = buffer.replace(xml_chunk, "", 1)
+            found.append(xml_chunk)
+    return found
+
+
+def incremental_stream(chunks, trie):
+    parser = StreamingXMLParser(trie)
+    found = []
+    for piece in chunks:
+        found.extend(parser.feed(piece))
+    return found
+
+
+def make_stream(rng, tool_calls):
+    """One long assistant turn split into token-sized chunks"""
+    words = ["the", "report", "analysis", "market", "data", "shows", "growth", "we", "will", "next",
+             "file", "index", "update", "layout", "section", "results", "<b>", "a < b", "</div>"]
+    parts = []
+    for i in range(tool_calls):
+        parts.append(" ".join(rng.choice(words) for _ in range(rng.randint(40, 160))) + "\n\n")
+        kind = rng.random()
+        if kind < 0.4:
+            rows = "".join(f"<li class=\"item\">Row {j} &lt; {j * 3}</li>\n" for j in range(rng.randint(20, 120)))
+            parts.append(f'<create-file file_path="site/page{i}.html">\n<html><body><ul>\n{rows}</ul></body></html>\n</create-file>')
+        elif kind < 0.6:
+            parts.append(f'<str-replace file_path="app{i}.py">\n    <old_str>x = {i}</old_str>\n    <new_str>x = {i + 1}</new_str>\n</str-replace>')
+        elif kind < 0.8:
+            parts.append(f'<execute-command session_name="s{i}" blocking="true">\nls -la /workspace/dir{i} | grep "<tmp>"\n</execute-command>')
+        elif kind < 0.9:
+            parts.append(f'<ask attachments="notes{i}.md">Should I <ask>nested</ask> continue?</ask>')
+        else:
+            parts.append(f'<web-search query="topic {i}" num_results="10"></web-search>')
+    parts.append("\n\nAll done. <complete></complete>")
+    text = "".join(parts)
+
+    chunks = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(2, 24)
+        chunks.append(text[pos:pos + size])
+        pos += size
+    return chunks
+
+
+def main():
+    rng = random.Random(1234)
+    streams = [make_stream(rng, calls) for calls in (10, 40, 120)]
+    trie = TagTrie(TOOL_TAGS)
+    failures = 0
+
+    print("🧪 Streaming XML tool-call extraction")
+    print(f"   {len(TOOL_TAGS)} registered tags")
+    for chunks in streams:
+        chars = sum(len(c) for c in chunks)
+
+        start = time.perf_counter()
+        legacy = legacy_stream(chunks, TOOL_TAGS)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        incremental = incremental_stream(chunks, trie)
+        incremental_time = time.perf_counter() - start
+
+        same = legacy == incremental
+        failures += not same
+        print(f"{'✅' if same else '❌'} {chars:>8} chars / {len(chunks):>6} chunks / {len(incremental):>4} calls: "
+              f"legacy {legacy_time * 1000:9.1f}ms, incremental {incremental_time * 1000:7.1f}ms "
+              f"({legacy_time / incremental_time:6.1f}x)")
+
+    # Tags split at every possible position must still be found
+    text = 'x <create-file file_path="a">1<create-file>2</create-file>3</create-file> <ask>q</ask> <asking>'
+    expected = ['<create-file file_path="a">1<create-file>2</create-file>3</create-file>', '<ask>q</ask>']
+    split_ok = all(
+        incremental_stream([text[:cut], text[cut:]], trie) == expected
+        for cut in range(len(text) + 1)
+    )
+    failures += not split_ok
+    print(f"{'✅' if split_ok else '❌'} Tool calls found for every split point, nested tags balanced, '<asking>' ignored")
+
+    if failures:
+        print(f"\n❌ {failures} check(s) failed")
+        return 1
+    print("\n🎉 Incremental parser matches the legacy extractor")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())